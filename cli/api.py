@@ -6,33 +6,37 @@ from typing import Optional
 
 import click
 
-import us
 from datapublic.common_fields import CommonFields
 from datapublic.common_fields import PdFields
 
-import api
-import pyseir.cli
-import pyseir.run
-
-from api import update_open_api_spec
-from api import data_overview_builder
-from libs.datasets import timeseries
-from libs.datasets.timeseries import MultiRegionDataset
-from libs.metrics import test_positivity
-from libs.datasets import combined_datasets
-from libs.datasets.dataset_utils import REPO_ROOT
-from libs.datasets.dataset_utils import AggregationLevel
-import pyseir.utils
-import pandas as pd
-
-from libs.pipelines import api_v2_pipeline
+# Only modules that are cheap to import belong at the top of this file. The API models, pyseir
+# and the datasets, which import pandas, are imported in the commands that use them.
 
 PROD_BUCKET = "data.covidactnow.org"
 
+# The same as dataset_utils.REPO_ROOT, without importing dataset_utils.
+REPO_ROOT = pathlib.Path(__file__).parent.parent
+
 API_README_TEMPLATE_PATH = REPO_ROOT / "api" / "README.V1.tmpl.md"
 API_README_PATH = REPO_ROOT / "api" / "README.V1.md"
 
 
+class AggregationLevelType(click.ParamType):
+    """Converts an option value to an AggregationLevel, importing it only when used."""
+
+    name = "aggregation_level"
+
+    def convert(self, value, param, ctx):
+        from libs.datasets.dataset_utils import AggregationLevel
+
+        if isinstance(value, AggregationLevel):
+            return value
+        try:
+            return AggregationLevel(value)
+        except ValueError:
+            self.fail(f"{value!r} is not a valid aggregation level", param, ctx)
+
+
 _logger = logging.getLogger(__name__)
 
 
@@ -65,6 +69,10 @@ def main():
 )
 def update_schemas(api_output_path, data_overview_path, schemas_output_dir):
     """Updates all public facing API schemas."""
+    import api
+    from api import data_overview_builder
+    from api import update_open_api_spec
+
     spec = update_open_api_spec.construct_open_api_spec()
     api_output_path.write_text(json.dumps(spec, indent=2))
 
@@ -98,6 +106,10 @@ def generate_test_positivity(
     state: Optional[str],
     fips: Optional[str],
 ):
+    import us
+    from libs.datasets import combined_datasets
+    from libs.metrics import test_positivity
+
     if state:
         active_states = [state]
     else:
@@ -119,9 +131,11 @@ def generate_test_positivity(
 
 def _write_dataset_map(
     output_path: pathlib.Path,
-    all_methods_datasets: Mapping[timeseries.DatasetName, MultiRegionDataset],
+    all_methods_datasets: Mapping["timeseries.DatasetName", "MultiRegionDataset"],
 ):
     """Writes a map from DatasetName to dataset, used for debugging test positivity."""
+    import pandas as pd
+
     all_datasets_df = pd.concat(
         {name: ds.timeseries_rows() for name, ds in all_methods_datasets.items()},
         names=[PdFields.DATASET, CommonFields.LOCATION_ID, PdFields.VARIABLE],
@@ -143,11 +157,52 @@ def _write_dataset_map(
     help="Output directory for artifacts",
     type=pathlib.Path,
 )
-@click.option("--level", "-l", type=AggregationLevel)
+@click.option("--level", "-l", type=AggregationLevelType())
 @click.option("--state")
 @click.option("--fips")
-def generate_api_v2(model_output_dir, output, level, state, fips):
+@click.option(
+    "--archive",
+    type=pathlib.Path,
+    help="Write all artifacts to this tar file, with names relative to --output",
+)
+@click.option(
+    "--skip-unchanged/--no-skip-unchanged",
+    default=False,
+    help="Don't rewrite artifacts with the same content hash as in the previous run",
+)
+@click.option(
+    "--changed-files",
+    type=pathlib.Path,
+    help="With --skip-unchanged, write the names of changed artifacts to this file",
+)
+@click.option(
+    "--manifest-path",
+    type=pathlib.Path,
+    help="With --skip-unchanged, the content hash manifest. Defaults to a file next to --output",
+)
+@click.option(
+    "--precompress/--no-precompress",
+    default=False,
+    help="Also write gzip (.gz) and brotli (.br) compressed copies of every artifact",
+)
+def generate_api_v2(
+    model_output_dir,
+    output,
+    level,
+    state,
+    fips,
+    archive,
+    skip_unchanged,
+    changed_files,
+    manifest_path,
+    precompress,
+):
     """The entry function for invocation"""
+    if archive and skip_unchanged:
+        raise click.UsageError("--skip-unchanged can't be used with --archive")
+    import pyseir.run
+    from libs.datasets import combined_datasets
+    from libs.pipelines import api_v2_pipeline
 
     # Load all API Regions
     selected_dataset = combined_datasets.load_us_timeseries_dataset().get_subset(
@@ -156,4 +211,14 @@ def generate_api_v2(model_output_dir, output, level, state, fips):
     _logger.info(f"Loading all regional inputs.")
 
     model_output = pyseir.run.PyseirOutputDatasets.read(model_output_dir)
-    api_v2_pipeline.generate_from_loaded_data(model_output, output, selected_dataset, _logger)
+    api_v2_pipeline.generate_from_loaded_data(
+        model_output,
+        output,
+        selected_dataset,
+        _logger,
+        archive_path=archive,
+        skip_unchanged=skip_unchanged,
+        changed_files_path=changed_files,
+        manifest_path=manifest_path,
+        precompress=precompress,
+    )
@@ -12,32 +12,10 @@ import click
 from datapublic.common_fields import CommonFields
 from datapublic.common_fields import FieldName
 
-from libs import google_sheet_helpers
-from libs import pipeline
-from libs.datasets import combined_dataset_utils, custom_patches, weekly_hospitalizations
-from libs.datasets import nytimes_anomalies
-from libs.datasets import custom_aggregations
-from libs.datasets import manual_filter
-from libs.datasets import statistical_areas
-from libs.datasets.combined_datasets import (
-    ALL_TIMESERIES_FEATURE_DEFINITION,
-    ALL_FIELDS_FEATURE_DEFINITION,
-)
-from libs.datasets import timeseries
-from libs.datasets import outlier_detection
-from libs.datasets import dataset_utils
-from libs.datasets import combined_datasets
-from libs.datasets import new_cases_and_deaths
-from libs.datasets import vaccine_backfills
-from libs.datasets.dataset_utils import DATA_DIRECTORY
-from libs.datasets import tail_filter
-from libs.datasets.sources import zeros_filter
-from libs.pipeline import Region
-from libs.pipeline import RegionMask
-from libs.us_state_abbrev import ABBREV_US_UNKNOWN_COUNTY_FIPS
-
-
-TailFilter = tail_filter.TailFilter
+# Only modules that are cheap to import belong at the top of this file. Modules that pull in
+# the data sources, pyseir or other heavy dependencies are imported in the commands that use
+# them so that `run.py data --help` and small commands such as `pickle-to-csv` start quickly.
+from libs import timing_utils
 
 
 CUMULATIVE_FIELDS_TO_FILTER = [
@@ -61,7 +39,16 @@ DEFAULT_REPORTING_RATIO = 0.95
 _logger = logging.getLogger(__name__)
 
 
-REGION_OVERRIDES_JSON = DATA_DIRECTORY / "region-overrides.json"
+# The same as dataset_utils.DATA_DIRECTORY / "region-overrides.json", without importing
+# dataset_utils, which imports pandas.
+REGION_OVERRIDES_JSON = pathlib.Path(__file__).parent.parent / "data" / "region-overrides.json"
+
+
+def _validate_sample_fraction(ctx, param, value: float) -> float:
+    # click 7 FloatRange can't exclude the minimum.
+    if value == 0.0:
+        raise click.BadParameter("must be greater than 0")
+    return value
 
 
 @click.group("data")
@@ -82,10 +69,23 @@ def main():
     help="Print summary stats at several places in the pipeline. Producing these takes extra time.",
     default=True,
 )
+@click.option(
+    "--stats-sample-fraction",
+    type=click.FloatRange(0.0, 1.0),
+    default=1.0,
+    callback=_validate_sample_fraction,
+    help="With --print-stats, only count observations in this fraction of locations.",
+)
+@click.option(
+    "--stats-in-background/--no-stats-in-background",
+    is_flag=True,
+    default=False,
+    help="With --print-stats, count observations in a background thread.",
+)
 @click.option(
     "--refresh-datasets/--no-refresh-datasets",
     is_flag=True,
-    help="Disable to skip loading datasets from covid-data-public and instead re-use data from combined-raw.pkl.gz (much faster)",
+    help="Disable to skip loading datasets from covid-data-public and instead re-use data from combined-raw.pkl.zst (much faster)",
     default=True,
 )
 @click.option("--state", type=str, help="For testing, a two letter state abbr")
@@ -93,127 +93,186 @@ def main():
 def update(
     aggregate_to_country: bool,
     print_stats: bool,
+    stats_sample_fraction: float,
+    stats_in_background: bool,
     refresh_datasets: bool,
     state: Optional[str],
     fips: Optional[str],
 ):
     """Updates latest and timeseries datasets to the current checked out covid data public commit"""
+    from libs.datasets import combined_dataset_utils
+    from libs.datasets import custom_aggregations
+    from libs.datasets import custom_patches
+    from libs.datasets import dataset_utils
+    from libs.datasets import manual_filter
+    from libs.datasets import new_cases_and_deaths
+    from libs.datasets import nytimes_anomalies
+    from libs.datasets import outlier_detection
+    from libs.datasets import statistical_areas
+    from libs.datasets import timeseries
+    from libs.datasets import vaccine_backfills
+    from libs.datasets import weekly_hospitalizations
+    from libs.datasets.combined_datasets import ALL_FIELDS_FEATURE_DEFINITION
+    from libs.datasets.combined_datasets import ALL_TIMESERIES_FEATURE_DEFINITION
+    from libs.datasets.sources import zeros_filter
+    from libs.datasets.tail_filter import TailFilter
+    from libs.qa.stats_observer import DatasetStatsObserver
+
+    stats = DatasetStatsObserver(
+        enabled=print_stats, sample_fraction=stats_sample_fraction, background=stats_in_background
+    )
     path_prefix = dataset_utils.DATA_DIRECTORY.relative_to(dataset_utils.REPO_ROOT)
 
     if refresh_datasets:
-        timeseries_field_datasets = load_datasets_by_field(
-            ALL_TIMESERIES_FEATURE_DEFINITION, state=state, fips=fips
-        )
-        static_field_datasets = load_datasets_by_field(
-            ALL_FIELDS_FEATURE_DEFINITION, state=state, fips=fips
-        )
+        with timing_utils.stage("load_datasets"):
+            _index_can_scraper_variables(
+                [ALL_TIMESERIES_FEATURE_DEFINITION, ALL_FIELDS_FEATURE_DEFINITION]
+            )
+            timeseries_field_datasets = load_datasets_by_field(
+                ALL_TIMESERIES_FEATURE_DEFINITION, state=state, fips=fips
+            )
+            static_field_datasets = load_datasets_by_field(
+                ALL_FIELDS_FEATURE_DEFINITION, state=state, fips=fips
+            )
         _logger.info("Read datasets")
 
-        multiregion_dataset = timeseries.combined_datasets(
-            timeseries_field_datasets, static_field_datasets
-        )
+        with timing_utils.stage("combined_datasets") as stage:
+            multiregion_dataset = timeseries.combined_datasets(
+                timeseries_field_datasets, static_field_datasets
+            )
+            stage.set_shape(multiregion_dataset.timeseries_bucketed)
         _logger.info("Finished combining datasets")
-        multiregion_dataset.to_compressed_pickle(dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH)
-        if print_stats:
-            multiregion_dataset.print_stats("combined")
+        with timing_utils.stage("write_combined_raw_snapshot"):
+            multiregion_dataset.to_snapshot(dataset_utils.COMBINED_RAW_SNAPSHOT_PATH)
+            # Delete the legacy pickle so that it isn't read instead of a newer snapshot.
+            if dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH.exists():
+                dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH.unlink()
+        stats.observe("combined", multiregion_dataset)
     else:
-        multiregion_dataset = timeseries.MultiRegionDataset.from_compressed_pickle(
-            dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH
-        ).get_subset(state=state, fips=fips)
+        with timing_utils.stage("read_combined_raw_snapshot") as stage:
+            multiregion_dataset = combined_dataset_utils.read_combined_raw().get_subset(
+                state=state, fips=fips
+            )
+            stage.set_shape(multiregion_dataset.timeseries_bucketed)
 
     # Apply manual overrides (currently only removing timeseries) before aggregation so we don't
     # need to remove CBSAs because they don't exist yet.
-    aggregator = statistical_areas.CountyToCBSAAggregator.from_local_public_data()
-    region_overrides_config = manual_filter.transform_region_overrides(
-        json.load(open(REGION_OVERRIDES_JSON)), aggregator.cbsa_to_counties_region_map
-    )
-    before_manual_filter = multiregion_dataset
-    multiregion_dataset = manual_filter.run(multiregion_dataset, region_overrides_config)
-    manual_filter_touched = manual_filter.touched_subset(before_manual_filter, multiregion_dataset)
-    manual_filter_touched.write_to_wide_dates_csv(
-        dataset_utils.MANUAL_FILTER_REMOVED_WIDE_DATES_CSV_PATH,
-        dataset_utils.MANUAL_FILTER_REMOVED_STATIC_CSV_PATH,
-    )
-    if print_stats:
-        multiregion_dataset.print_stats("manual filter")
+    with timing_utils.stage("manual_filter") as stage:
+        aggregator = statistical_areas.CountyToCBSAAggregator.from_local_public_data()
+        region_overrides_config = manual_filter.transform_region_overrides(
+            json.load(open(REGION_OVERRIDES_JSON)), aggregator.cbsa_to_counties_region_map
+        )
+        before_manual_filter = multiregion_dataset
+        multiregion_dataset = manual_filter.run(multiregion_dataset, region_overrides_config)
+        manual_filter_touched = manual_filter.touched_subset(
+            before_manual_filter, multiregion_dataset
+        )
+        manual_filter_touched.write_to_wide_dates_csv(
+            dataset_utils.MANUAL_FILTER_REMOVED_WIDE_DATES_CSV_PATH,
+            dataset_utils.MANUAL_FILTER_REMOVED_STATIC_CSV_PATH,
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("manual filter", multiregion_dataset)
 
-    multiregion_dataset = timeseries.drop_observations(
-        multiregion_dataset, after=datetime.datetime.utcnow().date()
-    )
+    with timing_utils.stage("drop_tail") as stage:
+        multiregion_dataset = timeseries.drop_observations(
+            multiregion_dataset, after=datetime.datetime.utcnow().date()
+        )
 
-    multiregion_dataset = outlier_detection.drop_tail_positivity_outliers(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("drop_tail")
+        multiregion_dataset = outlier_detection.drop_tail_positivity_outliers(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("drop_tail", multiregion_dataset)
     # Filter for stalled cumulative values before deriving NEW_CASES from CASES.
-    _, multiregion_dataset = TailFilter.run(multiregion_dataset, CUMULATIVE_FIELDS_TO_FILTER)
-    if print_stats:
-        multiregion_dataset.print_stats("TailFilter")
-    multiregion_dataset = zeros_filter.drop_all_zero_timeseries(
-        multiregion_dataset,
-        [
-            CommonFields.VACCINES_DISTRIBUTED,
-            CommonFields.VACCINES_ADMINISTERED,
-            CommonFields.VACCINATIONS_COMPLETED,
-            CommonFields.VACCINATIONS_INITIATED,
-            CommonFields.VACCINATIONS_ADDITIONAL_DOSE,
-        ],
-    )
-    if print_stats:
-        multiregion_dataset.print_stats("zeros_filter")
-
-    multiregion_dataset = vaccine_backfills.estimate_initiated_from_state_ratio(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("estimate_initiated_from_state_ratio")
-
-    multiregion_dataset = new_cases_and_deaths.add_new_cases(multiregion_dataset)
-    multiregion_dataset = new_cases_and_deaths.add_new_deaths(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("new_cases_and_deaths")
-
-    multiregion_dataset = weekly_hospitalizations.add_weekly_hospitalizations(multiregion_dataset)
-
-    multiregion_dataset = custom_patches.patch_maryland_missing_case_data(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("patch_maryland_missing_case_data")
-
-    multiregion_dataset = nytimes_anomalies.filter_by_nyt_anomalies(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("nytimes_anomalies")
+    with timing_utils.stage("TailFilter") as stage:
+        _, multiregion_dataset = TailFilter.run(multiregion_dataset, CUMULATIVE_FIELDS_TO_FILTER)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("TailFilter", multiregion_dataset)
+    with timing_utils.stage("zeros_filter") as stage:
+        multiregion_dataset = zeros_filter.drop_all_zero_timeseries(
+            multiregion_dataset,
+            [
+                CommonFields.VACCINES_DISTRIBUTED,
+                CommonFields.VACCINES_ADMINISTERED,
+                CommonFields.VACCINATIONS_COMPLETED,
+                CommonFields.VACCINATIONS_INITIATED,
+                CommonFields.VACCINATIONS_ADDITIONAL_DOSE,
+            ],
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("zeros_filter", multiregion_dataset)
 
-    multiregion_dataset = outlier_detection.drop_new_case_outliers(multiregion_dataset)
-    multiregion_dataset = outlier_detection.drop_new_deaths_outliers(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("outlier_detection")
+    with timing_utils.stage("estimate_initiated_from_state_ratio") as stage:
+        multiregion_dataset = vaccine_backfills.estimate_initiated_from_state_ratio(
+            multiregion_dataset
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("estimate_initiated_from_state_ratio", multiregion_dataset)
+
+    with timing_utils.stage("new_cases_and_deaths") as stage:
+        multiregion_dataset = new_cases_and_deaths.add_new_cases(multiregion_dataset)
+        multiregion_dataset = new_cases_and_deaths.add_new_deaths(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("new_cases_and_deaths", multiregion_dataset)
+
+    with timing_utils.stage("weekly_hospitalizations") as stage:
+        multiregion_dataset = weekly_hospitalizations.add_weekly_hospitalizations(
+            multiregion_dataset
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+
+    with timing_utils.stage("patch_maryland_missing_case_data") as stage:
+        multiregion_dataset = custom_patches.patch_maryland_missing_case_data(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("patch_maryland_missing_case_data", multiregion_dataset)
+
+    with timing_utils.stage("nytimes_anomalies") as stage:
+        multiregion_dataset = nytimes_anomalies.filter_by_nyt_anomalies(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("nytimes_anomalies", multiregion_dataset)
+
+    with timing_utils.stage("outlier_detection") as stage:
+        multiregion_dataset = outlier_detection.drop_new_case_outliers(multiregion_dataset)
+        multiregion_dataset = outlier_detection.drop_new_deaths_outliers(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("outlier_detection", multiregion_dataset)
+
+    with timing_utils.stage("drop_regions_without_population") as stage:
+        multiregion_dataset = timeseries.drop_regions_without_population(
+            multiregion_dataset, known_location_id_without_population(), structlog.get_logger(),
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("drop_regions_without_population", multiregion_dataset)
 
-    multiregion_dataset = timeseries.drop_regions_without_population(
-        multiregion_dataset, KNOWN_LOCATION_ID_WITHOUT_POPULATION, structlog.get_logger()
-    )
-    if print_stats:
-        multiregion_dataset.print_stats("drop_regions_without_population")
+    with timing_utils.stage("aggregate_puerto_rico_from_counties") as stage:
+        multiregion_dataset = custom_aggregations.aggregate_puerto_rico_from_counties(
+            multiregion_dataset
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("aggregate_puerto_rico_from_counties", multiregion_dataset)
+    with timing_utils.stage("aggregate_to_new_york_city") as stage:
+        multiregion_dataset = custom_aggregations.aggregate_to_new_york_city(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("aggregate_to_new_york_city", multiregion_dataset)
+    with timing_utils.stage("replace_dc_county_with_state_data") as stage:
+        multiregion_dataset = custom_aggregations.replace_dc_county_with_state_data(
+            multiregion_dataset
+        )
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("replace_dc_county_with_state_data", multiregion_dataset)
 
-    multiregion_dataset = custom_aggregations.aggregate_puerto_rico_from_counties(
-        multiregion_dataset
-    )
-    if print_stats:
-        multiregion_dataset.print_stats("aggregate_puerto_rico_from_counties")
-    multiregion_dataset = custom_aggregations.aggregate_to_new_york_city(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("aggregate_to_new_york_city")
-    multiregion_dataset = custom_aggregations.replace_dc_county_with_state_data(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("replace_dc_county_with_state_data")
-
-    cbsa_dataset = aggregator.aggregate(
-        multiregion_dataset, reporting_ratio_required_to_aggregate=DEFAULT_REPORTING_RATIO
-    )
-    multiregion_dataset = multiregion_dataset.append_regions(cbsa_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("CountyToCBSAAggregator")
+    with timing_utils.stage("CountyToCBSAAggregator") as stage:
+        cbsa_dataset = aggregator.aggregate(
+            multiregion_dataset, reporting_ratio_required_to_aggregate=DEFAULT_REPORTING_RATIO
+        )
+        multiregion_dataset = multiregion_dataset.append_regions(cbsa_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("CountyToCBSAAggregator", multiregion_dataset)
 
-    hsa_aggregator = statistical_areas.CountyToHSAAggregator.from_local_data()
-    multiregion_dataset = hsa_aggregator.aggregate(multiregion_dataset)
-    if print_stats:
-        multiregion_dataset.print_stats("CountyToHSAAggregator")
+    with timing_utils.stage("CountyToHSAAggregator") as stage:
+        hsa_aggregator = statistical_areas.CountyToHSAAggregator.from_local_data()
+        multiregion_dataset = hsa_aggregator.aggregate(multiregion_dataset)
+        stage.set_shape(multiregion_dataset.timeseries_bucketed)
+    stats.observe("CountyToHSAAggregator", multiregion_dataset)
 
     # TODO(tom): Add a clean way to store intermediate values instead of commenting out code like
     #  this:
@@ -221,20 +280,25 @@ def update(
     #     pathlib.Path("data/pre-agg-wide-dates.csv"), pathlib.Path("data/pre-agg-static.csv")
     # )
     if aggregate_to_country:
-        multiregion_dataset = custom_aggregations.aggregate_to_country(
-            multiregion_dataset, reporting_ratio_required_to_aggregate=DEFAULT_REPORTING_RATIO
-        )
-        if print_stats:
-            multiregion_dataset.print_stats("aggregate_to_country")
+        with timing_utils.stage("aggregate_to_country") as stage:
+            multiregion_dataset = custom_aggregations.aggregate_to_country(
+                multiregion_dataset, reporting_ratio_required_to_aggregate=DEFAULT_REPORTING_RATIO
+            )
+            stage.set_shape(multiregion_dataset.timeseries_bucketed)
+        stats.observe("aggregate_to_country", multiregion_dataset)
 
-    combined_dataset_utils.persist_dataset(multiregion_dataset, path_prefix)
-    if print_stats:
-        multiregion_dataset.print_stats("persist")
+    with timing_utils.stage("persist"):
+        combined_dataset_utils.persist_dataset(multiregion_dataset, path_prefix)
+    stats.observe("persist", multiregion_dataset)
+    stats.close()
 
 
 @main.command()
 @click.argument("output_path", type=pathlib.Path)
 def aggregate_cbsa(output_path: pathlib.Path):
+    from libs.datasets import combined_datasets
+    from libs.datasets import statistical_areas
+
     us_timeseries = combined_datasets.load_us_timeseries_dataset()
     aggregator = statistical_areas.CountyToCBSAAggregator.from_local_public_data()
     cbsa_dataset = aggregator.aggregate(us_timeseries)
@@ -251,6 +315,8 @@ def aggregate_cbsa(output_path: pathlib.Path):
 @click.argument("pkl_gz_input", type=pathlib.Path)
 @click.argument("wide_dates_csv_output", type=pathlib.Path)
 def pickle_to_csv(pkl_gz_input: pathlib.Path, wide_dates_csv_output):
+    from libs.datasets import timeseries
+
     assert wide_dates_csv_output.name.endswith("-wide-dates.csv")
     static_csv_output = pathlib.Path(
         str(wide_dates_csv_output).replace("-wide-dates.csv", "-static.csv")
@@ -264,6 +330,9 @@ def pickle_to_csv(pkl_gz_input: pathlib.Path, wide_dates_csv_output):
     "then use this command to test state to country aggregation."
 )
 def aggregate_states_to_country():
+    from libs.datasets import custom_aggregations
+    from libs.datasets import timeseries
+
     dataset = timeseries.MultiRegionDataset.from_wide_dates_csv(
         pathlib.Path("data/pre-agg-wide-dates.csv")
     ).add_static_csv_file(pathlib.Path("data/pre-agg-static.csv"))
@@ -275,31 +344,39 @@ def aggregate_states_to_country():
     )
 
 
-KNOWN_LOCATION_ID_WITHOUT_POPULATION = [
-    # Territories other than PR
-    "iso1:us#iso2:us-vi",
-    "iso1:us#iso2:us-as",
-    "iso1:us#iso2:us-gu",
-    # Subregion of AS
-    "iso1:us#iso2:us-vi#fips:78030",
-    "iso1:us#iso2:us-vi#fips:78020",
-    "iso1:us#iso2:us-vi#fips:78010",
-    # Retired FIPS
-    "iso1:us#iso2:us-sd#fips:46113",
-    "iso1:us#iso2:us-va#fips:51515",
-    # All the unknown county FIPS
-    *[pipeline.fips_to_location_id(f) for f in ABBREV_US_UNKNOWN_COUNTY_FIPS.values()],
-]
+def known_location_id_without_population() -> List[str]:
+    """Returns the location_id of regions that are expected to not have a population."""
+    from libs import pipeline
+    from libs.us_state_abbrev import ABBREV_US_UNKNOWN_COUNTY_FIPS
+
+    return [
+        # Territories other than PR
+        "iso1:us#iso2:us-vi",
+        "iso1:us#iso2:us-as",
+        "iso1:us#iso2:us-gu",
+        # Subregion of AS
+        "iso1:us#iso2:us-vi#fips:78030",
+        "iso1:us#iso2:us-vi#fips:78020",
+        "iso1:us#iso2:us-vi#fips:78010",
+        # Retired FIPS
+        "iso1:us#iso2:us-sd#fips:46113",
+        "iso1:us#iso2:us-va#fips:51515",
+        # All the unknown county FIPS
+        *[pipeline.fips_to_location_id(f) for f in ABBREV_US_UNKNOWN_COUNTY_FIPS.values()],
+    ]
 
 
 @main.command()
 @click.argument("output_path", type=pathlib.Path)
 def run_population_filter(output_path: pathlib.Path):
+    from libs.datasets import combined_datasets
+    from libs.datasets import timeseries
+
     us_timeseries = combined_datasets.load_us_timeseries_dataset()
     log = structlog.get_logger()
     log.info("starting filter")
     ts_out = timeseries.drop_regions_without_population(
-        us_timeseries, KNOWN_LOCATION_ID_WITHOUT_POPULATION, log
+        us_timeseries, known_location_id_without_population(), log
     )
     ts_out.to_csv(output_path)
 
@@ -307,6 +384,8 @@ def run_population_filter(output_path: pathlib.Path):
 @main.command()
 @click.argument("output_path", type=pathlib.Path)
 def write_combined_datasets(output_path: pathlib.Path):
+    from libs.datasets import combined_datasets
+
     log = structlog.get_logger()
     log.info("Loading")
     us_timeseries = combined_datasets.load_us_timeseries_dataset()
@@ -318,6 +397,9 @@ def write_combined_datasets(output_path: pathlib.Path):
 @main.command()
 @click.argument("output_path", type=pathlib.Path)
 def run_bad_tails_filter(output_path: pathlib.Path):
+    from libs.datasets import combined_datasets
+    from libs.datasets.tail_filter import TailFilter
+
     us_dataset = combined_datasets.load_us_timeseries_dataset()
     log = structlog.get_logger()
     log.info("Starting filter")
@@ -330,6 +412,7 @@ def run_bad_tails_filter(output_path: pathlib.Path):
 @click.option("--name", envvar="DATA_AVAILABILITY_SHEET_NAME", default="Data Availability - Dev")
 @click.option("--share-email")
 def update_availability_report(name: str, share_email: Optional[str]):
+    from libs import google_sheet_helpers
     from libs.qa import data_availability
 
     sheet = google_sheet_helpers.open_or_create_spreadsheet(name, share_email=share_email)
@@ -372,6 +455,11 @@ def update_availability_report(name: str, share_email: Optional[str]):
     show_default=True,
 )
 def update_test_combined_data(truncate_dates: bool, state: List[str]):
+    from libs.datasets import combined_datasets
+    from libs.datasets import dataset_utils
+    from libs.pipeline import Region
+    from libs.pipeline import RegionMask
+
     us_dataset = combined_datasets.load_us_timeseries_dataset()
     # Keep only a small subset of the regions so we have enough to exercise our code in tests.
     test_subset = us_dataset.get_regions_subset(
@@ -401,14 +489,34 @@ def update_test_combined_data(truncate_dates: bool, state: List[str]):
     )
 
 
+def _index_can_scraper_variables(
+    feature_definition_configs: List["combined_datasets.FeatureDataSourceMap"],
+):
+    """Finds the rows of all CAN Scraper sources in one scan before any of them is loaded."""
+    from libs.datasets import combined_datasets
+    from libs.datasets import data_source
+
+    data_source_classes = []
+    for feature_definition_config in feature_definition_configs:
+        for classes in feature_definition_config.values():
+            for cls in classes:
+                if isinstance(cls, combined_datasets.DataSourceAndRegionMasks):
+                    cls = cls.data_source_cls
+                data_source_classes.append(cls)
+    with timing_utils.stage("index_can_scraper_variables"):
+        data_source.index_can_scraper_variables(data_source_classes)
+
+
 def load_datasets_by_field(
-    feature_definition_config: combined_datasets.FeatureDataSourceMap, *, state, fips
-) -> Mapping[FieldName, List[timeseries.MultiRegionDataset]]:
-    def _load_dataset(data_source_cls) -> timeseries.MultiRegionDataset:
+    feature_definition_config: "combined_datasets.FeatureDataSourceMap", *, state, fips
+) -> Mapping[FieldName, List["timeseries.MultiRegionDataset"]]:
+    def _load_dataset(data_source_cls) -> "timeseries.MultiRegionDataset":
         try:
-            dataset = data_source_cls.make_dataset()
-            if state or fips:
-                dataset = dataset.get_subset(state=state, fips=fips)
+            with timing_utils.stage("make_dataset", source=data_source_cls.__name__) as stage:
+                dataset = data_source_cls.make_dataset()
+                if state or fips:
+                    dataset = dataset.get_subset(state=state, fips=fips)
+                stage.set_shape(dataset.timeseries_bucketed)
             return dataset
         except Exception:
             raise ValueError(f"Problem with {data_source_cls}")
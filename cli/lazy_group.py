@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from typing import List, Mapping, Optional
+import importlib
+
+import click
+
+
+@dataclass(frozen=True)
+class LazyCommand:
+    """A subcommand that is imported when first used."""
+
+    # Module containing the command, such as "cli.data".
+    module: str
+
+    # Name of the click.Command object in `module`.
+    attribute: str
+
+    # Shown in the parent group's help output without importing `module`.
+    short_help: str
+
+
+class LazyGroup(click.Group):
+    """A click.Group that only imports the module of a subcommand when that subcommand is
+    invoked or its own help is requested.
+
+    Importing cli.api, cli.data etc pulls in pandas, the data sources, pyseir and the API models
+    which makes even `--help` take several seconds.
+    """
+
+    def __init__(
+        self, *args, lazy_subcommands: Optional[Mapping[str, LazyCommand]] = None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = dict(lazy_subcommands or {})
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.commands and cmd_name in self.lazy_subcommands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name: str) -> click.Command:
+        lazy_command = self.lazy_subcommands[cmd_name]
+        module = importlib.import_module(lazy_command.module)
+        command = getattr(module, lazy_command.attribute)
+        if not isinstance(command, click.Command):
+            raise ValueError(f"{lazy_command.module}.{lazy_command.attribute} is not a command")
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        """Like click.MultiCommand.format_commands but gets the help text of commands that are
+        not loaded yet from the registry instead of importing them."""
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            if cmd_name in self.commands:
+                command = self.commands[cmd_name]
+                if command.hidden:
+                    continue
+                rows.append((cmd_name, command.get_short_help_str(formatter.width)))
+            else:
+                rows.append((cmd_name, self.lazy_subcommands[cmd_name].short_help))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -6,17 +6,9 @@ from datetime import datetime
 from io import BytesIO
 
 import click
-import git
 
-from datapublic import common_df
-from libs import github_utils
-from libs import update_api_user_metrics
-from libs import google_sheet_helpers
-from libs.datasets import combined_datasets
-from libs.datasets import dataset_utils
-
-from libs.git_lfs_object_helpers import read_data_for_commit
-from libs.qa.common_df_diff import DatasetDiff
+# Modules with heavy dependencies (git, gspread, boto3, pandas and the datasets) are imported in
+# the commands that use them.
 
 _logger = logging.getLogger(__name__)
 
@@ -37,6 +29,8 @@ def main():
 @click.option("--output-dir", "-o", type=pathlib.Path, default=pathlib.Path("."))
 def download_model_artifact(github_token, run_number, output_dir):
     """Download model output from github action publish and deploy workflow. """
+    from libs import github_utils
+
     github_utils.download_model_artifact(github_token, output_dir, run_number=run_number)
 
 
@@ -50,6 +44,8 @@ def download_model_artifact(github_token, run_number, output_dir):
 @click.option("--output-dir", "-o", type=pathlib.Path, default=pathlib.Path("."))
 def save_combined_csv(csv_path_format, output_dir):
     """Save the combined datasets DataFrame, cleaned up for easier comparisons."""
+    from libs.datasets import combined_datasets
+
     csv_path = form_path_name(csv_path_format, output_dir)
 
     timeseries = combined_datasets.load_us_timeseries_dataset()
@@ -79,6 +75,12 @@ def form_path_name(csv_path_format, output_dir):
 @click.argument("csv_path_right", type=str, required=True)
 def csv_diff(csv_path_or_rev_left, csv_path_right):
     """Compare 2 CSV files."""
+    import git
+    from datapublic import common_df
+    from libs.datasets import dataset_utils
+    from libs.git_lfs_object_helpers import read_data_for_commit
+    from libs.qa.common_df_diff import DatasetDiff
+
     left_path = pathlib.Path(csv_path_or_rev_left)
     right_path = pathlib.Path(csv_path_right)
 
@@ -123,6 +125,9 @@ def update_api_user_usage(
         sheet_id: Google Sheets ID of existing sheet.
         share_email: Email to share created sheet with if new sheet.
     """
+    from libs import google_sheet_helpers
+    from libs import update_api_user_metrics
+
     if sheet_id:
         sheet = google_sheet_helpers.open_spreadsheet(sheet_id)
     else:
@@ -131,3 +136,18 @@ def update_api_user_usage(
     rows = update_api_user_metrics.run_user_activity_summary_query(table_name, database_name)
     update_api_user_metrics.update_google_sheet(sheet, "API Usage Activity Report", rows)
     update_api_user_metrics.update_hubspot_users(rows)
+
+
+@main.command()
+@click.argument("old_report", type=pathlib.Path)
+@click.argument("new_report", type=pathlib.Path)
+def compare_profiles(old_report: pathlib.Path, new_report: pathlib.Path):
+    """Compare the wall time of each stage in two profile.json reports written with
+    `run.py --profile-dir`."""
+    from libs import timing_utils
+
+    def _format_seconds(seconds: Optional[float]) -> str:
+        return "-" if seconds is None else f"{seconds:.1f}s"
+
+    for name, old_seconds, new_seconds in timing_utils.compare_reports(old_report, new_report):
+        print(f"{name:<45} {_format_seconds(old_seconds):>10} {_format_seconds(new_seconds):>10}")
@@ -22,6 +22,7 @@ from dash.dependencies import Output
 from plotly import express as px
 
 from libs import pipeline
+from libs.datasets import combined_dataset_utils
 from libs.datasets import combined_datasets
 from libs.datasets import dataset_utils
 from libs.datasets import new_cases_and_deaths
@@ -120,9 +121,7 @@ class RepoWrapper:
             ).add_static_csv_file(dataset_utils.MANUAL_FILTER_REMOVED_STATIC_CSV_PATH)
             dataset = new_cases_and_deaths.add_new_cases(dataset)
         elif dataset_name is DashboardFile.COMBINED_RAW:
-            dataset = timeseries.MultiRegionDataset.from_compressed_pickle(
-                dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH
-            )
+            dataset = combined_dataset_utils.read_combined_raw()
         else:
             raise ValueError(f"Bad {dataset_name}")
 
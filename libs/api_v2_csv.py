@@ -0,0 +1,184 @@
+"""Streaming CSV output of flattened API timeseries.
+
+The flattened timeseries CSV has a row for every date of every region, with the region summary
+fields repeated on each row. Building a `RegionTimeseriesRowWithHeader` and a flattened dict for
+each row takes most of the time spent writing the county CSV and holds every row in memory. Here
+the header is resolved to attribute paths once from the model schema and each region's rows are
+formatted a column at a time and written before moving on to the next region. The formatted rows
+of a region are also written to the region's own CSV, so every level gets per-region CSVs for
+little extra cost. Tests check that the output matches `dataset_deployer.write_nested_csv`.
+"""
+import contextlib
+import csv
+import enum
+import io
+import math
+import pathlib
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple, Type
+
+import pydantic
+import structlog
+
+from api.can_api_v2_definition import RegionSummaryWithTimeseries
+from api.can_api_v2_definition import RegionTimeseriesRowWithHeader
+from libs import dataset_deployer
+from libs.api_v2_json import NESTED_FIELD_SEPARATOR
+
+_logger = structlog.getLogger()
+
+# Field of RegionTimeseriesRowWithHeader -> (timeseries of RegionSummaryWithTimeseries, field of
+# the timeseries row or None to use the whole row).
+TIMESERIES_FIELDS = {
+    "actuals": ("actualsTimeseries", None),
+    "metrics": ("metricsTimeseries", None),
+    "riskLevels": ("riskLevelsTimeseries", None),
+    "cdcTransmissionLevel": ("cdcTransmissionLevelTimeseries", "cdcTransmissionLevel"),
+    "communityLevels": ("communityLevelsTimeseries", None),
+}
+
+
+@lru_cache(maxsize=None)
+def _resolve_column(model_cls: Type[pydantic.BaseModel], column: str) -> Optional[Tuple[str, ...]]:
+    """Returns the field names leading to `column` in `model_cls` or None if it isn't a field."""
+    path = tuple(column.split(NESTED_FIELD_SEPARATOR))
+    cls = model_cls
+    for name in path:
+        if cls is None or name not in cls.__fields__:
+            return None
+        field_type = cls.__fields__[name].type_
+        is_model = isinstance(field_type, type) and issubclass(field_type, pydantic.BaseModel)
+        cls = field_type if is_model else None
+    return path
+
+
+def _format_value(value: Any) -> Any:
+    """Converts a value to what `write_nested_csv` writes for it."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and math.isnan(value):
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, pydantic.BaseModel):
+        # A column naming a nested model is never produced by flattening, so is always empty.
+        return ""
+    return value
+
+
+def _get_path(value: Any, path: Sequence[str]) -> Any:
+    for name in path:
+        if value is None:
+            return None
+        # Fields that were not set are missing from models created with `construct`.
+        value = getattr(value, name, None)
+    return value
+
+
+def _region_columns(
+    region_timeseries: RegionSummaryWithTimeseries, paths: List[Optional[Tuple[str, ...]]]
+) -> List[List[Any]]:
+    """Returns the formatted values of each column in `paths` for every date of a region."""
+    by_date = {}
+    for timeseries_name, _ in TIMESERIES_FIELDS.values():
+        rows = getattr(region_timeseries, timeseries_name)
+        by_date[timeseries_name] = {row.date: row for row in rows}
+    dates = sorted({*by_date["actualsTimeseries"].keys(), *by_date["metricsTimeseries"].keys()})
+    row_count = len(dates)
+
+    # Rows of each timeseries aligned to `dates`, built once for all columns.
+    aligned = {}
+    for field_name, (timeseries_name, row_field) in TIMESERIES_FIELDS.items():
+        rows = [by_date[timeseries_name].get(date) for date in dates]
+        if row_field:
+            rows = [_get_path(row, [row_field]) for row in rows]
+        aligned[field_name] = rows
+
+    columns = []
+    for path in paths:
+        if path is None:
+            columns.append([""] * row_count)
+        elif path[0] == "date":
+            columns.append(dates)
+        elif path[0] in aligned:
+            columns.append([_format_value(_get_path(row, path[1:])) for row in aligned[path[0]]])
+        else:
+            # Other fields are copied from the region summary to every row.
+            value = _format_value(_get_path(region_timeseries, path))
+            columns.append([value] * row_count)
+    return columns
+
+
+def _format_region_rows(
+    region_timeseries: RegionSummaryWithTimeseries, paths: List[Optional[Tuple[str, ...]]]
+) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(zip(*_region_columns(region_timeseries, paths)))
+    return buffer.getvalue()
+
+
+def _format_header(header: List[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(header)
+    return buffer.getvalue()
+
+
+def write_flattened_timeseries_csvs(
+    all_timeseries: Iterable[RegionSummaryWithTimeseries],
+    header: List[str],
+    *,
+    bulk_paths: Callable[[RegionSummaryWithTimeseries], Iterable[pathlib.Path]],
+    region_path: Optional[Callable[[RegionSummaryWithTimeseries], pathlib.Path]] = None,
+    writer: Optional[dataset_deployer.DeployWriter] = None,
+) -> None:
+    """Writes the flattened timeseries of regions to bulk CSVs and optionally a CSV per region.
+
+    The rows of each region are formatted once. The text is written to the region's own file and
+    appended to each of its bulk files, which stay open until all regions are written, so adding
+    per-region files costs little more than the bulk files.
+
+    Args:
+        all_timeseries: Regions to write, in output order.
+        header: Columns to output, named like `write_nested_csv` flattens nested fields.
+        bulk_paths: Returns the paths of the bulk files containing the rows of a region.
+        region_path: Returns the path of the file containing only the rows of a region.
+        writer: Writes the files. By default a new DeployWriter is used.
+    """
+    # Columns that are not fields, such as the "unused" placeholders, are left empty.
+    paths = [_resolve_column(RegionTimeseriesRowWithHeader, column) for column in header]
+    header_text = _format_header(header)
+
+    with contextlib.ExitStack() as stack:
+        if writer is None:
+            writer = stack.enter_context(dataset_deployer.DeployWriter())
+        bulk_files = {}
+        for region_timeseries in all_timeseries:
+            rows_text = _format_region_rows(region_timeseries, paths)
+            if region_path:
+                writer.write(region_path(region_timeseries), header_text + rows_text)
+            for bulk_path in bulk_paths(region_timeseries):
+                bulk_file = bulk_files.get(bulk_path)
+                if bulk_file is None:
+                    _logger.info(f"Writing to {bulk_path}")
+                    bulk_file = stack.enter_context(writer.open(bulk_path))
+                    bulk_file.write(header_text)
+                    bulk_files[bulk_path] = bulk_file
+                bulk_file.write(rows_text)
+
+
+def write_flattened_timeseries_csv(
+    all_timeseries: Iterable[RegionSummaryWithTimeseries],
+    output_path: pathlib.Path,
+    header: List[str],
+) -> None:
+    """Writes the flattened timeseries of regions to a CSV, one region at a time.
+
+    Produces the same file as building an `AggregateFlattenedTimeseries` of the regions and writing
+    it with `dataset_deployer.write_nested_csv`.
+
+    Args:
+        all_timeseries: Regions to write, in output order.
+        output_path: Path of file to write to.
+        header: Columns to output, named like `write_nested_csv` flattens nested fields.
+    """
+    write_flattened_timeseries_csvs(all_timeseries, header, bulk_paths=lambda _: [output_path])
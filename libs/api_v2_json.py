@@ -0,0 +1,141 @@
+"""Fast construction and JSON encoding of API output models.
+
+The pydantic models in api/can_api_v2_definition.py define the API schema. Validating a model
+for every date of every region and serializing with `.json()` dominates the time spent writing
+the API, so timeseries rows are built here from whole DataFrame columns, coerced to the types
+pydantic would produce, and wrapped with `construct` which skips validation. `dumps` walks the
+models using their field definitions and produces the same output as `.json(exclude_unset=True)`.
+Tests check both against pydantic validation.
+"""
+import datetime
+import enum
+from functools import lru_cache
+from typing import Any, Collection, List, Optional, Tuple, Type
+
+import numpy as np
+import pandas as pd
+import pydantic
+from pydantic.fields import ModelField
+from pydantic.fields import SHAPE_SINGLETON
+
+# Separates the name of a field from the name of a field in a nested model in DataFrame columns,
+# for example "hospitalBeds.capacity".
+NESTED_FIELD_SEPARATOR = "."
+
+
+def _int_or_none_list(column: pd.Series) -> List[Optional[int]]:
+    values = pd.to_numeric(column).to_numpy(dtype=float)
+    missing = np.isnan(values)
+    # Like the pydantic int validator, truncate towards zero.
+    ints = np.where(missing, 0, values).astype(np.int64).astype(object)
+    ints[missing] = None
+    return ints.tolist()
+
+
+def _coerce_column(field: ModelField, column: pd.Series) -> List[Any]:
+    """Returns the values in `column` converted the way pydantic validates `field`."""
+    field_type = field.outer_type_
+    if field.shape != SHAPE_SINGLETON or not isinstance(field_type, type):
+        return column.tolist()
+    if issubclass(field_type, bool):
+        return column.tolist()
+    if issubclass(field_type, int):
+        return _int_or_none_list(column)
+    # datetime.datetime is a subclass of datetime.date so must be checked first.
+    if issubclass(field_type, datetime.datetime):
+        return [None if v is pd.NaT else v for v in pd.to_datetime(column).dt.to_pydatetime()]
+    if issubclass(field_type, datetime.date):
+        return pd.to_datetime(column).dt.date.tolist()
+    if issubclass(field_type, enum.Enum):
+        # `v != v` is true for NaN.
+        return [None if v is None or v != v else field_type(v) for v in column.tolist()]
+    return column.tolist()
+
+
+def _columns_for_model(
+    model_cls: Type[pydantic.BaseModel], frame: pd.DataFrame
+) -> Tuple[List[str], List[List[Any]]]:
+    """Returns the names of fields of `model_cls` found in `frame` and their coerced values."""
+    names = []
+    columns = []
+    for name, field in model_cls.__fields__.items():
+        if name in frame.columns:
+            names.append(name)
+            columns.append(_coerce_column(field, frame[name]))
+            continue
+        prefix = name + NESTED_FIELD_SEPARATOR
+        nested_columns = [c for c in frame.columns if c.startswith(prefix)]
+        if nested_columns and issubclass(field.type_, pydantic.BaseModel):
+            nested_frame = frame.loc[:, nested_columns]
+            nested_frame.columns = [c[len(prefix) :] for c in nested_columns]
+            names.append(name)
+            columns.append(rows_from_frame(field.type_, nested_frame))
+    return names, columns
+
+
+def rows_from_frame(
+    model_cls: Type[pydantic.BaseModel],
+    frame: pd.DataFrame,
+    *,
+    unset_fields: Collection[str] = (),
+    unset_rows: Optional[np.ndarray] = None,
+) -> List[pydantic.BaseModel]:
+    """Returns a `model_cls` for each row of `frame` without running pydantic validation.
+
+    Columns are matched to fields by name and converted to the type of the field, as checked by
+    tests. Columns that are not fields are ignored, like `Extra.ignore`. A nested model field is
+    built from columns named with the field name, NESTED_FIELD_SEPARATOR and the nested field
+    name. Only fields with a column are set, so `exclude_unset` works as when the values are
+    passed to the model constructor.
+
+    Args:
+        model_cls: Model to create for each row.
+        frame: Values with a column per field.
+        unset_fields: Fields that are not set in rows where `unset_rows` is True.
+        unset_rows: Boolean array with an element for each row of frame.
+    """
+    names, columns = _columns_for_model(model_cls, frame)
+    if not names:
+        return [model_cls.construct() for _ in range(len(frame))]
+    keep = [name not in unset_fields for name in names]
+    rows = []
+    for row_index, values in enumerate(zip(*columns)):
+        if unset_rows is not None and unset_rows[row_index]:
+            row = {name: value for name, value, k in zip(names, values, keep) if k}
+        else:
+            row = dict(zip(names, values))
+        rows.append(model_cls.construct(**row))
+    return rows
+
+
+@lru_cache(maxsize=None)
+def _field_names(model_cls: Type[pydantic.BaseModel]) -> Tuple[str, ...]:
+    return tuple(model_cls.__fields__)
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, pydantic.BaseModel):
+        fields_set = value.__fields_set__
+        values = value.__dict__
+        return {
+            name: _to_jsonable(values[name])
+            for name in _field_names(type(value))
+            if name in fields_set
+        }
+    if isinstance(value, list):
+        return [_to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def dumps(model: pydantic.BaseModel) -> str:
+    """Returns the same JSON as `model.json(exclude_unset=True)`, faster."""
+    data = _to_jsonable(model)
+    if model.__custom_root_type__:
+        data = data["__root__"]
+    return model.__config__.json_dumps(data)
@@ -1,24 +1,22 @@
 from datetime import datetime
 from typing import List, Dict, Optional
+import numpy as np
 import pandas as pd
 from math import isinf
 
 from api.can_api_v2_definition import (
     Actuals,
     ActualsTimeseriesRow,
-    AggregateRegionSummaryWithTimeseries,
     Annotations,
     CdcTransmissionLevelTimeseriesRow,
     CommunityLevelsTimeseriesRow,
     FieldAnnotations,
-    AggregateFlattenedTimeseries,
     DemographicDistributions,
     Metrics,
     RiskLevels,
     CDCTransmissionLevel,
     RegionSummary,
     RegionSummaryWithTimeseries,
-    RegionTimeseriesRowWithHeader,
     MetricsTimeseriesRow,
     RiskLevelTimeseriesRow,
 )
@@ -28,6 +26,7 @@ from api.can_api_v2_definition import AnomalyAnnotation
 from api.can_api_v2_definition import FieldSource
 from api.can_api_v2_definition import FieldSourceType
 
+from libs import api_v2_json
 from libs.datasets import timeseries
 from libs.datasets.tail_filter import TagField
 from libs.datasets.timeseries import OneRegionTimeseriesDataset
@@ -41,6 +40,52 @@ METRIC_MULTIPLE_SOURCE_TYPES_MESSAGE = "More than one provenance for a field"
 
 USA_VACCINATION_START_DATE = datetime(2020, 12, 14)
 
+# Fields not included in timeseries rows before USA_VACCINATION_START_DATE, to not bloat the
+# timeseries.
+ACTUALS_VACCINATION_FIELDS = [
+    "vaccinesAdministered",
+    "vaccinesDistributed",
+    "vaccinationsInitiated",
+    "vaccinationsCompleted",
+    "vaccinationsAdditionalDose",
+]
+METRICS_VACCINATION_FIELDS = [
+    "vaccinationsInitiatedRatio",
+    "vaccinationsCompletedRatio",
+    "vaccinationsAdditionalDoseRatio",
+]
+
+# Source of each actuals field, used by `_build_actuals` and for the actuals timeseries. Nested
+# fields are named with api_v2_json.NESTED_FIELD_SEPARATOR.
+ACTUALS_FIELD_TO_COMMON_FIELD = {
+    "cases": CommonFields.CASES,
+    "deaths": CommonFields.DEATHS,
+    "positiveTests": CommonFields.POSITIVE_TESTS,
+    "negativeTests": CommonFields.NEGATIVE_TESTS,
+    "contactTracers": CommonFields.CONTACT_TRACERS_COUNT,
+    "hospitalBeds.capacity": CommonFields.STAFFED_BEDS,
+    "hospitalBeds.currentUsageCovid": CommonFields.CURRENT_HOSPITALIZED,
+    "hospitalBeds.currentUsageTotal": CommonFields.HOSPITAL_BEDS_IN_USE_ANY,
+    "hospitalBeds.weeklyCovidAdmissions": CommonFields.WEEKLY_NEW_HOSPITAL_ADMISSIONS_COVID,
+    "hsaHospitalBeds.capacity": CommonFields.STAFFED_BEDS_HSA,
+    "hsaHospitalBeds.currentUsageCovid": CommonFields.CURRENT_HOSPITALIZED_HSA,
+    "hsaHospitalBeds.currentUsageTotal": CommonFields.HOSPITAL_BEDS_IN_USE_ANY_HSA,
+    "hsaHospitalBeds.weeklyCovidAdmissions": CommonFields.WEEKLY_NEW_HOSPITAL_ADMISSIONS_COVID_HSA,
+    "icuBeds.capacity": CommonFields.ICU_BEDS,
+    "icuBeds.currentUsageCovid": CommonFields.CURRENT_ICU,
+    "icuBeds.currentUsageTotal": CommonFields.CURRENT_ICU_TOTAL,
+    "hsaIcuBeds.capacity": CommonFields.ICU_BEDS_HSA,
+    "hsaIcuBeds.currentUsageCovid": CommonFields.CURRENT_ICU_HSA,
+    "hsaIcuBeds.currentUsageTotal": CommonFields.CURRENT_ICU_TOTAL_HSA,
+    "newCases": CommonFields.NEW_CASES,
+    "newDeaths": CommonFields.NEW_DEATHS,
+    "vaccinesDistributed": CommonFields.VACCINES_DISTRIBUTED,
+    "vaccinationsInitiated": CommonFields.VACCINATIONS_INITIATED,
+    "vaccinationsCompleted": CommonFields.VACCINATIONS_COMPLETED,
+    "vaccinationsAdditionalDose": CommonFields.VACCINATIONS_ADDITIONAL_DOSE,
+    "vaccinesAdministered": CommonFields.VACCINES_ADMINISTERED,
+}
+
 
 def _build_distributions(
     distributions: Dict[str, Dict[str, int]]
@@ -76,50 +121,22 @@ def _build_actuals(actual_data: dict, distributions_by_field: Optional[Dict] = N
         distributions_by_field.get(CommonFields.VACCINATIONS_INITIATED, {})
     )
 
+    fields = {}
+    for api_field, common_field in ACTUALS_FIELD_TO_COMMON_FIELD.items():
+        value = actual_data.get(common_field)
+        name, _, nested_name = api_field.partition(api_v2_json.NESTED_FIELD_SEPARATOR)
+        if nested_name:
+            fields.setdefault(name, {})[nested_name] = value
+        else:
+            fields[name] = value
+
     # HACK: Unbreak Nebraska counties.
-    vaccinations_initiated = actual_data.get(CommonFields.VACCINATIONS_INITIATED)
+    vaccinations_initiated = fields["vaccinationsInitiated"]
     if vaccinations_initiated and isinf(vaccinations_initiated):
-        vaccinations_initiated = None
+        fields["vaccinationsInitiated"] = None
 
     return Actuals(
-        cases=actual_data.get(CommonFields.CASES),
-        deaths=actual_data.get(CommonFields.DEATHS),
-        positiveTests=actual_data.get(CommonFields.POSITIVE_TESTS),
-        negativeTests=actual_data.get(CommonFields.NEGATIVE_TESTS),
-        contactTracers=actual_data.get(CommonFields.CONTACT_TRACERS_COUNT),
-        hospitalBeds={
-            "capacity": actual_data.get(CommonFields.STAFFED_BEDS),
-            "currentUsageCovid": actual_data.get(CommonFields.CURRENT_HOSPITALIZED),
-            "currentUsageTotal": actual_data.get(CommonFields.HOSPITAL_BEDS_IN_USE_ANY),
-            "weeklyCovidAdmissions": actual_data.get(
-                CommonFields.WEEKLY_NEW_HOSPITAL_ADMISSIONS_COVID
-            ),
-        },
-        hsaHospitalBeds={
-            "capacity": actual_data.get(CommonFields.STAFFED_BEDS_HSA),
-            "currentUsageCovid": actual_data.get(CommonFields.CURRENT_HOSPITALIZED_HSA),
-            "currentUsageTotal": actual_data.get(CommonFields.HOSPITAL_BEDS_IN_USE_ANY_HSA),
-            "weeklyCovidAdmissions": actual_data.get(
-                CommonFields.WEEKLY_NEW_HOSPITAL_ADMISSIONS_COVID_HSA
-            ),
-        },
-        icuBeds={
-            "capacity": actual_data.get(CommonFields.ICU_BEDS),
-            "currentUsageCovid": actual_data.get(CommonFields.CURRENT_ICU),
-            "currentUsageTotal": actual_data.get(CommonFields.CURRENT_ICU_TOTAL),
-        },
-        hsaIcuBeds={
-            "capacity": actual_data.get(CommonFields.ICU_BEDS_HSA),
-            "currentUsageCovid": actual_data.get(CommonFields.CURRENT_ICU_HSA),
-            "currentUsageTotal": actual_data.get(CommonFields.CURRENT_ICU_TOTAL_HSA),
-        },
-        newCases=actual_data.get(CommonFields.NEW_CASES),
-        newDeaths=actual_data.get(CommonFields.NEW_DEATHS),
-        vaccinesDistributed=actual_data.get(CommonFields.VACCINES_DISTRIBUTED),
-        vaccinationsInitiated=vaccinations_initiated,
-        vaccinationsCompleted=actual_data.get(CommonFields.VACCINATIONS_COMPLETED),
-        vaccinationsAdditionalDose=actual_data.get(CommonFields.VACCINATIONS_ADDITIONAL_DOSE),
-        vaccinesAdministered=actual_data.get(CommonFields.VACCINES_ADMINISTERED),
+        **fields,
         vaccinesAdministeredDemographics=vaccines_administered_demographics,
         vaccinationsInitiatedDemographics=vaccines_initiated_demographics,
     )
@@ -288,6 +305,38 @@ def _lookup_source_type(source_str, field_name, log) -> FieldSourceType:
     return source_enum
 
 
+def _before_vaccination_start(dates: pd.Series) -> np.ndarray:
+    return (pd.to_datetime(dates) < USA_VACCINATION_START_DATE).to_numpy()
+
+
+def _build_actuals_timeseries(
+    timeseries: OneRegionTimeseriesDataset,
+) -> List[ActualsTimeseriesRow]:
+    data = timeseries.data
+    actuals_df = pd.DataFrame(
+        {
+            api_field: data[field] if field in data.columns else None
+            for api_field, field in ACTUALS_FIELD_TO_COMMON_FIELD.items()
+        },
+        index=data.index,
+    )
+    # HACK: Unbreak Nebraska counties.
+    actuals_df["vaccinationsInitiated"] = actuals_df["vaccinationsInitiated"].replace(
+        [np.inf, -np.inf], np.nan
+    )
+    # Demographics are only included in the summary but the timeseries rows have always had
+    # these fields set to None.
+    actuals_df["vaccinesAdministeredDemographics"] = None
+    actuals_df["vaccinationsInitiatedDemographics"] = None
+    actuals_df["date"] = data[CommonFields.DATE]
+    return api_v2_json.rows_from_frame(
+        ActualsTimeseriesRow,
+        actuals_df,
+        unset_fields=ACTUALS_VACCINATION_FIELDS,
+        unset_rows=_before_vaccination_start(data[CommonFields.DATE]),
+    )
+
+
 def build_region_timeseries(
     region_summary: RegionSummary,
     timeseries: OneRegionTimeseriesDataset,
@@ -296,103 +345,36 @@ def build_region_timeseries(
     cdc_transmission_level_timeseries: pd.DataFrame,
     community_levels_timeseries: pd.DataFrame,
 ) -> RegionSummaryWithTimeseries:
-    actuals_timeseries = []
-
-    for row in timeseries.yield_records():
-        # Timeseries records don't have population
-        row[CommonFields.POPULATION] = region_summary.population
-        actual = _build_actuals(row).dict()
-
-        # Don't include vaccinations in timeseries before first possible vaccination
-        # date to not bloat timeseries.
-        if row[CommonFields.DATE] < USA_VACCINATION_START_DATE:
-            del actual["vaccinesAdministered"]
-            del actual["vaccinesDistributed"]
-            del actual["vaccinationsInitiated"]
-            del actual["vaccinationsCompleted"]
-            del actual["vaccinationsAdditionalDose"]
-
-        timeseries_row = ActualsTimeseriesRow(**actual, date=row[CommonFields.DATE])
-        actuals_timeseries.append(timeseries_row)
-
-    metrics_rows = []
-    for metric_row in metrics_timeseries.to_dict(orient="records"):
-        # Don't include vaccinations in timeseries before first possible vaccination
-        # date to not bloat timeseries.
-        if metric_row[CommonFields.DATE] < USA_VACCINATION_START_DATE:
-            del metric_row["vaccinationsInitiatedRatio"]
-            del metric_row["vaccinationsCompletedRatio"]
-            del metric_row["vaccinationsAdditionalDoseRatio"]
-        metrics_rows.append(MetricsTimeseriesRow(**metric_row))
-
-    risk_level_rows = [
-        RiskLevelTimeseriesRow(**row) for row in risk_level_timeseries.to_dict(orient="records")
-    ]
-    cdc_transmission_level_rows = [
-        CdcTransmissionLevelTimeseriesRow(**row)
-        for row in cdc_transmission_level_timeseries.to_dict(orient="records")
-    ]
-    community_levels_timeseries = community_levels_timeseries.where(
-        pd.notna(community_levels_timeseries), None
+    """Returns the summary and timeseries of a region.
+
+    Rows are built from whole columns by api_v2_json.rows_from_frame, without validating each
+    row with pydantic.
+    """
+    actuals_timeseries = _build_actuals_timeseries(timeseries)
+
+    if metrics_timeseries.empty:
+        metrics_rows = []
+    else:
+        metrics_rows = api_v2_json.rows_from_frame(
+            MetricsTimeseriesRow,
+            metrics_timeseries,
+            unset_fields=METRICS_VACCINATION_FIELDS,
+            unset_rows=_before_vaccination_start(metrics_timeseries[CommonFields.DATE]),
+        )
+
+    risk_level_rows = api_v2_json.rows_from_frame(RiskLevelTimeseriesRow, risk_level_timeseries)
+    cdc_transmission_level_rows = api_v2_json.rows_from_frame(
+        CdcTransmissionLevelTimeseriesRow, cdc_transmission_level_timeseries
+    )
+    community_levels_rows = api_v2_json.rows_from_frame(
+        CommunityLevelsTimeseriesRow, community_levels_timeseries
     )
-    community_levels_rows = [
-        CommunityLevelsTimeseriesRow(**row)
-        for row in community_levels_timeseries.to_dict(orient="records")
-    ]
     region_summary_data = {key: getattr(region_summary, key) for (key, _) in region_summary}
-    return RegionSummaryWithTimeseries(
+    return RegionSummaryWithTimeseries.construct(
         **region_summary_data,
         actualsTimeseries=actuals_timeseries,
         metricsTimeseries=metrics_rows,
         riskLevelsTimeseries=risk_level_rows,
         cdcTransmissionLevelTimeseries=cdc_transmission_level_rows,
-        communityLevelsTimeseries=community_levels_rows
+        communityLevelsTimeseries=community_levels_rows,
     )
-
-
-def build_bulk_flattened_timeseries(
-    bulk_timeseries: AggregateRegionSummaryWithTimeseries,
-) -> AggregateFlattenedTimeseries:
-    rows = []
-    for region_timeseries in bulk_timeseries.__root__:
-        # Iterate through each state or county in data, adding summary data to each
-        # timeseries row.
-        summary_data = {
-            "country": region_timeseries.country,
-            "county": region_timeseries.county,
-            "state": region_timeseries.state,
-            "fips": region_timeseries.fips,
-            "lat": region_timeseries.lat,
-            "long": region_timeseries.long,
-            "locationId": region_timeseries.locationId,
-            "lastUpdatedDate": datetime.utcnow(),
-            "hsa": region_timeseries.hsa,
-            "hsaName": region_timeseries.hsaName,
-            "hsaPopulation": region_timeseries.hsaPopulation,
-        }
-        actuals_by_date = {row.date: row for row in region_timeseries.actualsTimeseries}
-        metrics_by_date = {row.date: row for row in region_timeseries.metricsTimeseries}
-        risk_levels_by_date = {row.date: row for row in region_timeseries.riskLevelsTimeseries}
-        cdc_transmission_levels_by_date = {
-            row.date: row for row in region_timeseries.cdcTransmissionLevelTimeseries
-        }
-        community_levels_by_date = {
-            row.date: row for row in region_timeseries.communityLevelsTimeseries
-        }
-        dates = sorted({*metrics_by_date.keys(), *actuals_by_date.keys()})
-        for date in dates:
-            data = {
-                "date": date,
-                "actuals": actuals_by_date.get(date),
-                "metrics": metrics_by_date.get(date),
-                "riskLevels": risk_levels_by_date.get(date),
-                "cdcTransmissionLevel": cdc_transmission_levels_by_date.get(
-                    date
-                ).cdcTransmissionLevel,
-                "communityLevels": community_levels_by_date.get(date),
-            }
-            data.update(summary_data)
-            row = RegionTimeseriesRowWithHeader(**data)
-            rows.append(row)
-
-    return AggregateFlattenedTimeseries(__root__=rows)
@@ -1,10 +1,21 @@
-from typing import List, Optional
+from typing import IO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import concurrent.futures
+import contextlib
 import enum
+import hashlib
+import json
 import os
 import pathlib
 import csv
 import io
 import logging
+import queue
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+import brotli
 import pandas as pd
 
 _logger = logging.getLogger(__name__)
@@ -89,24 +100,36 @@ def write_nested_csv(
     all_columns = list(flatten_dict(first_row).keys())
     header = header or all_columns
 
-    header_set = set(header)
     _logger.info(f"Writing to {output_path}")
     with output_path.open("w") as csvfile:
-        writer = csv.DictWriter(csvfile, header)
-        writer.writeheader()
+        _write_nested_rows(data, csvfile, header)
+
 
-        flattened_data = [flatten_dict(row) for row in data]
+def write_nested_csv_to_file(data: List[dict], csvfile: IO[str], header: List[str]):
+    """Writes list of data as a nested csv to an open file, with columns in order of header."""
+    if not data:
+        raise ValueError("Cannot upload a 0 length list.")
 
-        for flattened_row in flattened_data:
-            # if a nested key is optional (i.e. {a: Optional[dict]}) and there is no
-            # value for a, (i.e. {a: None}), don't write a, as it's not in the header.
-            flattened_row = {k: v for k, v in flattened_row.items() if k in header_set}
-            flattened_row = {k: v for k, v in flattened_row.items() if not pd.isnull(v)}
-            flattened_row = {
-                k: v.value if isinstance(v, enum.Enum) else v for k, v in flattened_row.items()
-            }
+    _write_nested_rows(data, csvfile, header)
 
-            writer.writerow(flattened_row)
+
+def _write_nested_rows(data: List[dict], csvfile: IO[str], header: List[str]):
+    header_set = set(header)
+    writer = csv.DictWriter(csvfile, header)
+    writer.writeheader()
+
+    flattened_data = [flatten_dict(row) for row in data]
+
+    for flattened_row in flattened_data:
+        # if a nested key is optional (i.e. {a: Optional[dict]}) and there is no
+        # value for a, (i.e. {a: None}), don't write a, as it's not in the header.
+        flattened_row = {k: v for k, v in flattened_row.items() if k in header_set}
+        flattened_row = {k: v for k, v in flattened_row.items() if not pd.isnull(v)}
+        flattened_row = {
+            k: v.value if isinstance(v, enum.Enum) else v for k, v in flattened_row.items()
+        }
+
+        writer.writerow(flattened_row)
 
 
 def upload_json(key_name, json: str, output_dir: str):
@@ -158,3 +181,372 @@ def remove_root_wrapper(obj: dict):
         results[key] = value
 
     return results
+
+
+# Decides if a streamed file, given as its path and the written content, is kept.
+ShouldWriteFn = Callable[[pathlib.Path, IO[bytes]], bool]
+
+
+class DirectorySink:
+    """Writes each deployed file to its path."""
+
+    def write(self, path: pathlib.Path, data: bytes):
+        path.write_bytes(data)
+
+    def exists(self, path: pathlib.Path) -> bool:
+        return path.exists()
+
+    @contextlib.contextmanager
+    def open(
+        self, path: pathlib.Path, should_write: Optional[ShouldWriteFn] = None
+    ) -> Iterator[IO[bytes]]:
+        if should_write is None:
+            with path.open("wb") as f:
+                yield f
+            return
+
+        # Write next to the destination so the file is only replaced if it should be written.
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                yield f
+            with tmp_path.open("rb") as f:
+                keep = should_write(path, f)
+            if keep:
+                os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def close(self):
+        pass
+
+
+class TarSink:
+    """Writes deployed files as members of a single tar archive, named relative to `root`.
+
+    Uploading one archive avoids creating tens of thousands of small files on the local disk.
+    The previously published files can't be seen from the archive, so it can't be used with a
+    ContentManifest.
+    """
+
+    def __init__(self, archive_path: pathlib.Path, root: pathlib.Path):
+        self.root = root
+        self._tar = tarfile.open(archive_path, "w")
+        # TarFile appends members to one stream so writes from worker threads are serialized.
+        self._lock = threading.Lock()
+
+    def _add(self, path: pathlib.Path, size: int, fileobj: IO[bytes]):
+        info = tarfile.TarInfo(str(path.relative_to(self.root)))
+        info.size = size
+        info.mtime = int(time.time())
+        with self._lock:
+            self._tar.addfile(info, fileobj)
+
+    def write(self, path: pathlib.Path, data: bytes):
+        self._add(path, len(data), io.BytesIO(data))
+
+    @contextlib.contextmanager
+    def open(
+        self, path: pathlib.Path, should_write: Optional[ShouldWriteFn] = None
+    ) -> Iterator[IO[bytes]]:
+        # Streamed files are spooled to a temporary file because a tar member header includes
+        # the size of the member.
+        with tempfile.TemporaryFile() as spool:
+            yield spool
+            size = spool.tell()
+            spool.seek(0)
+            if should_write and not should_write(path, spool):
+                return
+            spool.seek(0)
+            self._add(path, size, spool)
+
+    def close(self):
+        self._tar.close()
+
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+
+class Compression(enum.Enum):
+    """Precompressed sibling of a deployed file, named with the file name and the enum value."""
+
+    GZIP = ".gz"
+    BROTLI = ".br"
+
+    def sibling(self, path: pathlib.Path) -> pathlib.Path:
+        return path.with_name(path.name + self.value)
+
+    def compressor(self):
+        """Returns an object with `compress(data)` and `flush()`, like zlib.compressobj."""
+        if self is Compression.GZIP:
+            # A zlib gzip stream has a constant header, unlike the gzip module which includes
+            # the time, so unchanged files compress to the same bytes.
+            return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return _BrotliCompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self.compressor()
+        return compressor.compress(data) + compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _CompressingWriter(io.RawIOBase):
+    """Compresses bytes written to it into each output from one background thread.
+
+    The thread belongs to this writer, not to a shared pool, so any number of writers may be open
+    at once without waiting for each other. At most `max_queued_chunks` written chunks wait for
+    the compressors, bounding memory.
+    """
+
+    def __init__(
+        self, outputs: Sequence[Tuple[Compression, IO[bytes]]], max_queued_chunks: int = 8,
+    ):
+        self._queue = queue.Queue(maxsize=max_queued_chunks)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        compressors = [(compression.compressor(), output) for compression, output in outputs]
+        self._future = self._executor.submit(self._run, compressors)
+
+    def _run(self, compressors):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            for compressor, output in compressors:
+                output.write(compressor.compress(chunk))
+        for compressor, output in compressors:
+            output.write(compressor.flush())
+
+    def writable(self) -> bool:
+        return True
+
+    def _put(self, chunk: Optional[bytes]):
+        while True:
+            try:
+                self._queue.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                if self._future.done():
+                    # The compressor failed and won't empty the queue.
+                    return
+
+    def write(self, data) -> int:
+        if self._future.done():
+            self._future.result()
+        # Copy because the caller may reuse the buffer.
+        self._put(bytes(data))
+        return len(data)
+
+    def finish(self):
+        """Waits for the compressors to write all data, raising the error if one failed."""
+        self._put(None)
+        self._executor.shutdown(wait=True)
+        self._future.result()
+
+
+class _TeeWriter(io.RawIOBase):
+    """Writes bytes written to it to several outputs."""
+
+    def __init__(self, outputs: List[IO[bytes]]):
+        self._outputs = outputs
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        for output in self._outputs:
+            output.write(data)
+        return len(data)
+
+
+class ContentManifest:
+    """SHA-256 hashes of the files deployed under `root`, used to skip rewriting unchanged files.
+
+    The manifest of the previous deploy is read from `path`, by default a file next to `root`
+    named with MANIFEST_SUFFIX, so that it isn't published with the deployed files. Files written
+    by this deploy replace their entries and other entries are kept, so a deploy of a subset of
+    regions doesn't force the next full deploy to rewrite everything.
+    """
+
+    MANIFEST_SUFFIX = ".deploy-manifest.json"
+
+    def __init__(
+        self,
+        root: pathlib.Path,
+        path: Optional[pathlib.Path] = None,
+        changed_files_path: Optional[pathlib.Path] = None,
+    ):
+        self.root = root
+        self.path = path or root.with_name(root.name + self.MANIFEST_SUFFIX)
+        self.changed_files_path = changed_files_path
+        self._previous = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self._current: Dict[str, str] = {}
+        self._changed: List[str] = []
+        self._lock = threading.Lock()
+
+    def update(self, path: pathlib.Path, digest: str) -> bool:
+        """Records the hash of the new content of path and returns True if it changed."""
+        key = str(path.relative_to(self.root))
+        with self._lock:
+            self._current[key] = digest
+            changed = self._previous.get(key) != digest
+            if changed:
+                self._changed.append(key)
+        return changed
+
+    @property
+    def changed_files(self) -> List[str]:
+        return sorted(self._changed)
+
+    def save(self):
+        manifest = {**self._previous, **self._current}
+        self.path.write_text(json.dumps(manifest, sort_keys=True))
+        if self.changed_files_path:
+            self.changed_files_path.write_text("".join(f"{key}\n" for key in self.changed_files))
+        _logger.info(f"Deployed {len(self._changed)} changed of {len(self._current)} files")
+
+
+def _file_digest(f: IO[bytes]) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DeployWriter:
+    """Writes many deployed files from a pool of threads.
+
+    Payloads passed to `write` are collected in batches which are written by worker threads,
+    so the caller can continue serializing the next regions. At most `max_pending_batches` are
+    queued at once, bounding the memory held by payloads waiting to be written. Large files are
+    streamed with `open`, from the calling thread. Errors raised by workers are raised by a
+    later `write` or by `close`.
+
+    Args:
+        sink: Where files are written, by default to their paths.
+        max_workers: Number of threads writing batches.
+        batch_size: Number of files written by each worker task.
+        max_pending_batches: Maximum number of batches submitted but not yet written.
+        manifest: If set, files with the same content as in the previous deploy are not written.
+        compressions: Precompressed siblings written with every file. Small files are compressed
+          by the worker threads. Each streamed file is compressed while it is written by a
+          thread of its own.
+    """
+
+    def __init__(
+        self,
+        sink: Union[DirectorySink, TarSink, None] = None,
+        *,
+        max_workers: int = 8,
+        batch_size: int = 64,
+        max_pending_batches: int = 32,
+        manifest: Optional[ContentManifest] = None,
+        compressions: Sequence[Compression] = (),
+    ):
+        if manifest and isinstance(sink, TarSink):
+            raise ValueError("Skipping unchanged files is not supported when writing an archive")
+        self._sink = sink or DirectorySink()
+        self._manifest = manifest
+        self._compressions = compressions
+        self._batch_size = batch_size
+        self._batch: List[Tuple[pathlib.Path, bytes]] = []
+        self._pending = threading.BoundedSemaphore(max_pending_batches)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._futures: List[concurrent.futures.Future] = []
+
+    def write(self, path: pathlib.Path, data: Union[str, bytes]):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._batch.append((path, data))
+        if len(self._batch) >= self._batch_size:
+            self._submit_batch()
+
+    def _open_bytes(self, path: pathlib.Path) -> contextlib.AbstractContextManager:
+        if self._manifest is None:
+            return self._sink.open(path)
+        return self._sink.open(path, lambda path, f: self._should_write(path, _file_digest(f)))
+
+    @contextlib.contextmanager
+    def open(self, path: pathlib.Path) -> Iterator[IO[str]]:
+        """Returns a context manager of a text file that is written to `path` when it exits."""
+        with contextlib.ExitStack() as stack:
+            outputs = [stack.enter_context(self._open_bytes(path))]
+            if self._compressions:
+                siblings = [
+                    (compression, stack.enter_context(self._open_bytes(compression.sibling(path))))
+                    for compression in self._compressions
+                ]
+                compressing_writer = _CompressingWriter(siblings)
+                # Runs before the siblings are closed, also when writing fails.
+                stack.callback(compressing_writer.finish)
+                outputs.append(compressing_writer)
+            text = io.TextIOWrapper(
+                io.BufferedWriter(_TeeWriter(outputs), buffer_size=1 << 20),
+                encoding="utf-8",
+                newline="",
+            )
+            yield text
+            text.flush()
+            text.detach()
+
+    def _write_file(self, path: pathlib.Path, data: bytes):
+        if self._manifest and not self._should_write(path, hashlib.sha256(data).hexdigest()):
+            return
+        self._sink.write(path, data)
+
+    def _should_write(self, path: pathlib.Path, digest: str) -> bool:
+        changed = self._manifest.update(path, digest)
+        return changed or not self._sink.exists(path)
+
+    def _write_batch(self, batch: List[Tuple[pathlib.Path, bytes]]):
+        try:
+            for path, data in batch:
+                self._write_file(path, data)
+                for compression in self._compressions:
+                    self._write_file(compression.sibling(path), compression.compress(data))
+        finally:
+            self._pending.release()
+
+    def _submit_batch(self):
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        # Blocks while max_pending_batches are waiting for a worker.
+        self._pending.acquire()
+        self._futures.append(self._executor.submit(self._write_batch, batch))
+        # Drop finished batches, raising the first error.
+        while self._futures and self._futures[0].done():
+            self._futures.pop(0).result()
+
+    def flush(self):
+        """Waits until all files passed to `write` are written."""
+        self._submit_batch()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+            self._sink.close()
+        if self._manifest:
+            self._manifest.save()
+
+    def __enter__(self) -> "DeployWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
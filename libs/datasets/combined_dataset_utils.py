@@ -35,3 +35,16 @@ def persist_dataset(
     dataset.write_to_dataset_pointer(dataset_pointer)
     dataset_pointer.save(data_directory)
     return dataset_pointer
+
+
+def read_combined_raw() -> timeseries.MultiRegionDataset:
+    """Reads the combined dataset saved by `data update` before filtering and aggregation."""
+    if dataset_utils.COMBINED_RAW_SNAPSHOT_PATH.exists():
+        return timeseries.MultiRegionDataset.from_snapshot(dataset_utils.COMBINED_RAW_SNAPSHOT_PATH)
+    _logger.warning(
+        "Snapshot not found, reading older pickle",
+        path=str(dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH),
+    )
+    return timeseries.MultiRegionDataset.from_compressed_pickle(
+        dataset_utils.COMBINED_RAW_PICKLE_GZ_PATH
+    )
@@ -1,5 +1,6 @@
 import abc
 import pathlib
+from typing import Iterable
 from typing import List
 from typing import Optional
 from typing import Union
@@ -137,7 +138,7 @@ class CanScraperBase(DataSource, abc.ABC, metaclass=_CanScraperBaseMeta):
     @staticmethod
     @lru_cache(None)
     def _get_covid_county_dataset() -> ccd_helpers.CanScraperLoader:
-        return ccd_helpers.CanScraperLoader.load_from_gcs()
+        return ccd_helpers.CanScraperLoader.load()
 
     @classmethod
     @lru_cache(None)
@@ -167,3 +168,21 @@ class CanScraperBase(DataSource, abc.ABC, metaclass=_CanScraperBaseMeta):
             timeseries.tag_df_add_all_bucket_in_place(source_tag_df)
             ds = ds.append_tag_df(source_tag_df)
         return ds
+
+
+def index_can_scraper_variables(data_source_classes: Iterable[type]) -> None:
+    """Finds the rows of the variables of all CanScraperBase subclasses in `data_source_classes`.
+
+    The CAN Scraper data is loaded once and shared by all CanScraperBase subclasses. Calling this
+    before `make_dataset` finds the rows of every source with one scan of the shared data instead
+    of one scan per source.
+    """
+    variables_by_loader = {}
+    for cls in data_source_classes:
+        if isinstance(cls, type) and issubclass(cls, CanScraperBase):
+            loader = cls._get_covid_county_dataset()
+            # Test subclasses may override _get_covid_county_dataset so group by loader.
+            _, variables = variables_by_loader.setdefault(id(loader), (loader, []))
+            variables.extend(v for v in cls.VARIABLES if v.common_field)
+    for loader, variables in variables_by_loader.values():
+        loader.index_variables(variables)
@@ -1,8 +1,9 @@
 import functools
-from typing import Optional, Type
+from typing import Optional, Tuple, Type
 import enum
 import logging
 import pathlib
+import numpy as np
 import pandas as pd
 import structlog.stdlib
 from datapublic.common_fields import CommonFields
@@ -59,6 +60,9 @@ TEST_COMBINED_STATIC_CSV_PATH = pathlib.Path(
 )
 MANUAL_FILTER_REMOVED_WIDE_DATES_CSV_PATH = DATA_DIRECTORY / "manual_filter_removed-wide-dates.csv"
 MANUAL_FILTER_REMOVED_STATIC_CSV_PATH = DATA_DIRECTORY / "manual_filter_removed-static.csv"
+COMBINED_RAW_SNAPSHOT_PATH = DATA_DIRECTORY / "combined-raw.pkl.zst"
+# Written by older versions of `data update`. Only read when COMBINED_RAW_SNAPSHOT_PATH is missing
+# and deleted when the snapshot is written.
 COMBINED_RAW_PICKLE_GZ_PATH = DATA_DIRECTORY / "combined-raw.pkl.gz"
 
 
@@ -355,6 +359,40 @@ def get_geo_data() -> pd.DataFrame:
     )
 
 
+@functools.lru_cache(None)
+def get_location_attributes() -> pd.DataFrame:
+    """Returns the aggregate_level and state of every location in geo-data.csv as categoricals.
+
+    Built once so that region masks are evaluated with comparisons of small integer codes.
+    """
+    geo_data = get_geo_data()
+    return pd.DataFrame(
+        {
+            CommonFields.AGGREGATE_LEVEL: geo_data[CommonFields.AGGREGATE_LEVEL].astype("category"),
+            CommonFields.STATE: geo_data[CommonFields.STATE].astype("category"),
+        },
+        index=geo_data.index,
+    )
+
+
+@functools.lru_cache(None)
+def location_ids_matching(
+    aggregation_level: Optional[AggregationLevel], states: Optional[Tuple[str, ...]]
+) -> pd.Index:
+    """Returns the location_id of locations in geo-data.csv with the given level and states.
+
+    Selects the same locations as `make_rows_key(get_geo_data(), aggregation_level=...,
+    states=...)`. Falsy arguments match all locations.
+    """
+    attributes = get_location_attributes()
+    mask = np.ones(len(attributes), dtype=bool)
+    if aggregation_level:
+        mask &= (attributes[CommonFields.AGGREGATE_LEVEL] == aggregation_level.value).to_numpy()
+    if states:
+        mask &= attributes[CommonFields.STATE].isin(states).to_numpy()
+    return attributes.index[mask]
+
+
 @functools.lru_cache(None)
 def get_fips_to_location() -> pd.DataFrame:
     return (
@@ -163,15 +163,15 @@ def aggregate_regions(
     if CommonFields.AGGREGATE_LEVEL in dataset_in.static.columns:
         # location_id_to_level returns an AggregationLevel enum, but we use the str in DataFrames.
         # These are not equivalent so put the `value` attribute in static_agg.
-        static_agg[CommonFields.AGGREGATE_LEVEL] = (
-            static_agg.index.get_level_values(CommonFields.LOCATION_ID)
-            .map(pipeline.location_id_to_level)
-            .map(lambda l: l.value)
+        static_agg[CommonFields.AGGREGATE_LEVEL] = pipeline.map_location_ids(
+            static_agg.index.get_level_values(CommonFields.LOCATION_ID),
+            lambda location_id: pipeline.location_id_to_level(location_id).value,
         )
     if CommonFields.FIPS in dataset_in.static.columns:
-        static_agg[CommonFields.FIPS] = static_agg.index.get_level_values(
-            CommonFields.LOCATION_ID
-        ).map(pipeline.location_id_to_fips)
+        static_agg[CommonFields.FIPS] = pipeline.map_location_ids(
+            static_agg.index.get_level_values(CommonFields.LOCATION_ID),
+            pipeline.location_id_to_fips,
+        )
 
     # TODO(tom): Copy tags (annotations and provenance) to the return value.
     return MultiRegionDataset(timeseries=timeseries_agg, static=static_agg)
@@ -1,11 +1,17 @@
 """Helpers to access and query data loaded from the CAN Scraper parquet file.
 """
+from typing import Dict
+from typing import Iterable
 from typing import List
 import enum
 import dataclasses
+import os
+import pathlib
 from typing import Optional
 from typing import Tuple
+from typing import Union
 import more_itertools
+import numpy as np
 import structlog
 import pandas as pd
 from datapublic.common_fields import FieldNameAndCommonField
@@ -74,14 +80,22 @@ class ScraperVariable:
     sex: str = "all"
 
 
+def _variable_key(variable: ScraperVariable) -> Tuple[str, str, str, str]:
+    """Returns the VARIABLE_KEY_FIELDS values of rows of `variable`."""
+    return variable.provider, variable.variable_name, variable.measurement, variable.unit
+
+
 def _fips_from_int(param: pd.Series):
     """Transform FIPS from an int64 to a string of 2 or 5 chars.
 
     See https://github.com/valorumdata/covid_county_data.py/issues/3
 
-    Copied from covid-data-public/scripts/helpers.py
+    Same as `f"{v:0>{1 if v == 0 else 2 if v < 100 else 5}}"` from
+    covid-data-public/scripts/helpers.py, formatted with string operations on the whole column.
     """
-    return param.apply(lambda v: f"{v:0>{1 if v == 0 else 2 if v < 100 else 5}}")
+    as_str = param.astype(str)
+    padded = as_str.str.zfill(5).where(param >= 100, as_str.str.zfill(2))
+    return padded.where(param != 0, as_str)
 
 
 DEMOGRAPHIC_FIELDS = [Fields.AGE, Fields.RACE, Fields.ETHNICITY, Fields.SEX]
@@ -97,56 +111,93 @@ class BadLocationId(UserWarning):
     pass
 
 
+# Fields that identify a variable in the parquet file. A ScraperVariable selects observations
+# with these fields.
+VARIABLE_KEY_FIELDS = [Fields.PROVIDER, Fields.VARIABLE_NAME, Fields.MEASUREMENT, Fields.UNIT]
+
+# Fields with few unique values, stored as categoricals to reduce memory use and make comparisons
+# fast.
+CATEGORICAL_FIELDS = VARIABLE_KEY_FIELDS + [
+    Fields.LOCATION_ID,
+    Fields.SOURCE_URL,
+    Fields.SOURCE_NAME,
+]
+
+# Fields read from the parquet file.
+_UNUSED_FIELDS = (Fields.LOCATION_TYPE, Fields.LAST_UPDATED)
+LOADED_FIELDS = [field for field in Fields if field not in _UNUSED_FIELDS]
+
+# Environment variable with a local path of the parquet file, to avoid downloading it each time.
+PARQUET_PATH_ENV = "CAN_SCRAPER_PARQUET_PATH"
+
+
 @dataclass_with_default_init(frozen=True)
 class CanScraperLoader:
 
+    # The parquet file with string dimensions as categoricals and the demographic fields replaced
+    # by a DEMOGRAPHIC_BUCKET column.
     all_df: pd.DataFrame
-    indexed_df: pd.DataFrame
+
+    # The VARIABLE_KEY_FIELDS of each row of all_df, built once and shared by all queries.
+    variable_keys: pd.MultiIndex
+
+    # Positions in all_df of the rows of each variable key found by `index_variables`. Filled in
+    # lazily, so that the variables of all data sources can be found with one scan.
+    _rows_by_variable_key: Dict[Tuple[str, str, str, str], np.ndarray] = dataclasses.field(
+        default_factory=dict, repr=False, compare=False
+    )
 
     # noinspection PyMissingConstructor
     def __init__(self, all_df: pd.DataFrame):
-        # Always pre-populate indexed_df property. When it was a cached_property there were
-        # mysterious consistent occurrences of
-        #   worker 'gw1' crashed while running
-        #   'tests/libs/datasets/data_source_test.py::test_state_providers_smoke_test'
+        CanScraperLoader._check_location_id(all_df)
+        prepared_df = CanScraperLoader._prepare_df(all_df)
         self.__default_init__(  # pylint: disable=E1101
-            all_df=all_df, indexed_df=CanScraperLoader._make_indexed_df(all_df)
+            all_df=prepared_df,
+            variable_keys=pd.MultiIndex.from_frame(prepared_df.loc[:, VARIABLE_KEY_FIELDS]),
         )
 
     @staticmethod
-    def _make_indexed_df(all_df: pd.DataFrame) -> pd.DataFrame:
-        """The parquet file with many fields moved into a MultiIndex and demographic fields
-        transformed into a single string."""
-        # Make a Series of bucket short names with a MultiIndex of the unique DEMOGRAPHIC_FIELDS.
-        # There are only a few (~50) unique fields among the millions of rows. `apply`ing
-        # make_short_name to every row takes much longer than using a join to copy from this series.
-        # This pattern of finding unique values and copying with a join is also used in
-        # taglib.Series.attribute_df_to_json_series.
-        bucket_short_names = (
-            all_df.loc[:, DEMOGRAPHIC_FIELDS]
-            .drop_duplicates()
-            .set_index(DEMOGRAPHIC_FIELDS, drop=False)
-            .apply(make_short_name, axis=1, result_type="reduce")
-            .rename(PdFields.DEMOGRAPHIC_BUCKET)
+    def _prepare_df(all_df: pd.DataFrame) -> pd.DataFrame:
+        """Returns all_df with categorical dimensions and the demographic fields transformed into
+        a single string."""
+        df = all_df.drop(columns=DEMOGRAPHIC_FIELDS)
+        for field in CATEGORICAL_FIELDS:
+            if field in df.columns and not pd.api.types.is_categorical_dtype(df[field]):
+                df[field] = df[field].astype("category")
+
+        # There are only a few (~50) unique combinations of DEMOGRAPHIC_FIELDS among the millions
+        # of rows. Make the short name of each once and copy it to the rows using the codes of the
+        # combinations.
+        combination_codes, combinations = pd.factorize(
+            pd.MultiIndex.from_frame(all_df.loc[:, DEMOGRAPHIC_FIELDS])
         )
-        CanScraperLoader._check_location_id(all_df)
-        # Use `join(other, on=...)` because it preserves the indexed_df index
-        rv = (
-            all_df.join(bucket_short_names, on=DEMOGRAPHIC_FIELDS)
-            .drop(columns=DEMOGRAPHIC_FIELDS)
-            .set_index(
-                [
-                    Fields.PROVIDER,
-                    Fields.VARIABLE_NAME,
-                    Fields.MEASUREMENT,
-                    Fields.UNIT,
-                    Fields.LOCATION_ID,
-                    PdFields.DEMOGRAPHIC_BUCKET,
-                    Fields.DATE,
-                ]
-            )
+        short_names = [
+            make_short_name(pd.Series(combination, index=DEMOGRAPHIC_FIELDS))
+            for combination in combinations
+        ]
+        name_codes, unique_names = pd.factorize(short_names)
+        df[PdFields.DEMOGRAPHIC_BUCKET] = pd.Categorical.from_codes(
+            name_codes[combination_codes], categories=unique_names
         )
-        return rv
+        return df
+
+    def index_variables(self, variables: Iterable[ScraperVariable]) -> None:
+        """Finds the rows of all `variables` not already indexed with one scan of all_df.
+
+        Call this with the variables of every data source before querying them to find their rows
+        together instead of scanning all_df once per `query_multiple_variables` call.
+        """
+        keys = more_itertools.unique_everseen(_variable_key(v) for v in variables)
+        new_keys = [key for key in keys if key not in self._rows_by_variable_key]
+        if not new_keys:
+            return
+        query_keys = pd.MultiIndex.from_tuples(new_keys, names=VARIABLE_KEY_FIELDS)
+        positions = query_keys.get_indexer(self.variable_keys)
+        # Group the rows by position in new_keys. Rows not matching any key (-1) sort first.
+        order = np.argsort(positions, kind="stable")
+        boundaries = np.searchsorted(positions[order], np.arange(len(new_keys) + 1))
+        for i, key in enumerate(new_keys):
+            self._rows_by_variable_key[key] = order[boundaries[i] : boundaries[i + 1]]
 
     @staticmethod
     def _check_location_id(all_df: pd.DataFrame):
@@ -201,37 +252,35 @@ class CanScraperLoader:
             assert v.measurement == ""
             assert v.unit == ""
 
-        selected_data = {}
-        indexed_df = self.indexed_df
-        assert indexed_df.index.names[0:4] == [
-            Fields.PROVIDER,
-            Fields.VARIABLE_NAME,
-            Fields.MEASUREMENT,
-            Fields.UNIT,
-        ]
         for v in variables_to_return:
             # Must be set when copying to the return value
             assert v.measurement
             assert v.unit
 
-            try:
-                selected_data[v.common_field] = indexed_df.loc(axis=0)[
-                    v.provider, v.variable_name, v.measurement, v.unit
-                ]
-            except KeyError:
-                pass
-
-        combined_rows = pd.concat(selected_data, axis=0, names=[PdFields.VARIABLE])
-
-        unknown_columns = set(combined_rows.columns) - set(Fields) - {PdFields.DEMOGRAPHIC_BUCKET}
+        unknown_columns = set(self.all_df.columns) - set(Fields) - {PdFields.DEMOGRAPHIC_BUCKET}
         if unknown_columns:
             raise ValueError(f"Unknown column. Add {unknown_columns} to Fields.")
 
+        self.index_variables(variables_to_return)
+        variable_rows = [self._rows_by_variable_key[_variable_key(v)] for v in variables_to_return]
+        common_fields = np.array([v.common_field for v in variables_to_return], dtype=object)
+        selected = self.all_df.take(np.concatenate([[], *variable_rows]).astype(np.int64))
+        selected = selected.drop(columns=VARIABLE_KEY_FIELDS)
+        selected[PdFields.VARIABLE] = np.repeat(common_fields, [len(r) for r in variable_rows])
+        # The selected rows are a small part of the file. Return plain values, like the other
+        # data sources, instead of the categories of the whole file.
+        for column in selected.columns:
+            if pd.api.types.is_categorical_dtype(selected[column]):
+                selected[column] = selected[column].astype(object)
+
         indexed_rows = (
-            combined_rows.rename_axis(
-                index={Fields.DATE: CommonFields.DATE, Fields.LOCATION_ID: CommonFields.LOCATION_ID}
+            selected.rename(
+                columns={
+                    Fields.DATE: CommonFields.DATE,
+                    Fields.LOCATION_ID: CommonFields.LOCATION_ID,
+                }
             )
-            .reorder_levels(
+            .set_index(
                 [
                     CommonFields.LOCATION_ID,
                     PdFields.VARIABLE,
@@ -263,6 +312,8 @@ class CanScraperLoader:
         provider_name = more_itertools.one(set(v.provider for v in variables))
         provider_mask = self.all_df[Fields.PROVIDER] == provider_name
         counts = self.all_df.loc[provider_mask, Fields.VARIABLE_NAME].value_counts()
+        # value_counts of a categorical includes categories that are only used by other providers.
+        counts = counts.loc[counts > 0]
         variables_by_name = {var.variable_name: var for var in variables}
         for variable_name, count in counts.iteritems():
             if variable_name not in variables_by_name:
@@ -272,8 +323,23 @@ class CanScraperLoader:
                     count=count,
                 )
 
+    @staticmethod
+    def load(path: Union[None, str, pathlib.Path] = None) -> "CanScraperLoader":
+        """Returns a CanScraperLoader which holds data loaded from the CAN Scraper.
+
+        Only LOADED_FIELDS are read. All rows are read, not only those of some providers or
+        variables, because every CanScraperBase data source shares the loader returned by
+        `_get_covid_county_dataset`.
+
+        Args:
+            path: Path or URL of the parquet file, by default from PARQUET_PATH_ENV or the GCS URL.
+        """
+        if path is None:
+            path = os.environ.get(PARQUET_PATH_ENV, GCS_PARQUET_PATH)
+        all_df = pd.read_parquet(path, columns=LOADED_FIELDS)
+        return CanScraperLoader(all_df)
+
     @staticmethod
     def load_from_gcs() -> "CanScraperLoader":
         """Returns a CanScraperLoader which holds data loaded from the CAN Scraper."""
-        all_df = pd.read_parquet(GCS_PARQUET_PATH)
-        return CanScraperLoader(all_df)
+        return CanScraperLoader.load(GCS_PARQUET_PATH)
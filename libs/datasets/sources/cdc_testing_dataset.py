@@ -3,6 +3,7 @@ from functools import lru_cache
 
 from libs.datasets import AggregationLevel
 from libs.datasets import data_source
+import numpy as np
 import pandas as pd
 import abc
 from datapublic.common_fields import CommonFields
@@ -14,30 +15,28 @@ DC_COUNTY_LOCATION_ID = Region.from_fips("11001").location_id
 DC_STATE_LOCATION_ID = Region.from_state("DC").location_id
 
 
-def _remove_trailing_zeros(series: pd.Series) -> pd.Series:
-
-    series = pd.Series(series.values.copy(), index=series.index.get_level_values(CommonFields.DATE))
-
-    index = series.loc[series != 0].last_valid_index()
-
-    if index is None:
-        # If test positivity is 0% the entire time, considering the data inaccurate, returning
-        # none.
-        series[:] = None
-        return series
-
-    series[index + pd.DateOffset(1) :] = None
-    return series
-
-
 def remove_trailing_zeros(data: pd.DataFrame) -> pd.DataFrame:
+    """Replaces test positivity values after the last non-zero value of each location with NA.
+
+    If test positivity is 0% the entire time the data is considered inaccurate and all of it is
+    replaced.
+    """
     # TODO(tom): See if TailFilter+zeros_filter produce the same data and if so, remove this
     #  function.
     data = data.sort_index()
-    test_pos = data.groupby(CommonFields.LOCATION_ID)[CommonFields.TEST_POSITIVITY_7D].apply(
-        _remove_trailing_zeros
+    values = data[CommonFields.TEST_POSITIVITY_7D]
+    # Rows are sorted so each location is a contiguous block, ordered by date.
+    location_codes, _ = pd.factorize(data.index.get_level_values(CommonFields.LOCATION_ID))
+    nonzero = (values.notna() & (values != 0)).to_numpy()
+    # Scanning each location in reverse, a running max finds rows at or before the last non-zero.
+    nonzero_at_or_after = (
+        pd.Series(nonzero[::-1].astype(np.int8))
+        .groupby(location_codes[::-1], sort=False)
+        .cummax()
+        .to_numpy()[::-1]
+        .astype(bool)
     )
-    data[CommonFields.TEST_POSITIVITY_7D] = test_pos
+    data[CommonFields.TEST_POSITIVITY_7D] = values.where(nonzero_at_or_after)
     return data
 
 
@@ -125,7 +124,7 @@ def modify_dataset(ds: MultiRegionDataset) -> MultiRegionDataset:
 
     levels = set(
         Region.from_location_id(l).level
-        for l in ds.timeseries.index.get_level_values(CommonFields.LOCATION_ID)
+        for l in ds.timeseries.index.get_level_values(CommonFields.LOCATION_ID).unique()
     )
     # Should only be picking up county all_df for now.  May need additional logic if states
     # are included as well
@@ -25,29 +25,56 @@ def drop_all_zero_timeseries(
     locations with a population over some threshold. Or perhaps an automatic filter isn't worth
     the trouble after all :-(
     """
-    ts_wide = ds_in.timeseries_bucketed_wide_dates
-
-    # Separate into timeseries in `fields` and all others.
-    variable_mask = ts_wide.index.get_level_values(PdFields.VARIABLE).isin(fields)
-    ts_wide_other_variables = ts_wide.loc[~variable_mask]
-    ts_wide_variables = ts_wide.loc[variable_mask]
-
-    # Keep rows/timeseries that have at least one value that is not 0 or NA
-    to_keep_mask = ts_wide_variables.replace(pd.NA, 0).any(axis=1)
-    to_drop = ts_wide_variables.loc[~to_keep_mask].index
-    if not to_drop.empty:
-        # Maybe add filtering to not log about the known bad data in OH counties and Loving
-        # County Texas using a RegionMask(level=County, state=OH) and some kind of RegionMask
-        # representing counties with a small population.
-        _log.info(DROPPING_TIMESERIES_WITH_ONLY_ZEROS, dropped=to_drop)
-    ts_wide_kept = ts_wide_variables.loc[to_keep_mask]
-
-    ts_wide_out = pd.concat([ts_wide_kept, ts_wide_other_variables])
-
-    # Make a new dataset without the dropped timeseries. This does not drop the tags of the
-    # dropped timeseries but keeping the provenance tags doesn't seem to be a problem. Maybe it'd
-    # be cleaner to add a method 'MultiRegionDataset.drop_timeseries' similar to 'remove_regions' or
-    # move this into 'MultiRegionDataset' similar to 'drop_stale_timeseries'.
-    return dataclasses.replace(
-        ds_in, timeseries_bucketed=ts_wide_out.stack().unstack(PdFields.VARIABLE).sort_index(),
+    ts = ds_in.timeseries_bucketed
+    fields = set(fields)
+    variables = [variable for variable in ts.columns if variable in fields]
+    if not variables:
+        return _drop_empty_rows_and_columns(ds_in, ts)
+
+    # Reduce each (location, bucket, variable) timeseries to flags in one grouped pass over the
+    # bucketed columns, without pivoting dates to columns.
+    values = ts.loc[:, variables]
+    series_keys = [CommonFields.LOCATION_ID, PdFields.DEMOGRAPHIC_BUCKET]
+    has_value = values.notna().groupby(level=series_keys, sort=False).any()
+    has_nonzero = (values.notna() & (values != 0)).groupby(level=series_keys, sort=False).any()
+    # Timeseries with at least one value, all of them 0.
+    to_drop_flags = has_value & ~has_nonzero
+
+    to_drop_stacked = to_drop_flags.stack()
+    to_drop_stacked = to_drop_stacked.loc[to_drop_stacked]
+    if to_drop_stacked.empty:
+        return _drop_empty_rows_and_columns(ds_in, ts)
+    to_drop = (
+        to_drop_stacked.index.rename(series_keys + [PdFields.VARIABLE])
+        .reorder_levels([CommonFields.LOCATION_ID, PdFields.VARIABLE, PdFields.DEMOGRAPHIC_BUCKET])
+        .sort_values()
     )
+    # Maybe add filtering to not log about the known bad data in OH counties and Loving
+    # County Texas using a RegionMask(level=County, state=OH) and some kind of RegionMask
+    # representing counties with a small population.
+    _log.info(DROPPING_TIMESERIES_WITH_ONLY_ZEROS, dropped=to_drop)
+
+    # Broadcast the per-timeseries flags to every date and replace the dropped values with NA.
+    row_keys = ts.index.droplevel(CommonFields.DATE)
+    drop_mask = to_drop_flags.reindex(row_keys).to_numpy()
+    ts_out = ts.copy()
+    ts_out.loc[:, variables] = values.mask(drop_mask)
+
+    # This does not drop the tags of the dropped timeseries but keeping the provenance tags
+    # doesn't seem to be a problem. Maybe it'd be cleaner to add a method
+    # 'MultiRegionDataset.drop_timeseries' similar to 'remove_regions' or move this into
+    # 'MultiRegionDataset' similar to 'drop_stale_timeseries'.
+    return _drop_empty_rows_and_columns(ds_in, ts_out)
+
+
+def _drop_empty_rows_and_columns(
+    ds_in: timeseries.MultiRegionDataset, ts: pd.DataFrame
+) -> timeseries.MultiRegionDataset:
+    """Returns ds_in with timeseries `ts`, without rows and columns that have no values.
+
+    Matches rebuilding the dataset from only the observations that are not NA, as done before
+    this filter was a grouped reduction, so empty columns of variables that aren't filtered are
+    dropped too.
+    """
+    ts = ts.loc[ts.notna().any(axis=1), ts.notna().any(axis=0)]
+    return dataclasses.replace(ds_in, timeseries_bucketed=ts)
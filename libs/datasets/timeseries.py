@@ -14,7 +14,11 @@ from typing import (
 )
 import dataclasses
 import datetime
+import os
 import pathlib
+import pickle
+import re
+import struct
 import warnings
 from dataclasses import dataclass
 from functools import lru_cache
@@ -22,7 +26,7 @@ from itertools import chain
 from collections import defaultdict
 
 import compress_pickle
-import more_itertools
+import zstandard
 from datapublic import common_fields
 from datapublic.common_fields import CommonFields
 from datapublic.common_fields import DemographicBucket
@@ -69,6 +73,29 @@ _log = structlog.get_logger()
 NO_LOCATION_ID_FOR_FIPS = "No location_id found for FIPS"
 
 
+# Environment variable that, when set to a non-empty value other than "0", makes every
+# MultiRegionDataset run `MultiRegionDataset.validate` when it is created. Without it only checks
+# that don't depend on the size of the dataset run when a dataset is created and the full checks
+# run when a dataset is read from or written to a file. tests/conftest.py sets it.
+FULL_VALIDATION_ENV = "DATASET_FULL_VALIDATION"
+
+
+def full_validation_enabled() -> bool:
+    return os.environ.get(FULL_VALIDATION_ENV, "") not in ("", "0")
+
+
+# A snapshot file, written by `MultiRegionDataset.to_snapshot`, starts with SNAPSHOT_MAGIC and
+# the format version as an unsigned 16 bit int. Increment SNAPSHOT_FORMAT_VERSION when changing
+# what is pickled so that old files are rejected instead of producing a broken dataset.
+SNAPSHOT_MAGIC = b"MRDSNAP\n"
+SNAPSHOT_FORMAT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct(f">{len(SNAPSHOT_MAGIC)}sH")
+SNAPSHOT_SUFFIX = ".pkl.zst"
+
+# zstd level 3 is the library default, compresses faster than gzip level 4 with a similar ratio.
+_SNAPSHOT_ZSTD_LEVEL = 3
+
+
 # Fields used as panda MultiIndex levels when tags are represented in a pd.Series
 _TAG_INDEX_FIELDS = [
     TagField.LOCATION_ID,
@@ -312,7 +339,9 @@ def _warn_and_drop_extra_columns(timeseries_df: pd.DataFrame) -> pd.DataFrame:
 def _add_fips_if_missing(df: pd.DataFrame):
     """Adds the FIPS column derived from location_id, inplace."""
     if CommonFields.FIPS not in df.columns:
-        df[CommonFields.FIPS] = df[CommonFields.LOCATION_ID].apply(pipeline.location_id_to_fips)
+        df[CommonFields.FIPS] = pipeline.map_location_ids(
+            df[CommonFields.LOCATION_ID], pipeline.location_id_to_fips
+        )
 
 
 def _add_state_if_missing(df: pd.DataFrame):
@@ -320,8 +349,8 @@ def _add_state_if_missing(df: pd.DataFrame):
     assert CommonFields.LOCATION_ID in df.columns
 
     if CommonFields.STATE not in df.columns:
-        df[CommonFields.STATE] = df[CommonFields.LOCATION_ID].apply(
-            lambda x: Region.from_location_id(x).state
+        df[CommonFields.STATE] = pipeline.map_location_ids(
+            df[CommonFields.LOCATION_ID], lambda x: Region.from_location_id(x).state
         )
 
 
@@ -330,18 +359,34 @@ def _add_aggregate_level_if_missing(df: pd.DataFrame):
     assert CommonFields.LOCATION_ID in df.columns
 
     if CommonFields.AGGREGATE_LEVEL not in df.columns:
-        df[CommonFields.AGGREGATE_LEVEL] = df[CommonFields.LOCATION_ID].apply(
-            lambda x: Region.from_location_id(x).level.value
+        df[CommonFields.AGGREGATE_LEVEL] = pipeline.map_location_ids(
+            df[CommonFields.LOCATION_ID], lambda x: Region.from_location_id(x).level.value
         )
 
 
+def _location_id_mask(index: pd.Index, location_ids: Collection[str]) -> np.ndarray:
+    """Returns a bool array that is True where the LOCATION_ID of `index` is in `location_ids`.
+
+    For a MultiIndex each unique location_id is tested once and the result copied to the rows
+    using the codes of the level.
+    """
+    if not isinstance(index, pd.MultiIndex):
+        return index.get_level_values(CommonFields.LOCATION_ID).isin(location_ids)
+    level = index.names.index(CommonFields.LOCATION_ID)
+    codes = index.codes[level]
+    level_mask = np.append(index.levels[level].isin(location_ids), False)
+    # A code of -1, for a missing value, selects the False appended to level_mask.
+    return level_mask[codes]
+
+
 def _add_distribution_level(frame_or_series: FrameOrSeries) -> FrameOrSeries:
     # Assigning to `index` avoids reindexing done by constructor `pd.DataFrame(df, index=...)`.
     frame_or_series = frame_or_series.copy()
     index_as_df = frame_or_series.index.to_frame()
-    index_as_df[PdFields.DISTRIBUTION] = index_as_df[PdFields.DEMOGRAPHIC_BUCKET].map(
-        lambda b: demographics.DistributionBucket.from_str(b).distribution
-    )
+    # Parse each of the few unique buckets once and copy the distribution to rows using codes.
+    bucket_codes, buckets = pd.factorize(index_as_df[PdFields.DEMOGRAPHIC_BUCKET])
+    distributions = [demographics.DistributionBucket.from_str(b).distribution for b in buckets]
+    index_as_df[PdFields.DISTRIBUTION] = np.array(distributions, dtype=object)[bucket_codes]
     frame_or_series.index = pd.MultiIndex.from_frame(index_as_df)
     return frame_or_series
 
@@ -448,24 +493,30 @@ EMPTY_TIMESERIES_BUCKETED_WIDE_VARIABLES_DF = pd.DataFrame(
 )
 
 
-def _check_timeseries_wide_vars_index(timeseries_index: pd.MultiIndex, *, bucketed: bool):
+def _check_timeseries_wide_vars_names(wide_vars_df: pd.DataFrame, *, bucketed: bool):
+    """Asserts that a DataFrame has the index and column names expected with wide-variable
+    columns. This doesn't look at the data so is cheap enough to run for every new dataset."""
     if bucketed:
-        assert timeseries_index.names == [
+        assert wide_vars_df.index.names == [
             CommonFields.LOCATION_ID,
             PdFields.DEMOGRAPHIC_BUCKET,
             CommonFields.DATE,
         ]
     else:
         # timeseries.index order is important for _timeseries_latest_values correctness.
-        assert timeseries_index.names == [CommonFields.LOCATION_ID, CommonFields.DATE]
+        assert wide_vars_df.index.names == [CommonFields.LOCATION_ID, CommonFields.DATE]
+    assert wide_vars_df.columns.names == [PdFields.VARIABLE]
+
+
+def _check_timeseries_wide_vars_index(timeseries_index: pd.MultiIndex):
     assert timeseries_index.is_unique
     assert timeseries_index.is_monotonic_increasing
 
 
 def _check_timeseries_wide_vars_structure(wide_vars_df: pd.DataFrame, *, bucketed: bool):
     """Asserts that a DataFrame has the structure expected with wide-variable columns."""
-    _check_timeseries_wide_vars_index(wide_vars_df.index, bucketed=bucketed)
-    assert wide_vars_df.columns.names == [PdFields.VARIABLE]
+    _check_timeseries_wide_vars_names(wide_vars_df, bucketed=bucketed)
+    _check_timeseries_wide_vars_index(wide_vars_df.index)
     numeric_columns = wide_vars_df.dtypes.apply(is_numeric_dtype)
     assert numeric_columns.all()
 
@@ -502,6 +553,81 @@ def tag_df_add_all_bucket_in_place(tag_df: pd.DataFrame):
     tag_df[TagField.DEMOGRAPHIC_BUCKET] = "all"
 
 
+# Matches the name of a tag column, as created by `timeseries_rows`, capturing the TagType.
+_TAG_COLUMN_RE = (
+    r"\A(" + "|".join(re.escape(str(tag_type)) for tag_type in TagType) + r")(?:-\d+)?\Z"
+)
+
+# Rows read at a time when a CSV is filtered to the "all" bucket while reading.
+_WIDE_DATES_CSV_CHUNK_SIZE = 100_000
+
+
+def _read_wide_dates_csv(
+    path_or_buf: Union[pathlib.Path, TextIO], *, load_demographics: bool
+) -> Tuple[pd.DataFrame, pd.DataFrame, bool]:
+    """Reads a file written by `MultiRegionDataset.write_to_wide_dates_csv`.
+
+    The header is read first so that every column can be parsed to its final dtype by the C
+    parser: dates as float64 and tags as str. All tag columns are then reshaped in one pass.
+
+    Returns: a wide dates DataFrame as expected by `from_timeseries_wide_dates_df`, a DataFrame
+    of tags with columns _TAG_DF_COLUMNS (the demographic bucket is "all" when the file doesn't
+    have a bucket column) and True iff the file has a demographic bucket column.
+    """
+    if isinstance(path_or_buf, pathlib.Path):
+        header = pd.read_csv(path_or_buf, nrows=0).columns
+    else:
+        start = path_or_buf.tell()
+        header = pd.read_csv(path_or_buf, nrows=0).columns
+        path_or_buf.seek(start)
+
+    bucketed = PdFields.DEMOGRAPHIC_BUCKET in header
+    index_columns = [CommonFields.LOCATION_ID, PdFields.VARIABLE]
+    if bucketed:
+        index_columns.append(PdFields.DEMOGRAPHIC_BUCKET)
+    other_columns = header.difference(index_columns, sort=False)
+    # Assume all columns that don't match a tag type are dates.
+    tag_type_match = pd.Series(
+        other_columns.str.extract(_TAG_COLUMN_RE, expand=False), index=other_columns
+    )
+    tag_type_by_column = {
+        column: TagType(tag_type) for column, tag_type in tag_type_match.dropna().items()
+    }
+    tag_columns = tag_type_match.index[tag_type_match.notna()]
+    date_columns = tag_type_match.index[tag_type_match.isna()]
+
+    dtype = {column: str for column in index_columns}
+    dtype.update({column: str for column in tag_columns})
+    dtype.update({column: np.float64 for column in date_columns})
+    read_csv_kwargs = dict(dtype=dtype, na_values=[""], keep_default_na=False)
+    if not load_demographics and bucketed:
+        wide_df = pd.concat(
+            [
+                chunk.loc[chunk[PdFields.DEMOGRAPHIC_BUCKET] == DemographicBucket.ALL]
+                for chunk in pd.read_csv(
+                    path_or_buf, chunksize=_WIDE_DATES_CSV_CHUNK_SIZE, **read_csv_kwargs
+                )
+            ]
+        )
+    else:
+        wide_df = pd.read_csv(path_or_buf, low_memory=False, **read_csv_kwargs)
+    wide_df = wide_df.set_index(index_columns)
+
+    if tag_columns.empty:
+        tag_df = pd.DataFrame([], columns=_TAG_DF_COLUMNS)
+    else:
+        tag_long = wide_df.loc[:, tag_columns].rename_axis(columns="tag_column").stack()
+        tag_df = tag_long.rename(TagField.CONTENT).reset_index()
+        tag_df[TagField.TYPE] = tag_df.pop("tag_column").map(tag_type_by_column)
+        if not bucketed:
+            tag_df_add_all_bucket_in_place(tag_df)
+
+    wide_dates_df = wide_df.loc[:, date_columns]
+    wide_dates_df.columns = pd.to_datetime(date_columns, format="%Y-%m-%d")
+    wide_dates_df = wide_dates_df.rename_axis(columns=CommonFields.DATE)
+    return wide_dates_df, tag_df, bucketed
+
+
 # eq=False because instances are large and we want to compare by id instead of value
 @final
 @dataclass_with_default_init(frozen=True, eq=False)
@@ -542,7 +668,7 @@ class MultiRegionDataset:
         #  then remove this branch and the timeseries cached_property.
         if timeseries is not None:
             assert timeseries_bucketed is None
-            _check_timeseries_wide_vars_structure(timeseries, bucketed=False)
+            _check_timeseries_wide_vars_names(timeseries, bucketed=False)
             timeseries_bucketed = pd.concat(
                 {DemographicBucket("all"): timeseries}, names=[PdFields.DEMOGRAPHIC_BUCKET]
             ).reorder_levels(EMPTY_TIMESERIES_BUCKETED_WIDE_VARIABLES_DF.index.names)
@@ -957,63 +1083,25 @@ class MultiRegionDataset:
             if provenance_path.exists():
                 # TODO(tom): Try to delete add_provenance_csv which seems to be only used in tests.
                 dataset = dataset.add_provenance_csv(provenance_path)
-        return dataset
+        return dataset.validate()
 
     @staticmethod
     def from_wide_dates_csv(
         path_or_buf: Union[pathlib.Path, TextIO], load_demographics=True
     ) -> "MultiRegionDataset":
-        if not load_demographics:
-            wide_dates_iterable = pd.read_csv(path_or_buf, iterator=True, chunksize=1000)
-            wide_dates_df = pd.concat(
-                [
-                    chunk.loc[chunk[PdFields.DEMOGRAPHIC_BUCKET] == "all"]
-                    for chunk in wide_dates_iterable
-                ]
-            )
-        else:
-            wide_dates_df = pd.read_csv(path_or_buf, low_memory=False)
-        bucketed = PdFields.DEMOGRAPHIC_BUCKET in wide_dates_df.columns
-        if bucketed:
-            wide_dates_df = wide_dates_df.set_index(
-                [CommonFields.LOCATION_ID, PdFields.VARIABLE, PdFields.DEMOGRAPHIC_BUCKET]
-            )
-        else:
-            wide_dates_df = wide_dates_df.set_index([CommonFields.LOCATION_ID, PdFields.VARIABLE])
-
-        # Iterate through all known tag types. The following are populated while iterating.
-        tag_columns_mask = pd.Series(False, index=wide_dates_df.columns)
-        tag_df_to_concat = []
-        for tag_type in TagType:
-            # Extract tag_type columns from the wide date DataFrame. This parses the column names
-            # created in `timeseries_rows`.
-            tag_column_mask = wide_dates_df.columns.str.match(r"\A" + tag_type + r"(-\d+)?\Z")
-            if tag_column_mask.any():
-                tag_columns = wide_dates_df.loc[:, tag_column_mask]
-                tag_series = tag_columns.stack().reset_index(-1, drop=True).rename(TagField.CONTENT)
-                tag_columns_mask = tag_columns_mask | tag_column_mask
-                if not tag_series.empty:
-                    tag_df = tag_series.reset_index()
-                    tag_df[TagField.TYPE] = tag_type
-                    tag_df_to_concat.append(tag_df)
-
-        # Assume all columns that didn't match a tag_type are dates.
-        wide_dates_df = wide_dates_df.loc[:, ~tag_columns_mask]
-        wide_dates_df.columns = pd.to_datetime(wide_dates_df.columns)
-        wide_dates_df = wide_dates_df.rename_axis(columns=CommonFields.DATE)
-
-        tag_df = pd.concat(tag_df_to_concat)
-        if not bucketed:
-            tag_df_add_all_bucket_in_place(tag_df)
-
-        return MultiRegionDataset.from_timeseries_wide_dates_df(
-            wide_dates_df, bucketed=bucketed
-        ).append_tag_df(tag_df)
+        wide_dates_df, tag_df, bucketed = _read_wide_dates_csv(
+            path_or_buf, load_demographics=load_demographics
+        )
+        return (
+            MultiRegionDataset.from_timeseries_wide_dates_df(wide_dates_df, bucketed=bucketed)
+            .append_tag_df(tag_df)
+            .validate()
+        )
 
     def add_static_csv_file(self, path_or_buf: Union[pathlib.Path, TextIO]) -> "MultiRegionDataset":
         assert self.static.empty
         static_df = pd.read_csv(path_or_buf, dtype={CommonFields.FIPS: str}, low_memory=False)
-        return self.add_static_values(static_df)
+        return self.add_static_values(static_df).validate()
 
     @staticmethod
     def read_from_pointer(
@@ -1038,32 +1126,75 @@ class MultiRegionDataset:
             pd.DataFrame([], columns=[CommonFields.FIPS, CommonFields.DATE])
         )
 
+    @staticmethod
+    def _from_trusted(
+        *, timeseries_bucketed: pd.DataFrame, static: pd.DataFrame, tag: pd.Series
+    ) -> "MultiRegionDataset":
+        """Creates a dataset without running the checks in `__post_init__`.
+
+        Only use this when the attributes are derived from an existing dataset in a way that can't
+        break the expectations checked by `validate`, such as selecting a subset of rows or
+        columns.
+        """
+        dataset = object.__new__(MultiRegionDataset)
+        # Work around frozen using object.__setattr__, like __setstate__.
+        object.__setattr__(dataset, "timeseries_bucketed", timeseries_bucketed)
+        object.__setattr__(dataset, "static", static)
+        object.__setattr__(dataset, "tag", tag)
+        if full_validation_enabled():
+            dataset.validate()
+        return dataset
+
     def __post_init__(self):
-        """Checks that attributes of this object meet certain expectations."""
+        """Checks that attributes of this object meet certain expectations.
+
+        Only the checks that take constant time run here unless full validation is enabled, see
+        FULL_VALIDATION_ENV. Pipeline steps create many intermediate datasets and the full checks
+        scan every index and look up every location in geo-data.
+        """
+        self._check_structure()
+        if full_validation_enabled():
+            self._check_data()
+
+    def _check_structure(self):
         # These asserts provide runtime-checking and a single place for humans reading the code to
         # check what is expected of the attributes, beyond type.
-        _check_timeseries_wide_vars_structure(self.timeseries_bucketed, bucketed=True)
+        _check_timeseries_wide_vars_names(self.timeseries_bucketed, bucketed=True)
 
         assert self.static.index.names == [CommonFields.LOCATION_ID]
+        assert self.static.columns.names == [PdFields.VARIABLE]
+
+        assert isinstance(self.tag, pd.Series)
+        assert self.tag.index.names == _TAG_INDEX_FIELDS
+        assert self.tag.name == TagField.CONTENT
+
+    def _check_data(self):
+        _check_timeseries_wide_vars_index(self.timeseries_bucketed.index)
+        numeric_columns = self.timeseries_bucketed.dtypes.apply(is_numeric_dtype)
+        assert numeric_columns.all()
+
         assert self.static.index.is_unique
         assert self.static.index.is_monotonic_increasing
         assert self.static.columns.intersection(GEO_DATA_COLUMNS).empty
         assert self.static.columns.is_unique
-        assert self.static.columns.names == [PdFields.VARIABLE]
 
-        assert isinstance(self.tag, pd.Series)
-        assert self.tag.index.names == _TAG_INDEX_FIELDS
         # TODO(tom): Work out why is_monotonic_increasing is false (just for index with NaT
         #  and real date values?) after calling sort_index(). It may be related to
         #  https://github.com/pandas-dev/pandas/issues/35992 which is fixed in pandas 1.2.0
         # Also check other references to is_monotonic_increasing in this file.
         # assert self.tag.index.is_monotonic_increasing
-        assert self.tag.name == TagField.CONTENT
 
         extra_location_ids = self.location_ids.difference(dataset_utils.get_geo_data().index)
         if not extra_location_ids.empty:
             raise AssertionError(f"Unknown locations:\n{extra_location_ids}")
 
+    def validate(self) -> "MultiRegionDataset":
+        """Runs all checks of the attributes of this object, raising AssertionError if one fails,
+        and returns self. This is called where a dataset is read or written."""
+        self._check_structure()
+        self._check_data()
+        return self
+
     def append_regions(self, other: "MultiRegionDataset") -> "MultiRegionDataset":
         common_location_id = self.location_ids.intersection(other.location_ids)
         if not common_location_id.empty:
@@ -1145,42 +1276,43 @@ class MultiRegionDataset:
                 dtype="float",
             )
 
-    def _location_ids_in_mask(self, region_mask: pipeline.RegionMask) -> pd.Index:
-        geo_data = self.geo_data
-        rows_key = dataset_utils.make_rows_key(
-            geo_data, aggregation_level=region_mask.level, states=region_mask.states,
-        )
-        return geo_data.loc[rows_key, :].index
-
     def _regionmaskorregions_to_location_id(
         self, regions_and_masks: Collection[RegionMaskOrRegion]
     ):
-        location_ids = set()
+        region_location_ids = []
+        mask_location_ids = []
         for region_or_mask in regions_and_masks:
             if isinstance(region_or_mask, Region):
-                location_ids.add(region_or_mask.location_id)
+                region_location_ids.append(region_or_mask.location_id)
             else:
                 assert isinstance(region_or_mask, pipeline.RegionMask)
-                location_ids.update(self._location_ids_in_mask(region_or_mask))
-        return pd.Index(sorted(location_ids), dtype=str)
+                states = tuple(region_or_mask.states) if region_or_mask.states else None
+                mask_location_ids.append(
+                    dataset_utils.location_ids_matching(region_or_mask.level, states)
+                )
+        if mask_location_ids:
+            # A mask is evaluated with geo-data.csv so a location missing from it can't be matched.
+            missing_location_id = self.location_ids.difference(
+                dataset_utils.get_location_attributes().index
+            )
+            if not missing_location_id.empty:
+                raise KeyError(f"location_id not in data/geo-data.csv:\n{missing_location_id}")
+        location_ids = pd.Index(region_location_ids, dtype=str).append(mask_location_ids)
+        return location_ids.unique().sort_values()
 
     def get_regions_subset(self, regions: Collection[RegionMaskOrRegion]) -> "MultiRegionDataset":
         location_ids = self._regionmaskorregions_to_location_id(regions)
         return self.get_locations_subset(location_ids)
 
     def get_locations_subset(self, location_ids: Collection[str]) -> "MultiRegionDataset":
-        # If these mask+loc operations show up as a performance issue try changing to xs.
-        timeseries_mask = self.timeseries_bucketed.index.get_level_values(
-            CommonFields.LOCATION_ID
-        ).isin(location_ids)
-        timeseries_df = self.timeseries_bucketed.loc[timeseries_mask, :]
-        static_mask = self.static.index.get_level_values(CommonFields.LOCATION_ID).isin(
-            location_ids
+        timeseries_df = self.timeseries_bucketed.loc[
+            _location_id_mask(self.timeseries_bucketed.index, location_ids), :
+        ]
+        static_df = self.static.loc[_location_id_mask(self.static.index, location_ids), :]
+        tag = self.tag.loc[_location_id_mask(self.tag.index, location_ids), :]
+        return MultiRegionDataset._from_trusted(
+            timeseries_bucketed=timeseries_df, static=static_df, tag=tag
         )
-        static_df = self.static.loc[static_mask, :]
-        tag_mask = self.tag.index.get_level_values(CommonFields.LOCATION_ID).isin(location_ids)
-        tag = self.tag.loc[tag_mask, :]
-        return MultiRegionDataset(timeseries_bucketed=timeseries_df, static=static_df, tag=tag)
 
     def partition_by_region(
         self,
@@ -1204,17 +1336,14 @@ class MultiRegionDataset:
         return ds_selected, ds_not_selected
 
     def _remove_locations(self, location_ids: Collection[str]) -> "MultiRegionDataset":
-        timeseries_mask = self.timeseries_bucketed.index.get_level_values(
-            CommonFields.LOCATION_ID
-        ).isin(location_ids)
-        timeseries_df = self.timeseries_bucketed.loc[~timeseries_mask, :]
-        static_mask = self.static.index.get_level_values(CommonFields.LOCATION_ID).isin(
-            location_ids
+        timeseries_df = self.timeseries_bucketed.loc[
+            ~_location_id_mask(self.timeseries_bucketed.index, location_ids), :
+        ]
+        static_df = self.static.loc[~_location_id_mask(self.static.index, location_ids), :]
+        tag = self.tag.loc[~_location_id_mask(self.tag.index, location_ids), :]
+        return MultiRegionDataset._from_trusted(
+            timeseries_bucketed=timeseries_df, static=static_df, tag=tag
         )
-        static_df = self.static.loc[~static_mask, :]
-        tag_mask = self.tag.index.get_level_values(CommonFields.LOCATION_ID).isin(location_ids)
-        tag = self.tag.loc[~tag_mask, :]
-        return MultiRegionDataset(timeseries_bucketed=timeseries_df, static=static_df, tag=tag)
 
     def get_subset(
         self,
@@ -1326,6 +1455,7 @@ class MultiRegionDataset:
         Args:
             path: Path to write to.
         """
+        self.validate()
         timeseries_data = self.timeseries.reset_index()
         _add_fips_if_missing(timeseries_data)
 
@@ -1347,14 +1477,50 @@ class MultiRegionDataset:
 
     def to_compressed_pickle(self, path: pathlib.Path):
         assert path.name.endswith(".pkl.gz")
+        self.validate()
         compress_pickle.dump(
             self, path, compression="gzip", set_default_extension=False, compresslevel=4
         )
 
+    def to_snapshot(self, path: pathlib.Path):
+        """Writes this dataset to a zstd compressed snapshot file, using all CPUs to compress.
+
+        Unlike `to_compressed_pickle` the snapshot contains the attributes in their native wide
+        form so loading doesn't need to unstack the timeseries.
+        """
+        assert path.name.endswith(SNAPSHOT_SUFFIX)
+        self.validate()
+        state = {
+            "timeseries_bucketed": self.timeseries_bucketed,
+            "static": self.static,
+            "tag": self.tag,
+        }
+        compressor = zstandard.ZstdCompressor(level=_SNAPSHOT_ZSTD_LEVEL, threads=-1)
+        with path.open("wb") as f:
+            f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION))
+            f.write(compressor.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    @staticmethod
+    def from_snapshot(path: pathlib.Path) -> "MultiRegionDataset":
+        assert path.name.endswith(SNAPSHOT_SUFFIX)
+        with path.open("rb") as f:
+            magic, version = _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a dataset snapshot")
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(
+                    f"{path} has snapshot format version {version}, expected "
+                    f"{SNAPSHOT_FORMAT_VERSION}. Regenerate it with the current code."
+                )
+            state = pickle.loads(zstandard.ZstdDecompressor().decompress(f.read()))
+        return MultiRegionDataset._from_trusted(**state).validate()
+
     @staticmethod
     def from_compressed_pickle(path: pathlib.Path) -> "MultiRegionDataset":
         assert path.name.endswith(".pkl.gz")
-        return compress_pickle.load(path, compression="gzip", set_default_extension=False)
+        dataset = compress_pickle.load(path, compression="gzip", set_default_extension=False)
+        # Unpickling doesn't call __post_init__.
+        return dataset.validate()
 
     def write_to_dataset_pointer(self, pointer: dataset_pointer.DatasetPointer):
         """Writes `self` to files referenced by `pointer`."""
@@ -1363,6 +1529,7 @@ class MultiRegionDataset:
 
     def write_to_wide_dates_csv(self, path_wide_dates: pathlib.Path, path_static: pathlib.Path):
         """Writes `self` to given file paths."""
+        self.validate()
         wide_df = self.timeseries_rows()
 
         # The values we write are generally ratios (such as test positivity) where we only need ~5
@@ -1391,7 +1558,9 @@ class MultiRegionDataset:
         timeseries_df = self.timeseries_bucketed.drop(columns, axis="columns", errors="ignore")
         static_df = self.static.drop(columns, axis="columns", errors="ignore")
         tag = self.tag[~self.tag.index.get_level_values(PdFields.VARIABLE).isin(columns)]
-        return MultiRegionDataset(timeseries_bucketed=timeseries_df, static=static_df, tag=tag)
+        return MultiRegionDataset._from_trusted(
+            timeseries_bucketed=timeseries_df, static=static_df, tag=tag
+        )
 
     def drop_na_columns(self) -> "MultiRegionDataset":
         """Drops time series and tags that are NA for every date in every region."""
@@ -1406,7 +1575,9 @@ class MultiRegionDataset:
         # `ts_variables_kept` is not found in tag.index, but it doesn't happen. If it does add
         # `.intersection(self.tag.index.unique(PdFields.VARIABLE))`.
         tag = self.tag.loc[:, ts_variables_kept.to_list()]
-        return MultiRegionDataset(timeseries_bucketed=timeseries_bucketed, static=static, tag=tag)
+        return MultiRegionDataset._from_trusted(
+            timeseries_bucketed=timeseries_bucketed, static=static, tag=tag
+        )
 
     def join_columns(self, other: "MultiRegionDataset") -> "MultiRegionDataset":
         """Returns a dataset with fields of self and other, which must be disjoint, joined.
@@ -1531,10 +1702,9 @@ def combined_datasets(
         # In the table the index labels are <location_id, distribution> (for example
         # <DC, 'all'>, <Cook County, 'age'>, <Miami, 'age;sex'>) and columns are fields.
         all_timeseries_datasets = set(chain.from_iterable(timeseries_field_datasets.values()))
-        datasets_wide = _datasets_wide_var_not_null(all_timeseries_datasets)
-        # Then make a map from dataset to table with the same index and columns but only True
-        # where that particular data will be copied to the output. These tables will have a
-        # subset of the True values in `datasets_wide`.
+        datasets_wide = {ds: ds.wide_var_not_null for ds in all_timeseries_datasets}
+        # Then make a map from dataset to the <location_id, distribution, variable> labels of the
+        # data that will be copied from that dataset to the output.
         datasets_output = _pick_first_with_field(datasets_wide, timeseries_field_datasets)
         # Finally copy the distributions and tags that were selected from each dataset.
         ts_bucketed, tags = _combine_timeseries(datasets_output)
@@ -1578,91 +1748,72 @@ def combined_datasets(
 def _pick_first_with_field(
     datasets_wide: Mapping[MultiRegionDataset, pd.DataFrame],
     timeseries_field_datasets: Mapping[FieldName, List[MultiRegionDataset]],
-) -> Mapping[MultiRegionDataset, pd.DataFrame]:
-    """Creates a DataFrame for each dataset that has True for the subset of datasets_wide that is
-    selected according to timeseries_field_datasets"""
-    common_index = more_itertools.first(datasets_wide.values()).index
-    for df in datasets_wide.values():
-        assert df.columns.names == [PdFields.VARIABLE]
-        assert df.index.equals(common_index)
-    assert common_index.names == [CommonFields.LOCATION_ID, PdFields.DISTRIBUTION]
-    datasets_output = {
-        ds: pd.DataFrame([], index=common_index, dtype="bool").rename_axis(
-            columns=PdFields.VARIABLE
-        )
-        for ds in datasets_wide.keys()
-    }
+) -> Mapping[MultiRegionDataset, pd.MultiIndex]:
+    """Finds the dataset that each distribution of each field is copied from.
+
+    For each field the has-data columns of the datasets with the field are stacked in priority
+    order and the first dataset with data is found with `argmax`, so only the distributions found
+    in those datasets are aligned instead of the distributions of all datasets.
+
+    Returns:
+        Map from dataset to the <location_id, distribution, variable> labels selected from it.
+    """
+    labels_to_concat = defaultdict(list)
     for field, datasets in timeseries_field_datasets.items():
-        distribution_so_far = pd.Series([], dtype=bool).reindex(
-            index=common_index, fill_value=False
+        sources = [ds for ds in datasets if field in datasets_wide[ds].columns]
+        if not sources:
+            continue
+        has_data_df = pd.concat(
+            [datasets_wide[ds][field] for ds in sources], axis=1, keys=range(len(sources))
         )
-        for dataset in datasets:
-            try:
-                this_dataset = datasets_wide[dataset].loc[:, field]
-            except KeyError:
-                continue
-            datasets_output[dataset].loc[:, field] = this_dataset & ~distribution_so_far
-            distribution_so_far = distribution_so_far | this_dataset
-    return datasets_output
-
-
-def _datasets_wide_var_not_null(
-    datasets: Collection[MultiRegionDataset],
-) -> Mapping[MultiRegionDataset, pd.DataFrame]:
-    """Makes a map from dataset to a DataFrame with a True where the timeseries has a real value."""
-    datasets_wide = {ds: ds.wide_var_not_null for ds in datasets}
-    return _with_common_index(datasets_wide)
-
-
-def _with_common_index(
-    datasets_wide: Mapping[MultiRegionDataset, pd.DataFrame]
-) -> Mapping[MultiRegionDataset, pd.DataFrame]:
-    dataset_wide_first = more_itertools.first(datasets_wide.values())
-    assert dataset_wide_first.index.names == [CommonFields.LOCATION_ID, PdFields.DISTRIBUTION]
-    assert dataset_wide_first.columns.names == [PdFields.VARIABLE]
-    common_index = None
-    for dataset_wide in datasets_wide.values():
-        if common_index is None:
-            common_index = dataset_wide.index
-        else:
-            common_index = common_index.union(dataset_wide.index)
-    datasets_wide = {
-        ds: ds_w.reindex(index=common_index, fill_value=False) for ds, ds_w in datasets_wide.items()
+        assert has_data_df.index.names == [CommonFields.LOCATION_ID, PdFields.DISTRIBUTION]
+        has_data = has_data_df.fillna(False).to_numpy(dtype=bool)
+        first_source = np.where(has_data.any(axis=1), has_data.argmax(axis=1), -1)
+        for position, ds in enumerate(sources):
+            selected = has_data_df.index[first_source == position]
+            if not selected.empty:
+                labels = selected.to_frame(index=False)
+                labels[PdFields.VARIABLE] = field
+                labels_to_concat[ds].append(labels)
+    return {
+        ds: pd.MultiIndex.from_frame(pd.concat(labels, ignore_index=True))
+        for ds, labels in labels_to_concat.items()
     }
-    return datasets_wide
+
+
+def _select_labels(series: pd.Series, labels: pd.MultiIndex) -> pd.Series:
+    """Returns the elements of `series` with a label in levels `labels.names` found in `labels`."""
+    series_labels = pd.MultiIndex.from_arrays(
+        [series.index.get_level_values(name) for name in labels.names]
+    )
+    return series.loc[series_labels.isin(labels)]
 
 
 def _combine_timeseries(
-    datasets_output: Mapping[MultiRegionDataset, pd.DataFrame]
+    datasets_output: Mapping[MultiRegionDataset, pd.MultiIndex]
 ) -> Tuple[pd.DataFrame, pd.Series]:
     """Combine distributions selected from each dataset into one structure.
 
     Args:
-        datasets_output: Map from dataset to a DataFrame of which distributions to output
+        datasets_output: Map from dataset to the labels of distributions to output
     Returns:
         Tuple of timeseries_bucketed and tag, suitable for MultiRegionDataset.__init__
     """
     ts_bucketed_long_to_concat = []
     tags_to_concat = []
-    for ds, outputs in datasets_output.items():
-        if outputs.empty:
-            continue
-        # Change False to nan so they are dropped when stacking.
-        output_labels = outputs.replace({False: np.nan}).stack().index
-        if output_labels.empty:
-            continue
+    for ds, output_labels in datasets_output.items():
         assert output_labels.names == [
             CommonFields.LOCATION_ID,
             PdFields.DISTRIBUTION,
             PdFields.VARIABLE,
         ]
         ts_bucketed_long_to_concat.append(
-            _slice_with_labels(ds.timeseries_distribution_long, output_labels).droplevel(
+            _select_labels(ds.timeseries_distribution_long, output_labels).droplevel(
                 PdFields.DISTRIBUTION
             )
         )
         tags_to_concat.append(
-            _slice_with_labels(ds.tag_distribution, output_labels).droplevel(PdFields.DISTRIBUTION)
+            _select_labels(ds.tag_distribution, output_labels).droplevel(PdFields.DISTRIBUTION)
         )
 
     if ts_bucketed_long_to_concat:
@@ -8,6 +8,7 @@ from datapublic.common_fields import PdFields
 from libs.datasets import AggregationLevel
 from libs.datasets import taglib
 from libs.datasets import timeseries
+from libs import pipeline
 from libs.pipeline import Region
 
 
@@ -56,11 +57,7 @@ def derive_vaccine_pct(
 
     def append_most_recent_date_index_level(df: pd.DataFrame) -> pd.DataFrame:
         """Appends most recent date with real (not NA) value as a new index level."""
-        most_recent_date_series = df.apply(pd.Series.last_valid_index, axis=1)
-        # Append the series as a new level in the index and rename that level to MOST_RECENT_DATE.
-        return df.set_index(most_recent_date_series, append=True).rename_axis(
-            index={None: MOST_RECENT_DATE}
-        )
+        return df.set_index(_last_valid_dates(df).rename(MOST_RECENT_DATE), append=True)
 
     derived_pct_df = append_most_recent_date_index_level(derived_pct_df)
     ts_in_pcts = append_most_recent_date_index_level(ts_in_pcts)
@@ -87,17 +84,22 @@ def derive_vaccine_pct(
     return ds_in.replace_timeseries_wide_dates([ts_in_without_pcts, most_recent_pcts])
 
 
-STATE_LOCATION_ID = "state_location_id"
+def _last_valid_dates(df: pd.DataFrame) -> pd.DatetimeIndex:
+    """Returns the last date with a real (not NA) value in each row of `df`, like
+    `last_valid_index` of each row, found for all rows with one `argmax`."""
+    has_value = df.notna().to_numpy()
+    if not has_value.size:
+        return pd.DatetimeIndex([pd.NaT] * len(df))
+    # argmax of the reversed columns finds the last True in each row.
+    last_position = has_value.shape[1] - 1 - has_value[:, ::-1].argmax(axis=1)
+    return pd.DatetimeIndex(df.columns[last_position]).where(has_value.any(axis=1))
 
 
-def add_state_location_id_index_level(df: pd.DataFrame) -> pd.DataFrame:
-    """Returns df with the location_id of the state in a new level STATE_LOCATION_ID."""
-    state_index = (
-        df.index.get_level_values(CommonFields.LOCATION_ID)
-        .map(lambda loc_id: Region.from_location_id(loc_id).get_state_region().location_id)
-        .rename(STATE_LOCATION_ID)
+def _state_location_ids(location_ids: pd.Index) -> pd.Index:
+    """Returns the location_id of the state of each county in `location_ids`."""
+    return pipeline.map_location_ids(
+        location_ids, lambda loc_id: Region.from_location_id(loc_id).get_state_region().location_id
     )
-    return df.set_index(state_index, append=True)
 
 
 def estimate_initiated_from_state_ratio(ds_in: MultiRegionDataset) -> MultiRegionDataset:
@@ -109,10 +111,7 @@ def estimate_initiated_from_state_ratio(ds_in: MultiRegionDataset) -> MultiRegio
     ts_state_level_ratios = ds_states.get_timeseries_not_bucketed_wide_dates(
         CommonFields.VACCINATIONS_INITIATED
     ) / ds_states.get_timeseries_not_bucketed_wide_dates(CommonFields.VACCINATIONS_COMPLETED)
-    ts_state_level_ratios = ts_state_level_ratios.rename_axis(
-        index={CommonFields.LOCATION_ID: STATE_LOCATION_ID}
-    )
-    assert ts_state_level_ratios.index.names == [STATE_LOCATION_ID]
+    assert ts_state_level_ratios.index.names == [CommonFields.LOCATION_ID]
     assert ts_state_level_ratios.columns.names == [CommonFields.DATE]
 
     # Find counties that have vaccinations completed but not initiated in recent
@@ -138,21 +137,22 @@ def estimate_initiated_from_state_ratio(ds_in: MultiRegionDataset) -> MultiRegio
         ts_counties_initiated_recent.index
     )
 
-    ts_counties_completed_to_modify = add_state_location_id_index_level(
-        ts_counties_completed.reindex(counties_to_modify)
-    )
-    assert ts_counties_completed_to_modify.index.names == [
-        CommonFields.LOCATION_ID,
-        STATE_LOCATION_ID,
-    ]
-    assert ts_state_level_ratios.columns.names == [CommonFields.DATE]
+    ts_counties_completed_to_modify = ts_counties_completed.reindex(counties_to_modify)
+    assert ts_counties_completed_to_modify.index.names == [CommonFields.LOCATION_ID]
 
-    # Multiple the time series in ts_state_level_ratios and ts_counties_completed_to_modify using
-    # the index level STATE_LOCATION_ID. This produces an estimate for the vaccinations initiated
-    # in each county.
-    ts_counties_initiated_est = ts_counties_completed_to_modify.mul(
-        ts_state_level_ratios, level=STATE_LOCATION_ID
-    ).droplevel(STATE_LOCATION_ID)
+    # Copy the ratios of the state of each county to a row aligned with the county and multiply
+    # all counties at once. This produces an estimate for the vaccinations initiated in each
+    # county.
+    dates = ts_counties_completed_to_modify.columns.union(ts_state_level_ratios.columns)
+    county_state_ratios = ts_state_level_ratios.reindex(
+        index=_state_location_ids(ts_counties_completed_to_modify.index), columns=dates
+    )
+    ts_counties_initiated_est = pd.DataFrame(
+        ts_counties_completed_to_modify.reindex(columns=dates).to_numpy()
+        * county_state_ratios.to_numpy(),
+        index=ts_counties_completed_to_modify.index,
+        columns=dates,
+    )
     # Append the variable name and bucket to the index so that ts_counties_initiated_est is
     # compatible with timeseries_wide_dates.
     ts_counties_initiated_est.index = pd.MultiIndex.from_product(
@@ -5,14 +5,19 @@ represents a geographical area (state, county, metro area, etc).
 
 # Many other modules import this module. Importing pyseir or dataset code here is likely to create
 # in import cycle.
+import functools
 import re
 import warnings
 from dataclasses import dataclass
+from typing import Any
+from typing import Callable
 from typing import List
 from typing import Mapping
 from typing import Optional
 from typing import Union
 
+import numpy as np
+import pandas as pd
 import us
 from datapublic.common_fields import CommonFields
 from typing_extensions import NewType
@@ -39,11 +44,18 @@ def fips_to_location_id(fips: str) -> str:
         return f"iso1:us#fips:{fips}"
 
 
+@functools.lru_cache(None)
+def _get_location_id_to_fips() -> Mapping[str, Optional[str]]:
+    """Returns the FIPS of each location_id in geo-data as a dict, for fast lookups of one key."""
+    return dataset_utils.get_geo_data()[CommonFields.FIPS].to_dict()
+
+
 def location_id_to_fips(location_id: str) -> Optional[str]:
     """Converts a location_id to a FIPS code"""
-    return dataset_utils.get_geo_data().at[location_id, CommonFields.FIPS]
+    return _get_location_id_to_fips()[location_id]
 
 
+@functools.lru_cache(None)
 def location_id_to_level(location_id: str) -> Optional[AggregationLevel]:
     """Converts a location_id to a FIPS code"""
     match = re.fullmatch(r"iso1:us#.*fips:(\d+)", location_id)
@@ -77,6 +89,24 @@ def location_id_to_level(location_id: str) -> Optional[AggregationLevel]:
     return None
 
 
+def map_location_ids(
+    location_ids: Union[pd.Index, pd.Series], func: Callable[[str], Any]
+) -> Union[pd.Index, pd.Series]:
+    """Returns `func` applied to each element of `location_ids`, calling it once per unique value.
+
+    Use this instead of `map` or `apply` on a column or index level with many rows per location.
+    """
+    codes, uniques = pd.factorize(location_ids)
+    # The extra element, selected by code -1, is the result for missing values.
+    values = np.full(len(uniques) + 1, None, dtype=object)
+    for i, location_id in enumerate(uniques):
+        values[i] = func(location_id)
+    mapped = values[codes]
+    if isinstance(location_ids, pd.Series):
+        return pd.Series(mapped, index=location_ids.index, name=location_ids.name)
+    return pd.Index(mapped, name=location_ids.name)
+
+
 def cbsa_to_location_id(cbsa_code: str) -> str:
     """Turns a CBSA code into a location_id.
 
@@ -1,4 +1,5 @@
 from typing import List, Optional, Dict, Any
+import contextlib
 from dataclasses import dataclass
 import pathlib
 import pandas as pd
@@ -20,8 +21,11 @@ from libs.metrics import top_level_metrics
 from libs.metrics import top_level_metric_risk_levels
 from libs.metrics import cdc_transmission_levels
 
+from libs import api_v2_csv
+from libs import api_v2_json
 from libs import parallel_utils
 from libs import pipeline
+from libs import timing_utils
 from libs import build_api_v2
 from libs.datasets import timeseries
 from libs.datasets import vaccine_backfills
@@ -132,6 +136,17 @@ def build_timeseries_for_region(
     """
     log = structlog.get_logger(location_id=regional_input.region.location_id)
 
+    with timing_utils.stage(
+        "build_timeseries_for_region",
+        log_elapsed=False,
+        location_id=regional_input.region.location_id,
+    ):
+        return _build_timeseries_for_region(regional_input, log)
+
+
+def _build_timeseries_for_region(
+    regional_input: RegionalInput, log
+) -> Optional[RegionSummaryWithTimeseries]:
     try:
         fips_timeseries = regional_input.timeseries
         metrics_results, metrics_latest = generate_metrics_and_latest(
@@ -183,16 +198,31 @@ def deploy_single_level(
     all_timeseries: List[RegionSummaryWithTimeseries],
     level: AggregationLevel,
     output_root: pathlib.Path,
+    writer: Optional[dataset_deployer.DeployWriter] = None,
 ) -> None:
     """Deploys all files for a single aggregate level.
 
-    Deploys individual and bulk aggregations of timeseries and summaries.
+    Deploys individual and bulk aggregations of timeseries and summaries. The flattened
+    timeseries CSVs of each region, the level and, for counties, each state are written in one
+    pass over the regions.
 
     Args:
         all_timeseries: List of timeseries to deploy.
         output_root: Root of API output.
+        writer: Writes the files. By default a new DeployWriter writing to output_root is used.
     """
+    with contextlib.ExitStack() as stack:
+        if writer is None:
+            writer = stack.enter_context(dataset_deployer.DeployWriter())
+        _deploy_single_level(all_timeseries, level, output_root, writer)
+
 
+def _deploy_single_level(
+    all_timeseries: List[RegionSummaryWithTimeseries],
+    level: AggregationLevel,
+    output_root: pathlib.Path,
+    writer: dataset_deployer.DeployWriter,
+) -> None:
     path_builder = APIOutputPathBuilder(output_root, level)
     path_builder.make_directories()
     # Filter all timeseries to just aggregate level.
@@ -207,30 +237,37 @@ def deploy_single_level(
 
     for summary in all_summaries:
         output_path = path_builder.single_summary(summary, FileType.JSON)
-        deploy_json_api_output(summary, output_path)
+        deploy_json_api_output(summary, output_path, writer)
 
     for timeseries in all_timeseries:
         output_path = path_builder.single_timeseries(timeseries, FileType.JSON)
-        deploy_json_api_output(timeseries, output_path)
-        # TODO(chris): Remove this state specific block and produce timeseries csvs for all
-        # individual regions.
-        # Currently this is slow and adds a decent amount of time to the pipeline (~10 minutes
-        # I think) if ran on all regions.
-        if level in [AggregationLevel.STATE, AggregationLevel.COUNTRY]:
-            output_path = path_builder.single_timeseries(timeseries, FileType.CSV)
-            bulk_timeseries = AggregateRegionSummaryWithTimeseries(__root__=[timeseries])
-            flattened_timeseries = build_api_v2.build_bulk_flattened_timeseries(bulk_timeseries)
-            deploy_csv_api_output(
-                flattened_timeseries, output_path, csv_column_ordering.TIMESERIES_ORDER
+        deploy_json_api_output(timeseries, output_path, writer)
+
+    def bulk_csv_paths(timeseries: RegionSummaryWithTimeseries) -> List[pathlib.Path]:
+        paths = [path_builder.bulk_flattened_timeseries_data(FileType.CSV)]
+        if level is AggregationLevel.COUNTY:
+            paths.append(
+                path_builder.bulk_flattened_timeseries_data(FileType.CSV, state=timeseries.state)
             )
+        return paths
+
+    api_v2_csv.write_flattened_timeseries_csvs(
+        all_timeseries,
+        csv_column_ordering.TIMESERIES_ORDER,
+        bulk_paths=bulk_csv_paths,
+        region_path=lambda timeseries: path_builder.single_timeseries(timeseries, FileType.CSV),
+        writer=writer,
+    )
 
-    deploy_bulk_files(path_builder, all_timeseries, all_summaries)
+    deploy_bulk_files(path_builder, all_timeseries, all_summaries, writer=writer)
 
     if level is AggregationLevel.COUNTY:
         for state in set(record.state for record in all_summaries):
             state_timeseries = [record for record in all_timeseries if record.state == state]
             state_summaries = [record for record in all_summaries if record.state == state]
-            deploy_bulk_files(path_builder, state_timeseries, state_summaries, state=state)
+            deploy_bulk_files(
+                path_builder, state_timeseries, state_summaries, state=state, writer=writer
+            )
 
 
 def deploy_bulk_files(
@@ -238,6 +275,7 @@ def deploy_bulk_files(
     all_timeseries: List[RegionSummaryWithTimeseries],
     all_summaries: List[RegionSummary],
     state: Optional[str] = None,
+    writer: Optional[dataset_deployer.DeployWriter] = None,
 ):
 
     timing_kwargs = {"region_level": path_builder.level.value, "state": state}
@@ -245,16 +283,11 @@ def deploy_bulk_files(
     bulk_timeseries = AggregateRegionSummaryWithTimeseries(__root__=all_timeseries)
     bulk_summaries = AggregateRegionSummary(__root__=all_summaries)
 
-    flattened_timeseries = build_api_v2.build_bulk_flattened_timeseries(bulk_timeseries)
-
-    output_path = path_builder.bulk_flattened_timeseries_data(FileType.CSV, state=state)
-    deploy_csv_api_output(flattened_timeseries, output_path, csv_column_ordering.TIMESERIES_ORDER)
-
     output_path = path_builder.bulk_timeseries(bulk_timeseries, FileType.JSON, state=state)
-    deploy_json_api_output(bulk_timeseries, output_path)
+    deploy_json_api_output(bulk_timeseries, output_path, writer)
 
     output_path = path_builder.bulk_summary(bulk_summaries, FileType.JSON, state=state)
-    deploy_json_api_output(bulk_summaries, output_path)
+    deploy_json_api_output(bulk_summaries, output_path, writer)
 
     output_path = path_builder.bulk_summary(bulk_summaries, FileType.CSV, state=state)
 
@@ -263,15 +296,22 @@ def deploy_bulk_files(
     if path_builder.level is AggregationLevel.STATE:
         summary_order = csv_column_ordering.SUMMARY_ORDER
 
-    deploy_csv_api_output(bulk_summaries, output_path, summary_order)
+    deploy_csv_api_output(bulk_summaries, output_path, summary_order, writer)
 
 
-def deploy_json_api_output(region_result: pydantic.BaseModel, output_path: pathlib.Path) -> None:
+def deploy_json_api_output(
+    region_result: pydantic.BaseModel,
+    output_path: pathlib.Path,
+    writer: Optional[dataset_deployer.DeployWriter] = None,
+) -> None:
     # Excluding fields that are not specifically included in a model.
     # This lets a field be undefined and not included in the actual json.
-    serialized_result = region_result.json(exclude_unset=True)
+    serialized_result = api_v2_json.dumps(region_result)
 
-    output_path.write_text(serialized_result)
+    if writer:
+        writer.write(output_path, serialized_result)
+    else:
+        output_path.write_text(serialized_result)
 
 
 def _model_to_dict(data: dict):
@@ -295,14 +335,21 @@ def _model_to_dict(data: dict):
 
 
 def deploy_csv_api_output(
-    api_output: pydantic.BaseModel, output_path: pathlib.Path, columns: List[str]
+    api_output: pydantic.BaseModel,
+    output_path: pathlib.Path,
+    columns: List[str],
+    writer: Optional[dataset_deployer.DeployWriter] = None,
 ) -> None:
     if not hasattr(api_output, "__root__"):
         raise AssertionError("Missing root data")
 
     data = _model_to_dict(api_output.__dict__)
     rows = dataset_deployer.remove_root_wrapper(data)
-    dataset_deployer.write_nested_csv(rows, output_path, header=columns)
+    if writer:
+        with writer.open(output_path) as csvfile:
+            dataset_deployer.write_nested_csv_to_file(rows, csvfile, columns)
+    else:
+        dataset_deployer.write_nested_csv(rows, output_path, header=columns)
 
 
 def generate_from_loaded_data(
@@ -310,27 +357,61 @@ def generate_from_loaded_data(
     output: pathlib.Path,
     selected_dataset: MultiRegionDataset,
     log,
+    archive_path: Optional[pathlib.Path] = None,
+    skip_unchanged: bool = False,
+    changed_files_path: Optional[pathlib.Path] = None,
+    manifest_path: Optional[pathlib.Path] = None,
+    precompress: bool = False,
 ):
-    """Runs the API generation code using data in parameters, writing results to output."""
+    """Runs the API generation code using data in parameters, writing results to output.
+
+    If archive_path is set, files are written to a tar archive at that path, with names
+    relative to output, instead of to output. If skip_unchanged is set, files with the same
+    content hash as in the manifest of the previous run are not written, and the names of the
+    other files are written to changed_files_path if it is set. The manifest is read from and
+    written to manifest_path, by default a file next to output. If precompress is set, gzip and
+    brotli compressed copies of every file are written next to it.
+    """
     # If calculating test positivity succeeds join it with the combined_datasets into one
     # MultiRegionDataset
     log.info("Running test positivity.")
-    regions_data = test_positivity.run_and_maybe_join_columns(selected_dataset, log)
+    with timing_utils.stage("test_positivity") as stage:
+        regions_data = test_positivity.run_and_maybe_join_columns(selected_dataset, log)
+        stage.set_shape(regions_data.timeseries_bucketed)
 
-    regions_data = vaccine_backfills.derive_vaccine_pct(regions_data)
+    with timing_utils.stage("derive_vaccine_pct"):
+        regions_data = vaccine_backfills.derive_vaccine_pct(regions_data)
 
     log.info(f"Joining inputs by region.")
-    rt_data_map = dict(model_output.infection_rate.iter_one_regions())
-    regional_inputs = [
-        RegionalInput.from_one_regions(region, regional_data, rt_data=rt_data_map.get(region),)
-        for region, regional_data in regions_data.iter_one_regions()
-    ]
+    with timing_utils.stage("join_inputs_by_region"):
+        rt_data_map = dict(model_output.infection_rate.iter_one_regions())
+        regional_inputs = [
+            RegionalInput.from_one_regions(region, regional_data, rt_data=rt_data_map.get(region),)
+            for region, regional_data in regions_data.iter_one_regions()
+        ]
     # Build all region timeseries API Output objects.
     log.info("Generating all API Timeseries")
-    all_timeseries = run_on_regions(regional_inputs)
-    deploy_single_level(all_timeseries, AggregationLevel.COUNTY, output)
-    deploy_single_level(all_timeseries, AggregationLevel.STATE, output)
-    deploy_single_level(all_timeseries, AggregationLevel.CBSA, output)
-    deploy_single_level(all_timeseries, AggregationLevel.PLACE, output)
-    deploy_single_level(all_timeseries, AggregationLevel.COUNTRY, output)
+    with timing_utils.stage("run_on_regions", region_count=len(regional_inputs)):
+        all_timeseries = run_on_regions(regional_inputs)
+    sink = dataset_deployer.TarSink(archive_path, output) if archive_path else None
+    manifest = None
+    if skip_unchanged:
+        output.mkdir(parents=True, exist_ok=True)
+        manifest = dataset_deployer.ContentManifest(
+            output, manifest_path, changed_files_path=changed_files_path
+        )
+    compressions = list(dataset_deployer.Compression) if precompress else []
+    with dataset_deployer.DeployWriter(
+        sink, manifest=manifest, compressions=compressions
+    ) as writer:
+        for level in [
+            AggregationLevel.COUNTY,
+            AggregationLevel.STATE,
+            AggregationLevel.CBSA,
+            AggregationLevel.PLACE,
+            AggregationLevel.COUNTRY,
+        ]:
+            with timing_utils.stage("deploy_single_level", level=level.value):
+                deploy_single_level(all_timeseries, level, output, writer)
+                writer.flush()
     log.info("Finished API generation.")
@@ -0,0 +1,151 @@
+import concurrent.futures
+import dataclasses
+import datetime
+import textwrap
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from datapublic import common_fields
+from datapublic.common_fields import CommonFields
+from datapublic.common_fields import DemographicBucket
+from datapublic.common_fields import PdFields
+
+from libs import timing_utils
+from libs.datasets import dataset_utils
+from libs.datasets import timeseries
+
+
+BUCKET_ALL = "all"
+BUCKET_NOT_ALL = "not_all"
+
+
+@dataclasses.dataclass(frozen=True)
+class ObservationCounts:
+    """Counts of real (not NA) observations in a dataset, as printed by `print_stats`."""
+
+    # Index: variable; columns: BUCKET_ALL, BUCKET_NOT_ALL
+    by_variable: pd.DataFrame
+
+    # Index: aggregate level
+    by_level: pd.Series
+
+    @staticmethod
+    def make(dataset: timeseries.MultiRegionDataset, sample_fraction: float = 1.0):
+        """Counts observations in `dataset` without stacking it into a long Series.
+
+        When sample_fraction is less than 1 only a deterministic subset of locations, selected by
+        a hash of the location_id, is counted.
+        """
+        ts = dataset.timeseries_bucketed
+        location_ids = ts.index.get_level_values(CommonFields.LOCATION_ID)
+        if sample_fraction < 1.0:
+            location_hash = pd.util.hash_array(location_ids.to_numpy(dtype=object))
+            sampled = (location_hash % 10_000) < sample_fraction * 10_000
+            ts = ts.loc[sampled]
+            location_ids = location_ids[sampled]
+
+        not_na = ts.notna()
+        bucket_all = ts.index.get_level_values(PdFields.DEMOGRAPHIC_BUCKET) == DemographicBucket.ALL
+        by_variable = pd.DataFrame(
+            {
+                BUCKET_ALL: not_na.loc[bucket_all].sum(),
+                BUCKET_NOT_ALL: not_na.loc[~bucket_all].sum(),
+            }
+        )
+
+        # Map each unique location_id to its level once instead of once per row.
+        codes, uniques = pd.factorize(location_ids)
+        level_of_unique = uniques.map(dataset_utils.get_geo_data()[CommonFields.AGGREGATE_LEVEL])
+        row_counts = not_na.to_numpy().sum(axis=1)
+        by_level = (
+            pd.Series(row_counts, index=np.asarray(level_of_unique)[codes])
+            .groupby(level=0)
+            .sum()
+            .sort_values(ascending=False)
+        )
+        return ObservationCounts(by_variable=by_variable, by_level=by_level)
+
+    def by_field_group(self) -> pd.DataFrame:
+        return self.by_variable.groupby(common_fields.COMMON_FIELD_TO_GROUP, sort=False).sum()
+
+
+class DatasetStatsObserver:
+    """Prints observation counts of the dataset produced by each step of a pipeline, with the
+    change from the previous step.
+
+    Disabled observers do nothing. Counts are only computed when a step produces a timeseries
+    that differs from the previous step, and may be computed on a sample of locations and/or in a
+    background thread so that they don't add a full scan of the dataset to every step. Datasets
+    are immutable so the background thread can safely read them while the pipeline continues.
+    """
+
+    def __init__(
+        self, *, enabled: bool = True, sample_fraction: float = 1.0, background: bool = False
+    ):
+        if not 0.0 < sample_fraction <= 1.0:
+            raise ValueError(f"sample_fraction must be in (0, 1], got {sample_fraction}")
+        self.enabled = enabled
+        self.sample_fraction = sample_fraction
+        self._previous_timeseries: Optional[pd.DataFrame] = None
+        self._previous_counts: Optional[ObservationCounts] = None
+        # One worker so that steps are reported in order.
+        self._executor = (
+            concurrent.futures.ThreadPoolExecutor(max_workers=1) if enabled and background else None
+        )
+        self._futures = []
+
+    def observe(self, name: str, dataset: timeseries.MultiRegionDataset):
+        if not self.enabled:
+            return
+        if self._executor:
+            self._futures.append(self._executor.submit(self._report, name, dataset))
+        else:
+            self._report(name, dataset)
+
+    def close(self):
+        """Waits for reports running in the background thread and raises any of their errors."""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            for future in self._futures:
+                future.result()
+
+    def __enter__(self) -> "DatasetStatsObserver":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _report(self, name: str, dataset: timeseries.MultiRegionDataset):
+        with timing_utils.stage("print_stats", step=name):
+            if dataset.timeseries_bucketed is self._previous_timeseries:
+                # The step only changed tags or static values.
+                counts = self._previous_counts
+            else:
+                counts = ObservationCounts.make(dataset, self.sample_fraction)
+            print(datetime.datetime.now())
+            stats_in_text = self._format(counts)
+            print(f"Observations in dataset {name}:\n" + textwrap.indent(stats_in_text, "  "))
+            self._previous_timeseries = dataset.timeseries_bucketed
+            self._previous_counts = counts
+
+    def _format(self, counts: ObservationCounts) -> str:
+        by_group = counts.by_field_group()
+        by_level = counts.by_level.rename("count").to_frame()
+        if self._previous_counts is not None:
+            by_group = by_group.join(
+                by_group.sub(self._previous_counts.by_field_group(), fill_value=0).add_suffix(
+                    "_delta"
+                )
+            )
+            by_level["delta"] = by_level["count"].sub(self._previous_counts.by_level, fill_value=0)
+        lines = []
+        if self.sample_fraction < 1.0:
+            lines.append(f"Sampled {self.sample_fraction:.0%} of locations")
+        lines += [
+            "By bucket:",
+            textwrap.indent(by_group.to_string(), "  "),
+            "By level:",
+            textwrap.indent(by_level.to_string(), "  "),
+        ]
+        return "\n".join(lines)
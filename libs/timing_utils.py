@@ -1,10 +1,25 @@
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import dataclasses
+import json
+import os
+import pathlib
+import resource
+import sys
+import threading
 import time as time_stdlib
 import structlog
 import contextlib
 
 _logger = structlog.get_logger()
 
+# Environment variable with the directory where stage records are written. It is an environment
+# variable, not a module global, so that worker processes started by parallel_utils inherit it.
+PROFILE_DIR_ENV = "PROFILE_DIR"
+
+# Name of the report written by write_report, in the Trace Event Format which can be loaded in
+# chrome://tracing or https://ui.perfetto.dev.
+REPORT_FILENAME = "profile.json"
+
 
 @contextlib.contextmanager
 def time(description: Optional[str] = None, **logging_args):
@@ -13,3 +28,173 @@ def time(description: Optional[str] = None, **logging_args):
     yield
     elapsed = time_stdlib.time() - start
     _logger.info(f"Elapsed: {elapsed:.1f}s", description=description, **logging_args)
+
+
+@dataclasses.dataclass
+class StageRecord:
+    """Measurements of one run of a named stage."""
+
+    name: str
+    pid: int
+    thread_id: int
+    # Seconds since the epoch when the stage started.
+    start: float
+    wall_seconds: Optional[float] = None
+    cpu_seconds: Optional[float] = None
+    # The high-water mark of the process RSS when the stage finished. This includes memory used
+    # by earlier stages in the same process.
+    peak_rss_bytes: Optional[int] = None
+    rows: Optional[int] = None
+    columns: Optional[int] = None
+    attributes: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    def set_shape(self, frame) -> None:
+        """Records the number of rows and columns of a DataFrame (or anything with a `shape`)."""
+        shape = frame.shape
+        self.rows = int(shape[0])
+        self.columns = int(shape[1]) if len(shape) > 1 else 1
+
+    def to_trace_event(self) -> Dict[str, Any]:
+        args = {
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "rows": self.rows,
+            "columns": self.columns,
+            **self.attributes,
+        }
+        return {
+            "name": self.name,
+            "ph": "X",
+            "ts": int(self.start * 1e6),
+            "dur": int((self.wall_seconds or 0) * 1e6),
+            "pid": self.pid,
+            "tid": self.thread_id,
+            "args": {k: v for k, v in args.items() if v is not None},
+        }
+
+
+def _peak_rss_bytes() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def profile_dir() -> Optional[pathlib.Path]:
+    """Returns the directory stage records are written to, or None if profiling is disabled."""
+    value = os.environ.get(PROFILE_DIR_ENV)
+    return pathlib.Path(value) if value else None
+
+
+def enable_profiling(directory: pathlib.Path) -> None:
+    """Enables recording of stages in this process and worker processes started after this call.
+
+    Stage records of an earlier run in `directory` are deleted so they are not added to the report.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("stages-*.jsonl"):
+        path.unlink()
+    os.environ[PROFILE_DIR_ENV] = str(directory)
+
+
+_write_lock = threading.Lock()
+
+
+def _append_record(directory: pathlib.Path, record: StageRecord) -> None:
+    # Each process appends to its own file so records from concurrent workers don't interleave.
+    path = directory / f"stages-{record.pid}.jsonl"
+    with _write_lock, path.open("a") as f:
+        f.write(json.dumps(dataclasses.asdict(record), default=str) + "\n")
+
+
+@contextlib.contextmanager
+def stage(name: str, *, log_elapsed: bool = True, **attributes) -> Iterator[StageRecord]:
+    """Measures wall time, CPU time and peak RSS of the enclosed block as stage `name`.
+
+    The yielded StageRecord may be used to add row/column counts with `set_shape`. When profiling
+    is enabled, see `enable_profiling`, the record is written to the profile directory for
+    `write_report`. Pass log_elapsed=False for stages run once per region to keep them out of the
+    log. A stage that raises is recorded with the exception type in the `error` attribute.
+    """
+    record = StageRecord(
+        name=name,
+        pid=os.getpid(),
+        thread_id=threading.get_ident(),
+        start=time_stdlib.time(),
+        attributes=attributes,
+    )
+    wall_start = time_stdlib.perf_counter()
+    cpu_start = time_stdlib.process_time()
+    try:
+        yield record
+    except BaseException as e:
+        record.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        record.wall_seconds = time_stdlib.perf_counter() - wall_start
+        record.cpu_seconds = time_stdlib.process_time() - cpu_start
+        record.peak_rss_bytes = _peak_rss_bytes()
+
+        directory = profile_dir()
+        if directory:
+            _append_record(directory, record)
+        if log_elapsed:
+            _logger.info(
+                f"Stage {name} elapsed: {record.wall_seconds:.1f}s",
+                cpu_seconds=round(record.cpu_seconds, 1),
+                rows=record.rows,
+                columns=record.columns,
+                **record.attributes,
+            )
+
+
+def read_records(directory: pathlib.Path) -> List[StageRecord]:
+    """Reads the stage records written by all processes to `directory`."""
+    records = []
+    for path in sorted(directory.glob("stages-*.jsonl")):
+        for line in path.read_text().splitlines():
+            if line:
+                records.append(StageRecord(**json.loads(line)))
+    return sorted(records, key=lambda r: r.start)
+
+
+def write_report(directory: pathlib.Path) -> pathlib.Path:
+    """Combines stage records in `directory` into one trace event JSON file and returns its path."""
+    records = read_records(directory)
+    report = {
+        "traceEvents": [r.to_trace_event() for r in records],
+        "displayTimeUnit": "ms",
+    }
+    path = directory / REPORT_FILENAME
+    path.write_text(json.dumps(report, indent=1))
+    _logger.info("Wrote profile report", path=str(path), stage_count=len(records))
+    return path
+
+
+def stage_totals(report_path: pathlib.Path) -> Dict[str, Tuple[float, float]]:
+    """Returns a map from stage name to total (wall seconds, CPU seconds) in a report."""
+    totals: Dict[str, Tuple[float, float]] = {}
+    for event in json.loads(report_path.read_text())["traceEvents"]:
+        wall, cpu = totals.get(event["name"], (0.0, 0.0))
+        totals[event["name"]] = (
+            wall + event["dur"] / 1e6,
+            cpu + event["args"].get("cpu_seconds", 0.0),
+        )
+    return totals
+
+
+def compare_reports(
+    old_report: pathlib.Path, new_report: pathlib.Path
+) -> List[Tuple[str, Optional[float], Optional[float]]]:
+    """Returns (stage name, old wall seconds, new wall seconds) for stages in either report, with
+    the largest increase first."""
+    old_totals = stage_totals(old_report)
+    new_totals = stage_totals(new_report)
+    rows = [
+        (
+            name,
+            old_totals[name][0] if name in old_totals else None,
+            new_totals[name][0] if name in new_totals else None,
+        )
+        for name in set(old_totals) | set(new_totals)
+    ]
+    return sorted(rows, key=lambda r: (r[2] or 0.0) - (r[1] or 0.0), reverse=True)
@@ -14,6 +14,7 @@ from datapublic.common_fields import CommonFields
 from libs.pipelines import api_v2_pipeline
 from libs import parallel_utils
 from libs import pipeline
+from libs import timing_utils
 from libs.datasets import AggregationLevel
 from libs.datasets import combined_datasets
 import pyseir.rt.patches
@@ -39,10 +40,22 @@ def _cache_global_datasets():
 
 
 @click.group()
-def entry_point():
+@click.option(
+    "--profile-dir",
+    type=pathlib.Path,
+    envvar=timing_utils.PROFILE_DIR_ENV,
+    help="Record the time and memory used by each pipeline stage in this directory and write "
+    f"{timing_utils.REPORT_FILENAME} when the command finishes.",
+)
+@click.pass_context
+def entry_point(ctx, profile_dir):
     """Basic entrypoint for cortex subcommands"""
     common_init.configure_logging()
 
+    if profile_dir:
+        timing_utils.enable_profiling(profile_dir)
+        ctx.call_on_close(lambda: timing_utils.write_report(profile_dir))
+
 
 def _states_region_list(state: Optional[str], default: List[str]) -> List[pipeline.Region]:
     """Create a list of Region objects containing just state or default."""
@@ -138,31 +151,54 @@ def run_infer_rt(state, states_only):
     type=bool,
     help="Generate API v2 output after PySEIR finishes",
 )
-def build_all(states, output_dir, level, fips, location_id_matches: str, generate_api_v2: bool):
+@click.option(
+    "--write-pyseir-output/--no-write-pyseir-output",
+    default=True,
+    help="Write the Rt results to --output-dir. Disable when only the API from --generate-api-v2 "
+    "is needed.",
+)
+def build_all(
+    states,
+    output_dir,
+    level,
+    fips,
+    location_id_matches: str,
+    generate_api_v2: bool,
+    write_pyseir_output: bool,
+):
     # split columns by ',' and remove whitespace
     states = [c.strip() for c in states]
     states = [us.states.lookup(state).abbr for state in states]
     states = [state for state in states if state in ALL_STATES]
 
     # prepare data
-    _cache_global_datasets()
-
-    regions_dataset = combined_datasets.load_us_timeseries_dataset().get_subset(
-        fips=fips,
-        aggregation_level=level,
-        exclude_county_999=True,
-        states=states,
-        location_id_matches=location_id_matches,
-    )
-    regions = [one_region for _, one_region in regions_dataset.iter_one_regions()]
+    with timing_utils.stage("load_us_timeseries_dataset") as stage:
+        _cache_global_datasets()
+
+        regions_dataset = combined_datasets.load_us_timeseries_dataset().get_subset(
+            fips=fips,
+            aggregation_level=level,
+            exclude_county_999=True,
+            states=states,
+            location_id_matches=location_id_matches,
+        )
+        stage.set_shape(regions_dataset.timeseries_bucketed)
+    with timing_utils.stage("iter_one_regions"):
+        regions = [one_region for _, one_region in regions_dataset.iter_one_regions()]
     root.info(f"Executing pipeline for {len(regions)} regions")
-    region_pipelines: List[OneRegionPipeline] = parallel_utils.parallel_map(
-        OneRegionPipeline.run, regions
-    )
-    region_pipelines = _patch_nola_infection_rate_in_pipelines(region_pipelines)
+    with timing_utils.stage("run_regions", region_count=len(regions)):
+        region_pipelines: List[OneRegionPipeline] = parallel_utils.parallel_map(
+            OneRegionPipeline.run, regions
+        )
+        region_pipelines = _patch_nola_infection_rate_in_pipelines(region_pipelines)
+
+    with timing_utils.stage("build_pyseir_output") as stage:
+        model_output = pyseir.run.PyseirOutputDatasets.from_pipeline_output(region_pipelines)
+        stage.set_shape(model_output.infection_rate.timeseries_bucketed)
 
-    model_output = pyseir.run.PyseirOutputDatasets.from_pipeline_output(region_pipelines)
-    model_output.write(output_dir, root)
+    if write_pyseir_output:
+        with timing_utils.stage("write_pyseir_output"):
+            model_output.write(output_dir, root)
 
     if generate_api_v2:
         api_v2_pipeline.generate_from_loaded_data(model_output, output_dir, regions_dataset, root)
@@ -1,4 +1,5 @@
 from typing import Mapping
+from typing import Sequence
 
 import pandas as pd
 import numpy as np
@@ -6,44 +7,61 @@ import numpy as np
 from libs import pipeline
 from libs.datasets.combined_datasets import CommonFields
 
+RT_COMPOSITE_COLUMNS = ["Rt_MAP_composite", "Rt_ci95_composite"]
+
 
 def patch_aggregate_rt_results(
     infection_rate_map: Mapping[pipeline.Region, pd.DataFrame],
     population_map: Mapping[pipeline.Region, float],
+    columns: Sequence[str] = tuple(RT_COMPOSITE_COLUMNS),
 ) -> pd.DataFrame:
-    """Return the population weighted rt dataframe results for the given fips_superset
+    """Return the population weighted rt dataframe results for the given regions
+
+    The rt of each region is copied to a region x date array and the weighted average of each
+    date is computed for all dates at once. On each date only the regions with a row for that
+    date are included in the average. The input DataFrames are not modified.
 
     Parameters
     ----------
-    fips_superset
-        A list of fips to combine for rt calculation
+    infection_rate_map
+        Map from region to its rt DataFrame, with a date column and `columns`
+    population_map
+        Map from region to the weight of the region, usually its population
+    columns
+        Columns to average
 
     Returns
     -------
     dataframe
-        With columns "Rt_MAP_composite" and "Rt_ci95_composite"
+        With `columns`, by default "Rt_MAP_composite" and "Rt_ci95_composite", and date
     """
     assert set(infection_rate_map.keys()) == set(population_map.keys())
+    # TODO: Decide whether Rt_ci95_composite should be changed to being combined in quadrature
+    #  http://ipl.physics.harvard.edu/wp-uploads/2013/03/PS3_Error_Propagation_sp13.pdf instead
+    #  of the population weighted arithmetic mean
+    columns = list(columns)
+    regions = [region for region, df in infection_rate_map.items() if not df.empty]
+    frames = [infection_rate_map[region] for region in regions]
+    if frames:
+        dates = pd.Index(pd.concat([df[CommonFields.DATE] for df in frames]).unique())
+    else:
+        dates = pd.Index([])
+    dates = dates.sort_values().rename(CommonFields.DATE)
 
-    def load_and_append_population(region: pipeline.Region) -> pd.DataFrame:
-        tmp = infection_rate_map[region]
-        tmp["population"] = population_map[region]
-        return tmp
-
-    combined_df = pd.concat(load_and_append_population(x) for x in infection_rate_map.keys())
-
-    def f(x):
-        """Helper function to apply to weighted arithmetic means to groupby objects"""
-        # TODO: Decide whether Rt_ci95_composite should be changed to being combined in quadrature
-        #  http://ipl.physics.harvard.edu/wp-uploads/2013/03/PS3_Error_Propagation_sp13.pdf instead
-        #  of the population weighted arithmetic mean
-
-        weighted_data = dict(
-            Rt_MAP_composite=np.average(x["Rt_MAP_composite"], weights=x["population"]),
-            Rt_ci95_composite=np.average(x["Rt_ci95_composite"], weights=x["population"]),
-            date=x.name,
-        )
+    # values[column, region, date] is nan where the region doesn't have a row for date.
+    values = np.full((len(columns), len(regions), len(dates)), np.nan)
+    has_row = np.zeros((len(regions), len(dates)), dtype=bool)
+    for i, df in enumerate(frames):
+        positions = dates.get_indexer(df[CommonFields.DATE])
+        has_row[i, positions] = True
+        values[:, i, positions] = df.loc[:, columns].to_numpy(dtype=float).T
 
-        return pd.Series(weighted_data)
+    population = np.array([population_map[region] for region in regions], dtype=float)
+    weights = np.where(has_row, population[:, np.newaxis], 0.0)
+    # Like np.average a nan value in a row that is present makes the average nan.
+    weighted_sums = np.where(has_row, values * weights, 0.0).sum(axis=1)
+    averages = weighted_sums / weights.sum(axis=0)
 
-    return combined_df.groupby(CommonFields.DATE).apply(f)
+    result = pd.DataFrame(averages.T, index=dates, columns=columns)
+    result[CommonFields.DATE] = dates
+    return result
@@ -9,6 +9,7 @@ from datapublic.common_fields import CommonFields
 from typing_extensions import final
 
 from libs import pipeline
+from libs import timing_utils
 from libs.datasets.timeseries import MultiRegionDataset
 from libs.datasets.timeseries import OneRegionTimeseriesDataset
 from pyseir.rt import infer_rt
@@ -30,12 +31,16 @@ class OneRegionPipeline:
     def run(input: OneRegionTimeseriesDataset) -> "OneRegionPipeline":
         # `infer_df` does not have the NEW_ORLEANS patch applied. TODO(tom): Rename to something like
         # infection_rate.
-        infer_rt_input = infer_rt.RegionalInput.from_regional_data(input)
-        try:
-            infer_df = infer_rt.run_rt(infer_rt_input)
-        except Exception:
-            _log.exception(f"run_rt failed for {input.region}")
-            infer_df = pd.DataFrame()
+        with timing_utils.stage(
+            "run_rt", log_elapsed=False, location_id=input.region.location_id
+        ) as stage:
+            infer_rt_input = infer_rt.RegionalInput.from_regional_data(input)
+            try:
+                infer_df = infer_rt.run_rt(infer_rt_input)
+            except Exception:
+                _log.exception(f"run_rt failed for {input.region}")
+                infer_df = pd.DataFrame()
+            stage.set_shape(infer_df)
 
         return OneRegionPipeline(region=input.region, infer_df=infer_df, _combined_data=input,)
 
@@ -52,17 +57,30 @@ class PyseirOutputDatasets:
 
     def write(self, output_dir: pathlib.Path, log):
         output_dir_path = pathlib.Path(output_dir)
-        if not output_dir_path.exists():
-            output_dir_path.mkdir()
+        output_dir_path.mkdir(parents=True, exist_ok=True)
 
         output_path = output_dir_path / SummaryArtifact.RT_METRIC_COMBINED.value
         self.infection_rate.to_csv(output_path)
         log.info(f"Saving Rt results to {output_path}")
+        # The snapshot keeps the exact float values and index so reading it for the API doesn't
+        # parse the CSV.
+        self.infection_rate.to_snapshot(
+            output_dir_path / SummaryArtifact.RT_METRIC_COMBINED_SNAPSHOT.value
+        )
 
     @staticmethod
     def read(output_dir: pathlib.Path) -> "PyseirOutputDatasets":
+        snapshot_path = output_dir / SummaryArtifact.RT_METRIC_COMBINED_SNAPSHOT.value
         rt_data_path = output_dir / SummaryArtifact.RT_METRIC_COMBINED.value
-        rt_data = MultiRegionDataset.from_csv(rt_data_path)
+        # `write` writes the snapshot after the CSV. Read the CSV if there is no snapshot, as in
+        # output written before snapshots were added, or if the CSV was replaced after it.
+        if snapshot_path.exists() and (
+            not rt_data_path.exists()
+            or snapshot_path.stat().st_mtime >= rt_data_path.stat().st_mtime
+        ):
+            rt_data = MultiRegionDataset.from_snapshot(snapshot_path)
+        else:
+            rt_data = MultiRegionDataset.from_csv(rt_data_path)
 
         return PyseirOutputDatasets(infection_rate=rt_data)
 
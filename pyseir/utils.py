@@ -22,6 +22,8 @@ class RunArtifact(Enum):
 
 class SummaryArtifact(Enum):
     RT_METRIC_COMBINED = "rt_combined_metric.csv"
+    # Same data as RT_METRIC_COMBINED in a MultiRegionDataset snapshot, read by the API pipeline.
+    RT_METRIC_COMBINED_SNAPSHOT = "rt_combined_metric.pkl.zst"
 
 
 def get_summary_artifact_path(artifact: SummaryArtifact, output_dir=None) -> str:
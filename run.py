@@ -4,28 +4,39 @@ Entry point for covid-data-model CLI.
 
 """
 import logging
+import pathlib
 import click
 from datapublic import common_init
-from pandarallel import pandarallel
-
-from cli import api
-from cli import data
-from cli import utils
-
-
-@click.group()
+from libs import timing_utils
+
+from cli.lazy_group import LazyCommand
+from cli.lazy_group import LazyGroup
+
+# Subcommand groups are imported only when invoked. See LazyGroup.
+LAZY_SUBCOMMANDS = {
+    "api": LazyCommand("cli.api", "main", "Generate the API and its schemas."),
+    "data": LazyCommand("cli.data", "main", "Update and inspect the combined datasets."),
+    "utils": LazyCommand("cli.utils", "main", "Miscellaneous helpers."),
+}
+
+
+@click.group(cls=LazyGroup, lazy_subcommands=LAZY_SUBCOMMANDS)
+@click.option(
+    "--profile-dir",
+    type=pathlib.Path,
+    envvar=timing_utils.PROFILE_DIR_ENV,
+    help="Record the time and memory used by each pipeline stage in this directory and write "
+    f"{timing_utils.REPORT_FILENAME} when the command finishes.",
+)
 @click.pass_context
 # Disable pylint warning as suggested by https://stackoverflow.com/a/49680253
-def entry_point(ctx):  # pylint: disable=no-value-for-parameter
+def entry_point(ctx, profile_dir):  # pylint: disable=no-value-for-parameter
     """Entry point for covid-data-model CLI."""
     common_init.configure_logging(command=ctx.invoked_subcommand)
 
-    pandarallel.initialize(progress_bar=False)
-
-
-entry_point.add_command(api.main)
-entry_point.add_command(utils.main)
-entry_point.add_command(data.main)
+    if profile_dir:
+        timing_utils.enable_profiling(profile_dir)
+        ctx.call_on_close(lambda: timing_utils.write_report(profile_dir))
 
 
 # This code is executed when invoked as `python run.py ...` and will need to be changed if you
@@ -0,0 +1,74 @@
+import subprocess
+import sys
+
+from libs.datasets import dataset_utils
+
+
+# Modules that are slow to import and must only be imported by the commands that use them.
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "scipy",
+    "numba",
+    "matplotlib",
+    "pydantic",
+    "pyseir",
+    "api.can_api_v2_definition",
+    "libs.datasets.combined_datasets",
+    "libs.pipelines.api_v2_pipeline",
+]
+
+# Maximum number of modules imported by `run.py --help`, including the interpreter startup and
+# sentry_sdk, structlog and click. About 290 when this was written. Importing pandas alone adds
+# more than 500 so a command that pulls it in is caught without measuring time, which is flaky
+# on loaded runners.
+HELP_IMPORTED_MODULE_BUDGET = 400
+
+
+def _heavy_modules_imported(*cli_args: str) -> str:
+    """Runs run.py in a new interpreter and returns the names of HEAVY_MODULES it imported."""
+    code = (
+        "import sys, run\n"
+        "try:\n"
+        f"    run.entry_point({list(cli_args)!r}, standalone_mode=False)\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('imported:', *(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=dataset_utils.REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    # The last line follows the help text printed by the command.
+    last_line = result.stdout.splitlines()[-1]
+    assert last_line.startswith("imported:")
+    return last_line[len("imported:") :].strip()
+
+
+def _imported_module_count(*cli_args: str) -> int:
+    """Runs run.py with -X importtime and returns the number of modules it imported."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "run.py", *cli_args],
+        cwd=dataset_utils.REPO_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    # The first line is the header "import time: self [us] | cumulative | imported package".
+    lines = [line for line in result.stderr.splitlines() if line.startswith("import time:")]
+    return len(lines) - 1
+
+
+def test_help_imported_module_budget():
+    assert _imported_module_count("--help") <= HELP_IMPORTED_MODULE_BUDGET
+    assert _imported_module_count("data", "--help") <= HELP_IMPORTED_MODULE_BUDGET
+
+
+def test_help_does_not_import_heavy_modules():
+    assert _heavy_modules_imported("--help") == ""
+    assert _heavy_modules_imported("data", "--help") == ""
+    assert _heavy_modules_imported("api", "--help") == ""
+    assert _heavy_modules_imported("utils", "--help") == ""
@@ -1,9 +1,16 @@
+import os
 import pathlib
 import pytest
 from libs import pipeline
 from libs.datasets import timeseries
 
 
+def pytest_configure(config):
+    # Run all MultiRegionDataset checks for every dataset created in tests, including in worker
+    # processes.
+    os.environ[timeseries.FULL_VALIDATION_ENV] = "1"
+
+
 @pytest.fixture
 def nyc_fips():
     return "36061"
@@ -1,3 +1,10 @@
+import contextlib
+import gzip
+import tarfile
+
+import brotli
+import pytest
+
 from libs import dataset_deployer
 
 
@@ -27,3 +34,120 @@ def test_write_nested_csv_without_header(tmp_path):
     dataset_deployer.write_nested_csv(data, output_path)
     header = output_path.read_text().split("\n")[0]
     assert header == "foo.bar,foo.baz,bar.baz"
+
+
+def test_deploy_writer_writes_files(tmp_path):
+    writer = dataset_deployer.DeployWriter(max_workers=2, batch_size=2, max_pending_batches=1)
+    with writer:
+        for i in range(5):
+            writer.write(tmp_path / f"{i}.json", f"[{i}]")
+        with writer.open(tmp_path / "bulk.csv") as f:
+            f.write("a,b\r\n")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "0.json",
+        "1.json",
+        "2.json",
+        "3.json",
+        "4.json",
+        "bulk.csv",
+    ]
+    assert (tmp_path / "3.json").read_text() == "[3]"
+    assert (tmp_path / "bulk.csv").read_bytes() == b"a,b\r\n"
+
+
+def test_deploy_writer_tar_sink(tmp_path):
+    root = tmp_path / "output"
+    archive_path = tmp_path / "output.tar"
+    sink = dataset_deployer.TarSink(archive_path, root)
+    with dataset_deployer.DeployWriter(sink, batch_size=2) as writer:
+        for i in range(3):
+            writer.write(root / "county" / f"{i}.json", f"[{i}]")
+        with writer.open(root / "counties.csv") as f:
+            f.write("a,b\r\n")
+
+    with tarfile.open(archive_path) as tar:
+        assert sorted(tar.getnames()) == [
+            "counties.csv",
+            "county/0.json",
+            "county/1.json",
+            "county/2.json",
+        ]
+        assert tar.extractfile("county/1.json").read() == b"[1]"
+        assert tar.extractfile("counties.csv").read() == b"a,b\r\n"
+    assert not root.exists()
+
+
+def test_deploy_writer_skips_unchanged(tmp_path):
+    root = tmp_path / "output"
+    root.mkdir()
+
+    def deploy(contents):
+        manifest = dataset_deployer.ContentManifest(
+            root, changed_files_path=tmp_path / "changed.txt"
+        )
+        with dataset_deployer.DeployWriter(manifest=manifest) as writer:
+            for name, content in contents.items():
+                writer.write(root / name, content)
+            with writer.open(root / "bulk.csv") as f:
+                f.write("".join(contents.values()))
+        return (tmp_path / "changed.txt").read_text().splitlines()
+
+    assert deploy({"a.json": "[1]", "b.json": "[2]"}) == ["a.json", "b.json", "bulk.csv"]
+    (root / "a.json").write_text("modified after deploy")
+
+    assert deploy({"a.json": "[1]", "b.json": "[3]"}) == ["b.json", "bulk.csv"]
+    # Unchanged files are not rewritten.
+    assert (root / "a.json").read_text() == "modified after deploy"
+    assert (root / "b.json").read_text() == "[3]"
+    assert (root / "bulk.csv").read_text() == "[1][3]"
+    assert deploy({"a.json": "[1]", "b.json": "[3]"}) == []
+    # The manifest is kept next to the output, not published with it.
+    assert sorted(path.name for path in root.iterdir()) == ["a.json", "b.json", "bulk.csv"]
+    assert (tmp_path / "output.deploy-manifest.json").exists()
+
+
+def test_deploy_writer_skip_unchanged_not_supported_with_archive(tmp_path):
+    root = tmp_path / "output"
+    sink = dataset_deployer.TarSink(tmp_path / "output.tar", root)
+    manifest = dataset_deployer.ContentManifest(root)
+
+    with pytest.raises(ValueError):
+        dataset_deployer.DeployWriter(sink, manifest=manifest)
+    sink.close()
+
+
+def test_deploy_writer_precompressed_siblings(tmp_path):
+    compressions = list(dataset_deployer.Compression)
+    with dataset_deployer.DeployWriter(compressions=compressions) as writer:
+        writer.write(tmp_path / "a.json", "[1]")
+        with writer.open(tmp_path / "bulk.csv") as f:
+            for i in range(1000):
+                f.write(f"{i},row\r\n")
+
+    expected_bulk = "".join(f"{i},row\r\n" for i in range(1000)).encode()
+    assert gzip.decompress((tmp_path / "a.json.gz").read_bytes()) == b"[1]"
+    assert brotli.decompress((tmp_path / "a.json.br").read_bytes()) == b"[1]"
+    assert (tmp_path / "bulk.csv").read_bytes() == expected_bulk
+    assert gzip.decompress((tmp_path / "bulk.csv.gz").read_bytes()) == expected_bulk
+    assert brotli.decompress((tmp_path / "bulk.csv.br").read_bytes()) == expected_bulk
+
+
+def test_deploy_writer_many_open_precompressed_files(tmp_path):
+    compressions = list(dataset_deployer.Compression)
+    paths = [tmp_path / f"bulk{i}.csv" for i in range(6)]
+    with dataset_deployer.DeployWriter(max_workers=2, compressions=compressions) as writer:
+        with contextlib.ExitStack() as stack:
+            # More files open at once than max_workers / len(compressions).
+            files = [stack.enter_context(writer.open(path)) for path in paths]
+            for i in range(2000):
+                for f in files:
+                    f.write(f"{i},{'x' * 100}\r\n")
+                    # Flush so that writes reach the compressors while all files are open.
+                    f.flush()
+
+    expected = "".join(f"{i},{'x' * 100}\r\n" for i in range(2000)).encode()
+    for path in paths:
+        assert path.read_bytes() == expected
+        assert gzip.decompress((tmp_path / f"{path.name}.gz").read_bytes()) == expected
+        assert brotli.decompress((tmp_path / f"{path.name}.br").read_bytes()) == expected
@@ -214,3 +214,23 @@ def test_geo_data():
     dups = geo_data.index.duplicated()
     if dups.any():
         raise ValueError(f"Duplicated location_id:\n{geo_data.index[dups]}")
+
+
+@pytest.mark.parametrize(
+    "aggregation_level,states",
+    [
+        (AggregationLevel.COUNTY, None),
+        (AggregationLevel.STATE, ("TX", "DC")),
+        (None, ("NY",)),
+        (None, None),
+    ],
+)
+def test_location_ids_matching(aggregation_level, states):
+    geo_data = dataset_utils.get_geo_data()
+    rows_key = dataset_utils.make_rows_key(
+        geo_data, aggregation_level=aggregation_level, states=states and list(states)
+    )
+
+    location_ids = dataset_utils.location_ids_matching(aggregation_level, states)
+
+    assert location_ids.tolist() == geo_data.loc[rows_key, :].index.tolist()
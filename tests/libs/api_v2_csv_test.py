@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from api.can_api_v2_definition import AggregateFlattenedTimeseries
+from api.can_api_v2_definition import AggregateRegionSummaryWithTimeseries
+from api.can_api_v2_definition import RegionTimeseriesRowWithHeader
+from libs import api_v2_csv
+from libs.pipelines import api_v2_pipeline
+from libs.pipelines import csv_column_ordering
+from tests import test_helpers
+
+
+def _build_bulk_flattened_timeseries(
+    bulk_timeseries: AggregateRegionSummaryWithTimeseries,
+) -> AggregateFlattenedTimeseries:
+    """Builds the flattened timeseries rows with pydantic, as done before api_v2_csv."""
+    rows = []
+    for region_timeseries in bulk_timeseries.__root__:
+        # Iterate through each state or county in data, adding summary data to each
+        # timeseries row.
+        summary_data = {
+            "country": region_timeseries.country,
+            "county": region_timeseries.county,
+            "state": region_timeseries.state,
+            "fips": region_timeseries.fips,
+            "lat": region_timeseries.lat,
+            "long": region_timeseries.long,
+            "locationId": region_timeseries.locationId,
+            "lastUpdatedDate": datetime.utcnow(),
+            "hsa": region_timeseries.hsa,
+            "hsaName": region_timeseries.hsaName,
+            "hsaPopulation": region_timeseries.hsaPopulation,
+        }
+        actuals_by_date = {row.date: row for row in region_timeseries.actualsTimeseries}
+        metrics_by_date = {row.date: row for row in region_timeseries.metricsTimeseries}
+        risk_levels_by_date = {row.date: row for row in region_timeseries.riskLevelsTimeseries}
+        cdc_transmission_levels_by_date = {
+            row.date: row for row in region_timeseries.cdcTransmissionLevelTimeseries
+        }
+        community_levels_by_date = {
+            row.date: row for row in region_timeseries.communityLevelsTimeseries
+        }
+        dates = sorted({*metrics_by_date.keys(), *actuals_by_date.keys()})
+        for date in dates:
+            data = {
+                "date": date,
+                "actuals": actuals_by_date.get(date),
+                "metrics": metrics_by_date.get(date),
+                "riskLevels": risk_levels_by_date.get(date),
+                "cdcTransmissionLevel": cdc_transmission_levels_by_date.get(
+                    date
+                ).cdcTransmissionLevel,
+                "communityLevels": community_levels_by_date.get(date),
+            }
+            data.update(summary_data)
+            row = RegionTimeseriesRowWithHeader(**data)
+            rows.append(row)
+
+    return AggregateFlattenedTimeseries(__root__=rows)
+
+
+def test_write_flattened_timeseries_csv_matches_nested_csv(tmp_path, nyc_region, nyc_rt_dataset):
+    nyc_timeseries = test_helpers.load_test_dataset().get_one_region(nyc_region)
+    regional_input = api_v2_pipeline.RegionalInput.from_one_regions(
+        nyc_region, nyc_timeseries, nyc_rt_dataset
+    )
+    region_timeseries = api_v2_pipeline.build_timeseries_for_region(regional_input)
+    all_timeseries = [region_timeseries, region_timeseries]
+    header = csv_column_ordering.TIMESERIES_ORDER + ["notAField"]
+
+    expected_path = tmp_path / "expected.csv"
+    flattened = _build_bulk_flattened_timeseries(
+        AggregateRegionSummaryWithTimeseries(__root__=all_timeseries)
+    )
+    api_v2_pipeline.deploy_csv_api_output(flattened, expected_path, header)
+    output_path = tmp_path / "output.csv"
+    api_v2_csv.write_flattened_timeseries_csv(all_timeseries, output_path, header)
+
+    assert len(expected_path.read_text().splitlines()) > 2
+    assert output_path.read_text() == expected_path.read_text()
+
+
+def test_write_flattened_timeseries_csvs_per_region(tmp_path, nyc_region, nyc_rt_dataset):
+    nyc_timeseries = test_helpers.load_test_dataset().get_one_region(nyc_region)
+    regional_input = api_v2_pipeline.RegionalInput.from_one_regions(
+        nyc_region, nyc_timeseries, nyc_rt_dataset
+    )
+    region_timeseries = api_v2_pipeline.build_timeseries_for_region(regional_input)
+    header = csv_column_ordering.TIMESERIES_ORDER
+
+    api_v2_csv.write_flattened_timeseries_csvs(
+        [region_timeseries, region_timeseries],
+        header,
+        bulk_paths=lambda _: [tmp_path / "all.csv", tmp_path / "state.csv"],
+        region_path=lambda timeseries: tmp_path / f"{timeseries.fips}.csv",
+    )
+
+    region_lines = (tmp_path / f"{region_timeseries.fips}.csv").read_text().splitlines()
+    assert region_lines[0] == ",".join(header)
+    bulk_lines = (tmp_path / "all.csv").read_text().splitlines()
+    assert bulk_lines == region_lines + region_lines[1:]
+    assert (tmp_path / "state.csv").read_text() == (tmp_path / "all.csv").read_text()
@@ -0,0 +1,120 @@
+import datetime
+
+import pandas as pd
+import pydantic
+from datapublic.common_fields import CommonFields
+
+from api.can_api_v2_definition import ActualsTimeseriesRow
+from api.can_api_v2_definition import AggregateRegionSummaryWithTimeseries
+from api.can_api_v2_definition import CdcTransmissionLevelTimeseriesRow
+from api.can_api_v2_definition import HospitalResourceUtilization
+from libs import api_v2_json
+from libs import build_api_v2
+from libs.pipelines import api_v2_pipeline
+from tests import test_helpers
+
+
+def _build_nyc_timeseries(nyc_region, nyc_rt_dataset):
+    nyc_timeseries = test_helpers.load_test_dataset().get_one_region(nyc_region)
+    regional_input = api_v2_pipeline.RegionalInput.from_one_regions(
+        nyc_region, nyc_timeseries, nyc_rt_dataset
+    )
+    region_timeseries = api_v2_pipeline.build_timeseries_for_region(regional_input)
+    assert region_timeseries
+    return nyc_timeseries, region_timeseries
+
+
+def test_rows_from_frame_coerces_like_pydantic():
+    frame = pd.DataFrame(
+        {"capacity": [1.0, None, 3.7], "currentUsageCovid": [None, None, None], "extra": [1, 2, 3]}
+    )
+
+    rows = api_v2_json.rows_from_frame(
+        HospitalResourceUtilization,
+        frame,
+        unset_fields=["currentUsageCovid"],
+        unset_rows=[False, True, False],
+    )
+
+    assert [row.dict(exclude_unset=True) for row in rows] == [
+        {"capacity": 1, "currentUsageCovid": None},
+        {"capacity": None},
+        {"capacity": 3, "currentUsageCovid": None},
+    ]
+    assert isinstance(rows[0].capacity, int)
+
+    frame = pd.DataFrame(
+        {"date": pd.to_datetime(["2021-01-01", "2021-01-02"]), "cdcTransmissionLevel": [2, 4]}
+    )
+
+    rows = api_v2_json.rows_from_frame(CdcTransmissionLevelTimeseriesRow, frame)
+
+    assert rows == [
+        CdcTransmissionLevelTimeseriesRow(date="2021-01-01", cdcTransmissionLevel=2),
+        CdcTransmissionLevelTimeseriesRow(date="2021-01-02", cdcTransmissionLevel=4),
+    ]
+
+
+def test_rows_from_frame_keeps_time_of_datetime_fields():
+    class Row(pydantic.BaseModel):
+        date: datetime.date
+        updated: datetime.datetime
+
+    frame = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2021-01-01", "2021-01-02"]),
+            "updated": pd.to_datetime(["2021-01-01 12:30", "2021-01-02 06:15"]),
+        }
+    )
+
+    rows = api_v2_json.rows_from_frame(Row, frame)
+
+    assert rows == [
+        Row(date="2021-01-01", updated="2021-01-01T12:30"),
+        Row(date="2021-01-02", updated="2021-01-02T06:15"),
+    ]
+    assert type(rows[0].updated) is datetime.datetime
+    assert type(rows[0].date) is datetime.date
+
+
+def test_timeseries_rows_match_pydantic_validation(nyc_region, nyc_rt_dataset):
+    _, region_timeseries = _build_nyc_timeseries(nyc_region, nyc_rt_dataset)
+
+    for rows in [
+        region_timeseries.actualsTimeseries,
+        region_timeseries.metricsTimeseries,
+        region_timeseries.riskLevelsTimeseries,
+        region_timeseries.cdcTransmissionLevelTimeseries,
+        region_timeseries.communityLevelsTimeseries,
+    ]:
+        assert rows
+        for row in rows:
+            validated = type(row).parse_obj(row.dict(exclude_unset=True))
+            assert validated.json(exclude_unset=True) == row.json(exclude_unset=True)
+
+
+def test_actuals_timeseries_match_build_actuals(nyc_region, nyc_rt_dataset):
+    nyc_timeseries, region_timeseries = _build_nyc_timeseries(nyc_region, nyc_rt_dataset)
+
+    expected_rows = []
+    for row in nyc_timeseries.yield_records():
+        actual = build_api_v2._build_actuals(row).dict()
+        if row[CommonFields.DATE] < build_api_v2.USA_VACCINATION_START_DATE:
+            for field in build_api_v2.ACTUALS_VACCINATION_FIELDS:
+                del actual[field]
+        expected_rows.append(ActualsTimeseriesRow(**actual, date=row[CommonFields.DATE]))
+
+    assert [row.json(exclude_unset=True) for row in region_timeseries.actualsTimeseries] == [
+        row.json(exclude_unset=True) for row in expected_rows
+    ]
+
+
+def test_dumps_matches_pydantic_json(nyc_region, nyc_rt_dataset):
+    _, region_timeseries = _build_nyc_timeseries(nyc_region, nyc_rt_dataset)
+    bulk = AggregateRegionSummaryWithTimeseries(__root__=[region_timeseries])
+
+    assert api_v2_json.dumps(region_timeseries) == region_timeseries.json(exclude_unset=True)
+    assert api_v2_json.dumps(region_timeseries.region_summary) == (
+        region_timeseries.region_summary.json(exclude_unset=True)
+    )
+    assert api_v2_json.dumps(bulk) == bulk.json(exclude_unset=True)
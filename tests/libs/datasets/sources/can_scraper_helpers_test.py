@@ -11,6 +11,7 @@ import pytest
 from datapublic.common_fields import CommonFields
 import pandas as pd
 from datapublic.common_fields import DemographicBucket
+from datapublic.common_fields import PdFields
 
 from libs.datasets import data_source
 from libs.datasets import taglib
@@ -240,3 +241,77 @@ def test_bad_location_id():
     input_data.iat[0, input_data.columns.get_loc(ccd_helpers.Fields.LOCATION_ID)] = "iso1:us#nope"
     with pytest.raises(ccd_helpers.BadLocationId, match=r"\#nope"):
         ccd_helpers.CanScraperLoader(input_data)
+
+
+def test_load_and_query_variables_of_several_providers(tmp_path):
+    cases = ccd_helpers.ScraperVariable(
+        variable_name="cases",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.CASES,
+    )
+    deaths = dataclasses.replace(
+        cases, variable_name="deaths", provider="hhs", common_field=CommonFields.DEATHS
+    )
+    other = dataclasses.replace(cases, variable_name="other", provider="hhs")
+    input_data = build_can_scraper_dataframe({cases: [1, 2], deaths: [3, 4], other: [5, 6]})
+    input_data["last_updated"] = "2021-01-01"
+    parquet_path = tmp_path / "can_scrape.parquet"
+    input_data.to_parquet(parquet_path)
+
+    loader = ccd_helpers.CanScraperLoader.load(parquet_path)
+
+    assert ccd_helpers.Fields.LAST_UPDATED not in loader.all_df.columns
+    assert pd.api.types.is_categorical_dtype(loader.all_df[ccd_helpers.Fields.VARIABLE_NAME])
+    rows, _ = loader.query_multiple_variables([cases, deaths], source_type="MySource")
+    assert rows.unstack(CommonFields.DATE).to_dict(orient="split")["data"] == [[1, 2], [3, 4]]
+    assert rows.index.get_level_values(PdFields.VARIABLE).unique().tolist() == [
+        CommonFields.CASES,
+        CommonFields.DEATHS,
+    ]
+
+
+def test_index_can_scraper_variables_of_several_sources():
+    cases = ccd_helpers.ScraperVariable(
+        variable_name="cases",
+        measurement="cumulative",
+        unit="people",
+        provider="cdc",
+        common_field=CommonFields.CASES,
+    )
+    deaths = dataclasses.replace(
+        cases, variable_name="deaths", provider="hhs", common_field=CommonFields.DEATHS
+    )
+    input_data = build_can_scraper_dataframe({cases: [1, 2], deaths: [3, 4]})
+    data = ccd_helpers.CanScraperLoader(input_data)
+
+    class CasesForTest(data_source.CanScraperBase):
+        VARIABLES = [cases]
+        SOURCE_TYPE = "MySource"
+
+        @staticmethod
+        def _get_covid_county_dataset() -> ccd_helpers.CanScraperLoader:
+            return data
+
+    class DeathsForTest(CasesForTest):
+        VARIABLES = [deaths]
+
+    data_source.index_can_scraper_variables([CasesForTest, DeathsForTest, data_source.DataSource])
+
+    assert len(data._rows_by_variable_key) == 2
+    expected_ds = test_helpers.build_default_region_dataset(
+        {
+            CommonFields.CASES: TimeseriesLiteral([1, 2], source=taglib.Source(type="MySource")),
+            CommonFields.DEATHS: TimeseriesLiteral([3, 4], source=taglib.Source(type="MySource")),
+        },
+        region=Region.from_fips("36"),
+    )
+    ds = CasesForTest.make_dataset().join_columns(DeathsForTest.make_dataset())
+    test_helpers.assert_dataset_like(ds, expected_ds)
+
+
+def test_fips_from_int():
+    fips = ccd_helpers._fips_from_int(pd.Series([0, 6, 36, 1001, 36061], index=list("abcde")))
+
+    assert fips.to_dict() == {"a": "0", "b": "06", "c": "36", "d": "01001", "e": "36061"}
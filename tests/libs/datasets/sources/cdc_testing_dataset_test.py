@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+import pytest
 from datapublic.common_fields import CommonFields
 
 from libs import pipeline
@@ -36,3 +39,25 @@ def test_cdc_testing_modify_dataset():
     )
 
     test_helpers.assert_dataset_like(ds_out, ds_expected, drop_na_dates=True)
+
+
+def test_remove_trailing_zeros():
+    data = pd.DataFrame(
+        {
+            CommonFields.LOCATION_ID: ["b"] * 5 + ["a"] * 4,
+            CommonFields.DATE: pd.to_datetime(
+                ["2021-01-0" + str(day) for day in [1, 2, 3, 4, 5, 1, 2, 3, 4]]
+            ),
+            CommonFields.TEST_POSITIVITY_7D: [0.1, 0, 0.2, None, 0, 0, None, 0, 0],
+            CommonFields.CASES: [1, 2, 3, 4, 5, 6, 7, 8, 9],
+        }
+    ).set_index([CommonFields.LOCATION_ID, CommonFields.DATE])
+
+    result = cdc_testing_dataset.remove_trailing_zeros(data)
+
+    assert result.loc["b", CommonFields.TEST_POSITIVITY_7D].tolist() == pytest.approx(
+        [0.1, 0, 0.2, np.nan, np.nan], nan_ok=True
+    )
+    # All zero test positivity is removed.
+    assert result.loc["a", CommonFields.TEST_POSITIVITY_7D].isna().all()
+    assert result[CommonFields.CASES].tolist() == [6, 7, 8, 9, 1, 2, 3, 4, 5]
@@ -25,6 +25,7 @@ from libs.datasets import timeseries
 from libs.datasets.taglib import TagType
 from libs.datasets.taglib import UrlStr
 from libs.pipeline import Region
+from libs.pipeline import RegionMask
 from tests import test_helpers
 from tests.dataset_utils_test import read_csv_and_index_fips
 from tests.dataset_utils_test import read_csv_and_index_fips_date
@@ -285,6 +286,44 @@ def test_fips_not_in_geo_data_csv_raises():
         timeseries.MultiRegionDataset.from_timeseries_df(df)
 
 
+def test_unknown_location_found_by_validate_without_full_validation(monkeypatch):
+    monkeypatch.setenv(timeseries.FULL_VALIDATION_ENV, "0")
+    df = test_helpers.read_csv_str(
+        "       location_id,       date,       cases\n"
+        "iso1:us#fips:06010, 2020-04-01,         100\n",
+        skip_spaces=True,
+    )
+
+    # Only checks that don't depend on the size of the data run when the dataset is created.
+    dataset = timeseries.MultiRegionDataset.from_timeseries_df(df)
+
+    with pytest.raises(AssertionError):
+        dataset.validate()
+    with pytest.raises(AssertionError):
+        dataset.to_compressed_pickle(pathlib.Path("unused.pkl.gz"))
+
+
+def test_subset_from_trusted():
+    region_tx = Region.from_state("TX")
+    region_sf = Region.from_fips("06075")
+    dataset = test_helpers.build_dataset(
+        {region_tx: {CommonFields.CASES: [1, 2]}, region_sf: {CommonFields.CASES: [3, 4]}},
+        static_by_region_then_field_name={region_tx: {CommonFields.POPULATION: 10_000}},
+    )
+
+    subset = dataset.get_regions_subset([region_tx])
+    remaining = dataset._remove_locations([region_tx.location_id])
+
+    assert subset.location_ids.to_list() == [region_tx.location_id]
+    assert remaining.location_ids.to_list() == [region_sf.location_id]
+    test_helpers.assert_dataset_like(
+        timeseries.MultiRegionDataset(
+            timeseries_bucketed=subset.timeseries_bucketed, static=subset.static, tag=subset.tag
+        ),
+        subset,
+    )
+
+
 def test_append_regions():
     ts_fips = timeseries.MultiRegionDataset.from_csv(
         io.StringIO(
@@ -642,6 +681,30 @@ def test_write_read_wide_with_buckets(tmpdir):
 
     test_helpers.assert_dataset_like(dataset_read, dataset_in)
 
+    dataset_read_all_bucket = timeseries.MultiRegionDataset.from_wide_dates_csv(
+        pointer.path_wide_dates(), load_demographics=False
+    ).add_static_csv_file(pointer.path_static())
+    dataset_expected_all_bucket = test_helpers.build_dataset(
+        {region_as: metrics_as, region_sf: {CommonFields.CASES: [1, 2, 3]}}
+    )
+    test_helpers.assert_dataset_like(dataset_read_all_bucket, dataset_expected_all_bucket)
+
+
+def test_read_wide_dates_csv_without_tags_or_buckets():
+    dataset_read = timeseries.MultiRegionDataset.from_wide_dates_csv(
+        io.StringIO(
+            "location_id,variable,2020-04-03,2020-04-02\n"
+            "iso1:us#fips:06075,cases,3,2\n"
+            "iso1:us#fips:06075,deaths,,1\n"
+        )
+    )
+
+    dataset_expected = test_helpers.build_dataset(
+        {Region.from_fips("06075"): {CommonFields.CASES: [2, 3], CommonFields.DEATHS: [1, None]}},
+        start_date="2020-04-02",
+    )
+    test_helpers.assert_dataset_like(dataset_read, dataset_expected)
+
 
 def test_timeseries_drop_stale_timeseries_entire_region():
     ds_in = timeseries.MultiRegionDataset.from_csv(
@@ -749,6 +812,19 @@ def test_append_region_and_get_regions_subset_with_tag():
     test_helpers.assert_dataset_like(dataset_out, dataset_tx)
 
 
+def test_get_regions_subset_with_mask_and_location_missing_from_geo_data():
+    region_tx = Region.from_state("TX")
+    region_unknown = Region(location_id="iso1:us#iso2:us-zz", fips=None)
+    dataset = test_helpers.build_dataset(
+        {region_tx: {CommonFields.CASES: [1, 2]}, region_unknown: {CommonFields.CASES: [3, 4]}}
+    )
+
+    dataset_out = dataset.get_regions_subset([region_tx])
+    assert dataset_out.location_ids.to_list() == [region_tx.location_id]
+    with pytest.raises(KeyError, match="iso1:us#iso2:us-zz"):
+        dataset.get_regions_subset([RegionMask(AggregationLevel.STATE)])
+
+
 def test_one_region_annotations():
     region_tx = Region.from_state("TX")
     region_sf = Region.from_fips("06075")
@@ -2063,3 +2139,28 @@ def test_pickle_test_dataset_size(tmp_path: pathlib.Path):
     loaded_dataset = timeseries.MultiRegionDataset.from_compressed_pickle(pkl_path)
 
     test_helpers.assert_dataset_like(test_dataset, loaded_dataset)
+
+
+def test_snapshot_round_trip(tmp_path: pathlib.Path):
+    snapshot_path = tmp_path / "testfile.pkl.zst"
+    test_dataset = test_helpers.load_test_dataset()
+    test_dataset.to_snapshot(snapshot_path)
+    assert snapshot_path.stat().st_size < 900_000
+
+    loaded_dataset = timeseries.MultiRegionDataset.from_snapshot(snapshot_path)
+
+    test_helpers.assert_dataset_like(test_dataset, loaded_dataset)
+
+
+def test_snapshot_rejects_other_version(tmp_path: pathlib.Path):
+    snapshot_path = tmp_path / "testfile.pkl.zst"
+    test_helpers.build_default_region_dataset({CommonFields.CASES: [1, 2]}).to_snapshot(
+        snapshot_path
+    )
+    contents = bytearray(snapshot_path.read_bytes())
+    # The version follows the magic bytes, big-endian.
+    contents[len(timeseries.SNAPSHOT_MAGIC) + 1] += 1
+    snapshot_path.write_bytes(contents)
+
+    with pytest.raises(ValueError, match="snapshot format version"):
+        timeseries.MultiRegionDataset.from_snapshot(snapshot_path)
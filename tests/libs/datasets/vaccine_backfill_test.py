@@ -1,3 +1,4 @@
+import pandas as pd
 from datapublic.common_fields import CommonFields
 from datetime import datetime
 from datetime import timedelta
@@ -176,3 +177,17 @@ def test_estimate_initiated_from_state_ratio_respects_lookback_days():
         start_date=start_date,
     )
     test_helpers.assert_dataset_like(ds_result, ds_expected)
+
+
+def test_last_valid_dates():
+    df = pd.DataFrame(
+        [[1, None, None], [None, 2, 3], [None, None, None], [None, 4, None]],
+        columns=pd.to_datetime(["2021-01-01", "2021-01-02", "2021-01-03"]),
+    )
+
+    dates = vaccine_backfills._last_valid_dates(df)
+
+    assert dates[0] == pd.Timestamp("2021-01-01")
+    assert dates[1] == pd.Timestamp("2021-01-03")
+    assert pd.isna(dates[2])
+    assert dates[3] == pd.Timestamp("2021-01-02")
@@ -1,3 +1,5 @@
+import dataclasses
+
 import more_itertools
 import structlog
 from datapublic.common_fields import CommonFields
@@ -76,3 +78,21 @@ def test_preserve_buckets():
         }
     )
     test_helpers.assert_dataset_like(ds_expected, ds_out)
+
+
+def test_drops_empty_columns_like_rebuilding_dataset():
+    ds_in = test_helpers.build_default_region_dataset(
+        {CommonFields.CASES: [0, 0, 0], CommonFields.DEATHS: [0, 1, 2]}
+    )
+    ts_with_empty_column = ds_in.timeseries_bucketed.copy()
+    ts_with_empty_column[CommonFields.ICU_BEDS] = float("nan")
+    ds_in = dataclasses.replace(ds_in, timeseries_bucketed=ts_with_empty_column)
+    ds_expected = test_helpers.build_default_region_dataset({CommonFields.DEATHS: [0, 1, 2]})
+
+    ds_out = zeros_filter.drop_all_zero_timeseries(ds_in, [CommonFields.CASES])
+    assert list(ds_out.timeseries_bucketed.columns) == [CommonFields.DEATHS]
+    test_helpers.assert_dataset_like(ds_expected, ds_out)
+
+    # The empty column is also dropped when there is no all-zero timeseries.
+    ds_out = zeros_filter.drop_all_zero_timeseries(ds_in, [CommonFields.DEATHS])
+    assert CommonFields.ICU_BEDS not in ds_out.timeseries_bucketed.columns
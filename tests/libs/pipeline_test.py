@@ -1,3 +1,5 @@
+import pandas as pd
+
 from libs import pipeline
 from libs.datasets import AggregationLevel
 
@@ -22,3 +24,24 @@ def test_location_id_to_level():
 def test_state_region():
     assert pipeline.Region.from_fips("3651000").get_state_region().state == "NY"
     assert pipeline.Region.from_fips("36061").get_state_region().state == "NY"
+
+
+def test_map_location_ids():
+    calls = []
+
+    def fips_length(location_id):
+        calls.append(location_id)
+        return len(pipeline.location_id_to_fips(location_id))
+
+    location_ids = pd.Series(
+        ["iso1:us#iso2:us-tx", "iso1:us#iso2:us-ny#fips:36061", "iso1:us#iso2:us-tx", None],
+        index=list("abcd"),
+        name="location_id",
+    )
+
+    lengths = pipeline.map_location_ids(location_ids, fips_length)
+
+    assert lengths.to_dict() == {"a": 2, "b": 5, "c": 2, "d": None}
+    assert lengths.name == "location_id"
+    assert calls == ["iso1:us#iso2:us-tx", "iso1:us#iso2:us-ny#fips:36061"]
+    assert pipeline.map_location_ids(pd.Index(location_ids[:2]), fips_length).tolist() == [2, 5]
@@ -0,0 +1,68 @@
+import pytest
+
+from datapublic.common_fields import CommonFields
+from datapublic.common_fields import DemographicBucket
+from datapublic.common_fields import FieldGroup
+
+from libs.datasets import AggregationLevel
+from libs.pipeline import Region
+from libs.qa import stats_observer
+from tests import test_helpers
+
+
+def _build_dataset():
+    return test_helpers.build_dataset(
+        {
+            Region.from_state("TX"): {
+                CommonFields.CASES: {
+                    DemographicBucket("age:20-29"): [3, 4, 5],
+                    DemographicBucket.ALL: [1, 2, 3],
+                },
+            },
+            Region.from_fips("06075"): {CommonFields.CASES: [None, 5, 6]},
+        }
+    )
+
+
+def test_observation_counts():
+    counts = stats_observer.ObservationCounts.make(_build_dataset())
+
+    assert counts.by_variable.at[CommonFields.CASES, stats_observer.BUCKET_ALL] == 5
+    assert counts.by_variable.at[CommonFields.CASES, stats_observer.BUCKET_NOT_ALL] == 3
+    assert counts.by_field_group().at[FieldGroup.CASES_DEATHS, stats_observer.BUCKET_ALL] == 5
+    assert counts.by_level.to_dict() == {"state": 6, "county": 2}
+
+
+def test_observer_reuses_counts_for_unchanged_timeseries(capsys, monkeypatch):
+    dataset = _build_dataset()
+    make_calls = []
+    original_make = stats_observer.ObservationCounts.make
+    monkeypatch.setattr(
+        stats_observer.ObservationCounts,
+        "make",
+        lambda *args: make_calls.append(args) or original_make(*args),
+    )
+
+    with stats_observer.DatasetStatsObserver(background=True) as observer:
+        observer.observe("first", dataset)
+        observer.observe("second", dataset)
+        observer.observe("subset", dataset.get_subset(aggregation_level=AggregationLevel.STATE))
+
+    assert len(make_calls) == 2
+    output = capsys.readouterr().out
+    assert output.index("dataset first") < output.index("dataset second")
+    assert "all_delta" not in output.split("dataset second")[0]
+    assert "all_delta" in output.split("dataset subset")[1]
+
+
+def test_disabled_observer_does_nothing(capsys):
+    observer = stats_observer.DatasetStatsObserver(enabled=False)
+    observer.observe("first", _build_dataset())
+    observer.close()
+
+    assert capsys.readouterr().out == ""
+
+
+def test_observer_rejects_zero_sample_fraction():
+    with pytest.raises(ValueError, match="sample_fraction"):
+        stats_observer.DatasetStatsObserver(enabled=False, sample_fraction=0.0)
@@ -0,0 +1,60 @@
+import json
+
+import pandas as pd
+import pytest
+
+from libs import timing_utils
+
+
+def test_stage_report(tmp_path, monkeypatch):
+    # setenv makes monkeypatch restore the environment variable set by enable_profiling.
+    monkeypatch.setenv(timing_utils.PROFILE_DIR_ENV, "")
+    timing_utils.enable_profiling(tmp_path)
+
+    with timing_utils.stage("load", source="MySource") as stage:
+        stage.set_shape(pd.DataFrame({"a": [1, 2, 3], "b": [4, 5, 6]}))
+    with timing_utils.stage("build", log_elapsed=False):
+        pass
+
+    report_path = timing_utils.write_report(tmp_path)
+
+    events = json.loads(report_path.read_text())["traceEvents"]
+    assert [e["name"] for e in events] == ["load", "build"]
+    assert events[0]["ph"] == "X"
+    assert events[0]["args"]["rows"] == 3
+    assert events[0]["args"]["columns"] == 2
+    assert events[0]["args"]["source"] == "MySource"
+    assert events[0]["args"]["peak_rss_bytes"] > 0
+    assert set(timing_utils.stage_totals(report_path)) == {"load", "build"}
+
+
+def test_stage_report_includes_failed_stage_and_not_earlier_runs(tmp_path, monkeypatch):
+    monkeypatch.setenv(timing_utils.PROFILE_DIR_ENV, "")
+    timing_utils.enable_profiling(tmp_path)
+    with timing_utils.stage("earlier_run"):
+        pass
+
+    timing_utils.enable_profiling(tmp_path)
+    with pytest.raises(ValueError):
+        with timing_utils.stage("fails"):
+            raise ValueError()
+
+    records = timing_utils.read_records(tmp_path)
+    assert [r.name for r in records] == ["fails"]
+    assert records[0].attributes["error"] == "ValueError"
+    assert records[0].wall_seconds is not None
+
+
+def test_compare_reports(tmp_path):
+    def write(name, events):
+        path = tmp_path / name
+        path.write_text(json.dumps({"traceEvents": events}))
+        return path
+
+    old = write("old.json", [{"name": "a", "dur": 1_000_000, "args": {}}])
+    new = write(
+        "new.json",
+        [{"name": "a", "dur": 3_000_000, "args": {}}, {"name": "b", "dur": 500_000, "args": {}}],
+    )
+
+    assert timing_utils.compare_reports(old, new) == [("a", 1.0, 3.0), ("b", None, 0.5)]
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from datapublic.common_fields import CommonFields
+
+from libs import pipeline
+from pyseir.rt import patches
+
+
+def test_patch_aggregate_rt_results():
+    region_a = pipeline.Region.from_fips("22051")
+    region_b = pipeline.Region.from_fips("22071")
+    dates = pd.to_datetime(["2020-06-01", "2020-06-02", "2020-06-03"])
+    rt_a = pd.DataFrame(
+        {
+            CommonFields.DATE: dates,
+            "Rt_MAP_composite": [1.0, 2.0, 3.0],
+            "Rt_ci95_composite": [1.5, 2.5, 3.5],
+        }
+    )
+    rt_b = pd.DataFrame(
+        {
+            CommonFields.DATE: dates[1:],
+            "Rt_MAP_composite": [5.0, np.nan],
+            "Rt_ci95_composite": [5.5, 6.5],
+        }
+    )
+    rt_b_copy = rt_b.copy()
+
+    result = patches.patch_aggregate_rt_results(
+        {region_a: rt_a, region_b: rt_b}, {region_a: 100, region_b: 300}
+    )
+
+    assert result[CommonFields.DATE].tolist() == dates.tolist()
+    np.testing.assert_allclose(result["Rt_MAP_composite"], [1.0, 4.25, np.nan])
+    np.testing.assert_allclose(result["Rt_ci95_composite"], [1.5, 4.75, 5.75])
+    pd.testing.assert_frame_equal(rt_b, rt_b_copy)
@@ -0,0 +1,40 @@
+import os
+
+import structlog
+
+from pyseir.run import PyseirOutputDatasets
+from pyseir.utils import SummaryArtifact
+from tests import test_helpers
+
+
+def test_write_and_read_pyseir_output(tmp_path, rt_dataset):
+    PyseirOutputDatasets(infection_rate=rt_dataset).write(tmp_path, structlog.get_logger())
+
+    assert (tmp_path / SummaryArtifact.RT_METRIC_COMBINED.value).exists()
+    read_output = PyseirOutputDatasets.read(tmp_path)
+    test_helpers.assert_dataset_like(read_output.infection_rate, rt_dataset)
+    # The snapshot keeps exact float values, unlike the CSV.
+    assert read_output.infection_rate.timeseries_bucketed.equals(rt_dataset.timeseries_bucketed)
+
+
+def test_read_pyseir_output_without_snapshot(tmp_path, rt_dataset):
+    PyseirOutputDatasets(infection_rate=rt_dataset).write(tmp_path, structlog.get_logger())
+    (tmp_path / SummaryArtifact.RT_METRIC_COMBINED_SNAPSHOT.value).unlink()
+
+    read_output = PyseirOutputDatasets.read(tmp_path)
+
+    test_helpers.assert_dataset_like(read_output.infection_rate, rt_dataset)
+
+
+def test_read_pyseir_output_prefers_newer_csv(tmp_path, rt_dataset, nyc_region):
+    PyseirOutputDatasets(infection_rate=rt_dataset).write(tmp_path, structlog.get_logger())
+    snapshot_path = tmp_path / SummaryArtifact.RT_METRIC_COMBINED_SNAPSHOT.value
+    csv_path = tmp_path / SummaryArtifact.RT_METRIC_COMBINED.value
+    nyc_dataset = rt_dataset.get_regions_subset([nyc_region])
+    nyc_dataset.to_csv(csv_path)
+    snapshot_mtime = snapshot_path.stat().st_mtime
+    os.utime(csv_path, (snapshot_mtime + 10, snapshot_mtime + 10))
+
+    read_output = PyseirOutputDatasets.read(tmp_path)
+
+    test_helpers.assert_dataset_like(read_output.infection_rate, nyc_dataset)